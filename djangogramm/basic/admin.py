@@ -1,13 +1,164 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from django.utils.safestring import mark_safe
-from django.utils.translation import gettext_lazy as _
-
+from django.http import Http404
+from django.shortcuts import redirect
+from django.urls import path, reverse
+from django.utils.cache import patch_cache_control
+from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _, ngettext
+
+from .media import check_signature, get_media_url, get_signature
 from .models import *
+from .pagination import EstimatedCountPaginator
+from .renditions import get_preview_name, render_preview
+from .tasks import enqueue_renditions
+
+
+class AutocompleteFilter(admin.ListFilter):
+    """
+    Filter by a foreign key picked with the autocomplete widget instead of a list of the whole related table.
+    The admin of the related model must have search_fields.
+    """
+
+    template = 'admin/basic/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        field = model._meta.get_field(self.field_name)
+        self.title = field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        self.parameter_name = f'{self.field_name}__{field.target_field.attname}__exact'
+        self.value = params.pop(self.parameter_name, None)
+        if self.value is not None:
+            self.used_parameters[self.parameter_name] = self.value
+        self.form_field = self.get_form_field(model, model_admin.admin_site)
+
+    @classmethod
+    def get_form_field(cls, model, admin_site):
+        field = model._meta.get_field(cls.field_name)
+        return forms.ModelChoiceField(
+            field.related_model._default_manager.all(),
+            widget=AutocompleteSelect(field.remote_field, admin_site),
+            required=False,
+        )
+
+    def rendered_widget(self):
+        return self.form_field.widget.render(self.parameter_name, self.value, attrs={'id': f'filter_{self.field_name}'})
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': _('All'),
+        }
+
+    def queryset(self, request, queryset):
+        if self.value is None:
+            return queryset
+        return queryset.filter(**self.used_parameters)
+
+
+class ProfileFilter(AutocompleteFilter):
+    field_name = 'profile'
+
+
+class PostFilter(AutocompleteFilter):
+    field_name = 'post'
+
+
+class ScalableAdminMixin:
+    """
+    Admin of a table with millions of rows: the whole table is counted only while it's small,
+    the relations are picked with autocomplete, the filtered list isn't counted twice.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(list_filter, AutocompleteFilter):
+                media += list_filter.get_form_field(self.model, self.admin_site).widget.media
+                media += forms.Media(js=['basic/js/admin_autocomplete_filter.js'])
+        return media
+
+
+class PreviewAdminMixin:
+    """
+    Admin showing the images of preview_field as small previews loaded lazily, not as the originals.
+    The previews of rendered images, which are rendered along with the renditions, are linked directly.
+    The others go through preview_view, which renders a missing preview and stores it next to the original.
+    """
+
+    preview_field = None
+    # The RenditionJob field of the jobs rendering the missing previews
+    preview_job = None
+    actions = ['regenerate_previews']
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('preview/<path:name>', self.admin_site.admin_view(self.preview_view, cacheable=True),
+                 name='%s_%s_preview' % info),
+            *super().get_urls(),
+        ]
+
+    def preview_view(self, request, name):
+        if not self.has_view_permission(request) or not check_signature(name, request.GET):
+            raise Http404
+        storage = self.model._meta.get_field(self.preview_field).storage
+        preview_name = get_preview_name(name)
+        if not storage.exists(preview_name):
+            try:
+                render_preview(name, storage)
+            except OSError:
+                raise Http404
+        response = redirect(get_media_url(preview_name))
+        # The media URL stays the same for a MEDIA_URL_MAX_AGE period, and forever without it
+        patch_cache_control(response, private=True,
+                            max_age=settings.MEDIA_URL_MAX_AGE or settings.MEDIA_CACHE_MAX_AGE)
+        return response
+
+    def get_html_preview(self, file, renditions):
+        """The preview of the file, linked directly if the renditions record shows it's rendered"""
+
+        if not file:
+            return _("No photo")
+        if renditions:
+            url = get_media_url(get_preview_name(file.name))
+        else:
+            info = self.model._meta.app_label, self.model._meta.model_name
+            url = reverse('admin:%s_%s_preview' % info, args=[file.name], current_app=self.admin_site.name)
+            url = f'{url}?s={get_signature(file.name)}'
+        size = settings.ADMIN_PREVIEW_SIZE
+        return format_html('<img src="{}" width="{}" height="{}" loading="lazy" alt="">', url, size, size)
+
+    def regenerate_previews(self, request, queryset):
+        field = self.model._meta.get_field(self.preview_field)
+        names = {name for name in queryset.values_list(field.name, flat=True).iterator() if name}
+        # The rendition worker checks which previews are missing, the request doesn't touch the storage
+        enqueue_renditions(sorted(names), self.preview_job)
+        self.message_user(request, ngettext(
+            'The preview of %d image is queued for rendering if it is missing.',
+            'The previews of %d images are queued for rendering if they are missing.', len(names)
+        ) % len(names))
+
+    regenerate_previews.short_description = _("Regenerate missing previews")
 
 
 @admin.register(GrammUser)
-class UserAdmin(DjangoUserAdmin):
+class UserAdmin(ScalableAdminMixin, DjangoUserAdmin):
     """Define admin model for custom GrammUser model with no email field."""
 
     fieldsets = (
@@ -25,48 +176,61 @@ class UserAdmin(DjangoUserAdmin):
     )
     list_display = ('email', 'date_joined', 'is_active', 'is_staff', 'is_superuser')
     list_display_links = ('email',)
-    search_fields = ('email',)
+    # Prefix searches use the indexes of the unique columns
+    search_fields = ('email__startswith',)
     ordering = ('email',)
     list_editable = ('is_active', 'is_staff', 'is_superuser')
 
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('gramm_user', 'first_name', 'last_name', 'bio', 'get_html_avatar')
+class ProfileAdmin(PreviewAdminMixin, ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('gramm_user', 'first_name', 'last_name', 'bio', 'post_count', 'photo_count', 'get_html_avatar')
+    list_select_related = ('gramm_user',)
+    # Prefix searches backed by the indexes of the unique columns and the UPPER() indexes of the names
+    search_fields = ('first_name__istartswith', 'last_name__istartswith', 'identifier__startswith',
+                     'gramm_user__email__startswith')
     ordering = ('gramm_user',)
+    autocomplete_fields = ('gramm_user',)
 
     fields = ('gramm_user', 'first_name', 'last_name', 'bio', 'avatar', 'get_html_avatar')
     readonly_fields = ('get_html_avatar',)
+    preview_field = 'avatar'
+    preview_job = RenditionJob.AVATAR_PREVIEW
 
     def get_html_avatar(self, object):
-        if object.avatar:
-            return mark_safe(f"<img src='{object.avatar.url}' width=100>")
-        else:
-            return mark_safe(f"{_('No photo')}")
+        return self.get_html_preview(object.avatar, object.avatar_renditions)
 
     get_html_avatar.short_description = "Avatar"
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'profile', 'time_create')
-    search_fields = ('title', 'profile')
-    list_filter = ('profile',)
-    ordering = ('profile', 'time_create')
+class PostAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('title', 'profile', 'time_create', 'photo_count')
+    list_select_related = ('profile',)
+    # The slugs start with the names of the authors followed by the titles, the titles have an UPPER() index
+    search_fields = ('title__istartswith', 'slug__startswith')
+    list_filter = (ProfileFilter,)
+    ordering = ('-pk',)
+    autocomplete_fields = ('profile',)
+
+    def get_queryset(self, request):
+        # The autocomplete choices show the profiles as well, they don't go through list_select_related
+        return super().get_queryset(request).select_related('profile')
 
 
 @admin.register(Photo)
-class PhotoAdmin(admin.ModelAdmin):
+class PhotoAdmin(PreviewAdminMixin, ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('post', 'time_create', 'get_html_photo')
+    list_select_related = ('post__profile',)
 
     fields = ('post', 'photo', 'get_html_photo')
     readonly_fields = ('get_html_photo',)
-    list_filter = ('post',)
+    list_filter = (PostFilter,)
+    autocomplete_fields = ('post',)
+    preview_field = 'photo'
+    preview_job = RenditionJob.PHOTO_PREVIEW
 
     def get_html_photo(self, object):
-        if object.photo:
-            return mark_safe(f"<img src='{object.photo.url}' width=100>")
-        else:
-            return _("No photo")
+        return self.get_html_preview(object.photo, object.rendered and object.renditions)
 
     get_html_photo.short_description = "Photo"
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BasicConfig(AppConfig):
     name = 'basic'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
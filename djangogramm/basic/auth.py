@@ -0,0 +1,128 @@
+import uuid
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.crypto import constant_time_compare
+
+from .models import GrammUser, Profile
+
+# Bumped whenever the fields of the snapshot change, so the snapshots of the previous deploy aren't read
+SNAPSHOT_FORMAT = 2
+# User fields left out of the snapshot, the password hash is never shared through the cache
+USER_EXCLUDED_FIELDS = ('password',)
+# Profile fields of the snapshot, the counters change too often to be cached and are loaded on access
+PROFILE_FIELDS = ('gramm_user', 'first_name', 'last_name', 'bio', 'avatar', 'avatar_renditions', 'identifier')
+
+
+def get_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def get_version_key(user_pk):
+    return f'auth-version:user:{user_pk}'
+
+
+def get_snapshot_key(user_pk, version):
+    return f'auth-user:{SNAPSHOT_FORMAT}:{user_pk}:{version}'
+
+
+def get_version(user_pk):
+    """Return the current snapshot version of the user, creating it if missing"""
+
+    cache = get_cache()
+    key = get_version_key(user_pk)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # A concurrent invalidation wins over the new version
+        if not cache.add(key, version, settings.AUTH_CACHE_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_user(user_pk):
+    """
+    Move the snapshot of the user to a new version right away, and again once the current transaction
+    is committed, as the requests in between could cache the state from before the transaction
+    """
+    def set_version():
+        get_cache().set(get_version_key(user_pk), uuid.uuid4().hex, settings.AUTH_CACHE_TIMEOUT)
+
+    set_version()
+    transaction.on_commit(set_version)
+
+
+def get_attnames(model, names):
+    """Attribute names of the fields in the order of the concrete fields, as Model.from_db() expects them"""
+
+    names = {model._meta.get_field(name).attname for name in names} | {model._meta.pk.attname}
+    return [field.attname for field in model._meta.concrete_fields if field.attname in names]
+
+
+def dump(instance, attnames):
+    values = [getattr(instance, attname) for attname in attnames]
+    return [value.name if isinstance(value, FieldFile) else value for value in values]
+
+
+def attach_profile(user, profile):
+    """Cache the profile, or its absence, on both sides of the relation"""
+
+    GrammUser.profile.related.set_cached_value(user, profile)
+    if profile is not None:
+        Profile.gramm_user.field.set_cached_value(profile, user)
+
+
+def get_user_attnames():
+    return [field.attname for field in GrammUser._meta.concrete_fields if field.name not in USER_EXCLUDED_FIELDS]
+
+
+def dump_snapshot(user, profile):
+    """The user without the password, which is only used through the session hash and its usability"""
+
+    profile_fields = get_attnames(Profile, PROFILE_FIELDS)
+    return {
+        'user': dump(user, get_user_attnames()),
+        'session_hash': user.get_session_auth_hash(),
+        'usable_password': user.has_usable_password(),
+        'profile': dump(profile, profile_fields) if profile is not None else None,
+    }
+
+
+def load_snapshot(snapshot):
+    user = GrammUser.from_db(DEFAULT_DB_ALIAS, get_user_attnames(), snapshot['user'])
+    user.usable_password = snapshot['usable_password']
+    profile = None
+    if snapshot['profile'] is not None:
+        profile = Profile.from_db(DEFAULT_DB_ALIAS, get_attnames(Profile, PROFILE_FIELDS), snapshot['profile'])
+    attach_profile(user, profile)
+    return user
+
+
+def get_user(request):
+    """
+    Return the user of the session with the profile attached, from the cached snapshot when it matches the session,
+    so a warm request doesn't query the database for authentication. The snapshots are invalidated by new versions
+    on login, logout and saves of the user or the profile. Anything unusual falls back to django.contrib.auth.get_user()
+    """
+    user_pk = request.session.get(SESSION_KEY)
+    version = None
+    if user_pk is not None and request.session.get(BACKEND_SESSION_KEY) in settings.AUTHENTICATION_BACKENDS:
+        # The version is read before the database, a snapshot stored under it can't miss a later invalidation
+        version = get_version(user_pk)
+        snapshot = get_cache().get(get_snapshot_key(user_pk, version))
+        if snapshot is not None:
+            user = load_snapshot(snapshot)
+            session_hash = request.session.get(HASH_SESSION_KEY) or ''
+            if user.is_active and constant_time_compare(session_hash, snapshot['session_hash']):
+                return user
+
+    user = auth.get_user(request)
+    if version is not None and user.is_authenticated and str(user.pk) == str(user_pk):
+        profile = Profile.objects.filter(gramm_user_id=user.pk).only(*PROFILE_FIELDS).first()
+        attach_profile(user, profile)
+        get_cache().set(get_snapshot_key(user_pk, version), dump_snapshot(user, profile), settings.AUTH_CACHE_TIMEOUT)
+    return user
@@ -0,0 +1,111 @@
+import logging
+import time
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connections, models, transaction
+
+logger = logging.getLogger(__name__)
+
+_checkpoint_model = None
+
+
+def get_checkpoint_model():
+    """
+    Return the model of the checkpoint table. Like the django_migrations table of the migration recorder,
+    it lives in a registry of its own, so the data migrations of any age use the same table
+    without depending on the current models of the app
+    """
+    global _checkpoint_model
+    if _checkpoint_model is None:
+        class Checkpoint(models.Model):
+            name = models.CharField(max_length=255, unique=True)
+            last_pk = models.CharField(max_length=255, blank=True, default='')
+            rows = models.PositiveBigIntegerField(default=0)
+            done = models.BooleanField(default=False)
+            time_update = models.DateTimeField(auto_now=True)
+
+            class Meta:
+                apps = Apps()
+                app_label = 'backfill'
+                db_table = 'basic_backfill_checkpoint'
+
+        _checkpoint_model = Checkpoint
+    return _checkpoint_model
+
+
+def ensure_checkpoint_table(using, schema_editor=None):
+    """
+    Create the checkpoint table unless it exists, with the schema editor of the running migration if given.
+
+    The table is created on first use outside of any migration, as the earliest data migrations need it,
+    and it's never dropped, not even by migrating backwards past them: the reverse code of a data migration
+    resets its checkpoint instead, so the backfill runs again when the migration is reapplied.
+    After "migrate basic zero", drop basic_backfill_checkpoint by hand if it's no longer wanted.
+    """
+
+    Checkpoint = get_checkpoint_model()
+    connection = connections[using]
+    if Checkpoint._meta.db_table in connection.introspection.table_names():
+        return
+    if schema_editor is not None:
+        schema_editor.create_model(Checkpoint)
+    else:
+        with connection.schema_editor() as editor:
+            editor.create_model(Checkpoint)
+
+
+def backfill(queryset, update, fields, name, batch_size=None, pause=None, schema_editor=None):
+    """
+    Update the rows of a large table in batches, for RunPython migrations and management commands.
+
+    The rows are walked in primary key order, each batch of batch_size rows starting after the last
+    primary key of the previous one. update(objects) changes the objects of a batch in place, then the fields
+    are written back with one bulk_update(). Every batch commits on its own together with a checkpoint
+    under the name, so an interrupted backfill resumes after the last committed batch and a finished one
+    doesn't run again. pause is the sleep in seconds between the batches, leaving room to the other
+    queries and the replicas. batch_size and pause default to BACKFILL_BATCH_SIZE and BACKFILL_PAUSE.
+
+    A RunPython migration must be non-atomic and pass its schema_editor, and its reverse code should
+    reset_checkpoint() the name. Return the number of updated rows.
+    """
+    batch_size = batch_size or settings.BACKFILL_BATCH_SIZE
+    pause = settings.BACKFILL_PAUSE if pause is None else pause
+    using = queryset.db
+    ensure_checkpoint_table(using, schema_editor)
+    checkpoints = get_checkpoint_model().objects.using(using)
+    checkpoint, _ = checkpoints.get_or_create(name=name)
+    manager = queryset.model._base_manager.db_manager(using)
+    queryset = queryset.order_by('pk')
+    updated = 0
+
+    while not checkpoint.done:
+        batch = queryset
+        if checkpoint.last_pk:
+            batch = batch.filter(pk__gt=checkpoint.last_pk)
+        with transaction.atomic(using=using):
+            # Locked until the batch commits, so the rows written back don't overwrite concurrent changes
+            objects = list(batch.select_for_update()[:batch_size])
+            if objects:
+                update(objects)
+                manager.bulk_update(objects, fields)
+                checkpoint.last_pk = str(objects[-1].pk)
+                checkpoint.rows += len(objects)
+            else:
+                checkpoint.done = True
+            checkpoint.save()
+        updated += len(objects)
+        if objects:
+            logger.info("Backfill %s: %s rows, up to pk %s", name, checkpoint.rows, checkpoint.last_pk)
+            if pause:
+                time.sleep(pause)
+    return updated
+
+
+def reset_checkpoint(name, using='default', schema_editor=None):
+    """
+    Forget the progress of the backfill, so that it runs over all the rows again. The reverse code of
+    a data migration calls it with its schema_editor.
+    """
+    ensure_checkpoint_table(using, schema_editor)
+    get_checkpoint_model().objects.using(using).filter(name=name).delete()
@@ -0,0 +1,122 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+
+from .models import Profile, Post, Photo
+
+FIRST_NAMES = ['Anna', 'Boris', 'Clara', 'Denis', 'Elena', 'Fedor', 'Galina', 'Igor', 'Julia', 'Kirill']
+LAST_NAMES = ['Ivanov', 'Petrova', 'Sidorov', 'Smirnova', 'Kuznetsov', 'Popova', 'Vasiliev', 'Sokolova']
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Run the block against a throwaway test database, so benchmarks never touch real data"""
+
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb, aliases=['default'])
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+def seed_profiles(count, start=0, batch_size=5000, password='!'):
+    """Bulk create users with profiles numbered from start to start + count, password is the hash of the passwords"""
+
+    UserModel = get_user_model()
+    for offset in range(start, start + count, batch_size):
+        numbers = range(offset, min(offset + batch_size, start + count))
+        users = UserModel.objects.bulk_create(
+            UserModel(email=f'bench{i}@example.com', password=password) for i in numbers
+        )
+        if not all(user.pk for user in users):
+            users = UserModel.objects.filter(email__in=[f'bench{i}@example.com' for i in numbers]).order_by('id')
+        Profile.objects.bulk_create(
+            Profile(
+                gramm_user=user,
+                first_name=FIRST_NAMES[i % len(FIRST_NAMES)],
+                last_name=f'{LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]}{i}',
+                identifier=f'bench-{i}',
+            )
+            for i, user in zip(numbers, users)
+        )
+        Profile.get_identifier_allocator().claim([f'bench-{i}' for i in numbers])
+
+
+def seed_posts(profiles, posts_per_profile, photos_per_post, batch_size=5000):
+    """Bulk create posts with photos for the profiles, the photos refer to files that are never read"""
+
+    slugs = []
+    for offset in range(0, len(profiles), batch_size):
+        batch = profiles[offset:offset + batch_size]
+        posts = Post.objects.bulk_create(
+            Post(profile_id=pk, title=f'Benchmark post {n}', slug=f'bench-{pk}-{n}', photo_count=photos_per_post)
+            for pk in batch for n in range(posts_per_profile)
+        )
+        slugs.extend(post.slug for post in posts)
+        if not all(post.pk for post in posts):
+            posts = Post.objects.filter(profile_id__in=batch)
+        Photo.objects.bulk_create(
+            (Photo(post_id=post.pk, photo=f'bench/{post.slug}-{n}.jpg', rendered=True)
+             for post in posts for n in range(photos_per_post)),
+            batch_size=batch_size,
+        )
+        Profile.objects.filter(pk__in=batch).update(
+            post_count=posts_per_profile, photo_count=posts_per_profile * photos_per_post
+        )
+    Post.get_slug_allocator().claim(slugs)
+
+
+def measure(func, repeat=20, warmup=2):
+    """Call func repeatedly and return the latency summary in milliseconds"""
+
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def measure_requests(request, repeat=20, warmup=2):
+    """
+    Call request(number) repeatedly and return the latency summary in milliseconds with the throughput
+    in requests per second, the number of queries per request and the count of the response status codes
+    """
+    for number in range(warmup):
+        request(number)
+    samples, queries, statuses = [], [], {}
+    started = time.perf_counter()
+    for number in range(warmup, warmup + repeat):
+        with CaptureQueriesContext(connection) as captured:
+            request_started = time.perf_counter()
+            response = request(number)
+            samples.append((time.perf_counter() - request_started) * 1000)
+        queries.append(len(captured))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(samples),
+        'throughput': round(repeat / elapsed, 1),
+        'queries': {'mean': round(statistics.mean(queries), 1), 'max': max(queries)},
+        'statuses': statuses,
+    }
+
+
+def summarize(samples):
+    """Return p50/p95/p99 of the latency samples"""
+
+    if len(samples) < 2:
+        samples = samples * 2
+    percentiles = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'count': len(samples),
+        'p50': round(percentiles[49], 3),
+        'p95': round(percentiles[94], 3),
+        'p99': round(percentiles[98], 3),
+    }
@@ -0,0 +1,89 @@
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.encoding import force_str
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+
+def get_version_key(profile_pk):
+    return f'fragment-version:profile:{profile_pk}'
+
+
+def get_versions(profile_pks):
+    """Return the current fragment versions of the profiles, creating the missing ones"""
+
+    cache = get_cache()
+    keys = {get_version_key(pk): pk for pk in profile_pks}
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, settings.FRAGMENT_CACHE_TIMEOUT)
+    return {keys[key]: version for key, version in {**found, **missing}.items()}
+
+
+def invalidate_profile(profile_pk):
+    """Move the fragments of the profile to a new version once the current transaction is committed"""
+
+    transaction.on_commit(lambda: get_cache().set(
+        get_version_key(profile_pk), uuid.uuid4().hex, settings.FRAGMENT_CACHE_TIMEOUT
+    ))
+
+
+def get_fragment_timeout():
+    """
+    Return the timeout of the rendered fragments. The signed media URLs embedded in them stay valid
+    for at least MEDIA_URL_MAX_AGE, so the fragments aren't cached longer than that.
+    """
+    timeout = settings.FRAGMENT_CACHE_TIMEOUT
+    if settings.MEDIA_URL_SIGNED and settings.MEDIA_URL_MAX_AGE:
+        timeout = min(timeout, settings.MEDIA_URL_MAX_AGE)
+    return timeout
+
+
+def get_fragment(name, vary_on, render, versions=None):
+    """
+    Return the cached fragment or render and cache it.
+
+    If vary_on isn't empty, its first element is the pk of the profile the fragment shows, and the
+    fragment is cached under the current version of that profile.
+    """
+    cache = get_cache()
+    parts = [force_str(value) for value in vary_on]
+    if vary_on:
+        version = (versions or {}).get(vary_on[0]) or get_versions([vary_on[0]])[vary_on[0]]
+        parts.insert(1, version)
+    key = ':'.join(['fragment', name] + parts)
+
+    content = cache.get(key)
+    hit = content is not None
+    with _stats_lock:
+        _stats[(name, 'hit' if hit else 'miss')] += 1
+    if not hit:
+        content = render()
+        cache.set(key, content, get_fragment_timeout())
+    return content
+
+
+def get_stats():
+    """Return the hit and miss counts of this process by fragment name"""
+
+    with _stats_lock:
+        stats = {}
+        for (name, result), count in _stats.items():
+            stats.setdefault(name, {'hit': 0, 'miss': 0})[result] = count
+        return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
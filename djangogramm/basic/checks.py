@@ -0,0 +1,162 @@
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin
+from django.core.cache import caches
+from django.core.checks import Warning, register
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+from django.utils.module_loading import import_string
+from whitenoise.storage import CompressedManifestStaticFilesStorage, CompressedStaticFilesMixin
+
+# Deployment checks of the settings known to slow the site down, run by "manage.py check_performance"
+PERFORMANCE = 'performance'
+
+UNSHARED_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SLOW_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.file',
+)
+
+
+def get_cache_aliases():
+    """The caches the site relies on, with the settings using them"""
+
+    aliases = {}
+    used = [('AUTH_CACHE_ALIAS', settings.AUTH_CACHE_ALIAS), ('FRAGMENT_CACHE_ALIAS', settings.FRAGMENT_CACHE_ALIAS)]
+    if settings.SESSION_ENGINE.startswith('django.contrib.sessions.backends.cache'):
+        used.append(('SESSION_CACHE_ALIAS', settings.SESSION_CACHE_ALIAS))
+    for setting, alias in used:
+        aliases.setdefault(alias, []).append(setting)
+    return aliases
+
+
+@register(PERFORMANCE, deploy=True)
+def check_debug(app_configs, **kwargs):
+    if settings.DEBUG:
+        return [Warning(
+            "DEBUG is on, so the templates aren't cached and every SQL query is kept in memory.",
+            hint="Run with DJANGO_SETTINGS_MODULE=djangogramm.settings_production.",
+            id='basic.W101',
+        )]
+    return []
+
+
+@register(PERFORMANCE, deploy=True)
+def check_template_loaders(app_configs, **kwargs):
+    errors = []
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates) and not all(
+                isinstance(loader, CachedLoader) for loader in engine.engine.template_loaders):
+            errors.append(Warning(
+                f"The templates of the {engine.name!r} engine are compiled again for every response.",
+                hint="Wrap the loaders in django.template.loaders.cached.Loader.",
+                id='basic.W102',
+            ))
+    return errors
+
+
+@register(PERFORMANCE, deploy=True)
+def check_database_connections(app_configs, **kwargs):
+    errors = []
+    for connection in connections.all():
+        if connection.vendor == 'sqlite':
+            continue
+        if not connection.settings_dict['CONN_MAX_AGE']:
+            errors.append(Warning(
+                f"The {connection.alias!r} database is connected to for every request.",
+                hint="Keep the connections open with CONN_MAX_AGE.",
+                id='basic.W103',
+            ))
+        elif not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            errors.append(Warning(
+                f"A broken persistent connection to the {connection.alias!r} database fails the next request.",
+                hint="Set CONN_HEALTH_CHECKS along with CONN_MAX_AGE.",
+                id='basic.W104',
+            ))
+    return errors
+
+
+@register(PERFORMANCE, deploy=True)
+def check_caches(app_configs, **kwargs):
+    errors = []
+    for alias, used_by in get_cache_aliases().items():
+        if settings.CACHES[alias]['BACKEND'] in UNSHARED_CACHES:
+            errors.append(Warning(
+                f"The {alias!r} cache of {', '.join(used_by)} isn't shared by the processes, so each of them "
+                f"misses on its own and doesn't see the invalidations made by the others.",
+                hint="Use memcached, or another cache shared by all the processes.",
+                id='basic.W105',
+            ))
+            continue
+        try:
+            cache = caches[alias]
+            cache.set('check-performance', 1, 10)
+            reachable = cache.get('check-performance') == 1
+            cache.delete('check-performance')
+        except Exception as error:
+            reachable = False
+            reason = f"{type(error).__name__}: {error}"
+        else:
+            reason = "the values aren't kept"
+        if not reachable:
+            errors.append(Warning(
+                f"The {alias!r} cache of {', '.join(used_by)} is unreachable ({reason}), "
+                f"so every request falls back to the database.",
+                id='basic.W106',
+            ))
+    return errors
+
+
+@register(PERFORMANCE, deploy=True)
+def check_session_engine(app_configs, **kwargs):
+    if settings.SESSION_ENGINE in SLOW_SESSION_ENGINES:
+        return [Warning(
+            f"{settings.SESSION_ENGINE} reads the session of every request from the storage.",
+            hint="Use django.contrib.sessions.backends.cached_db.",
+            id='basic.W107',
+        )]
+    return []
+
+
+@register(PERFORMANCE, deploy=True)
+def check_static_storage(app_configs, **kwargs):
+    storage = import_string(settings.STATICFILES_STORAGE)
+    compressed = issubclass(storage, (CompressedStaticFilesMixin, CompressedManifestStaticFilesStorage))
+    if not issubclass(storage, ManifestFilesMixin) or not compressed:
+        return [Warning(
+            "The static files are served without hashed names or without compressed versions, "
+            "so the browsers can't cache them for good or download them in full.",
+            hint="Use whitenoise.storage.CompressedManifestStaticFilesStorage.",
+            id='basic.W108',
+        )]
+    return []
+
+
+@register(PERFORMANCE, deploy=True)
+def check_media_serving(app_configs, **kwargs):
+    served = not re.match(r'^(https?:)?//', settings.MEDIA_URL)
+    if served and not settings.MEDIA_SERVE_OFFLOAD:
+        return [Warning(
+            "The media files are streamed by the application processes.",
+            hint="Serve MEDIA_URL from another host, or hand the files over to the web server "
+                 "with MEDIA_SERVE_OFFLOAD.",
+            id='basic.W109',
+        )]
+    return []
+
+
+@register(PERFORMANCE, deploy=True)
+def check_instrumentation(app_configs, **kwargs):
+    if 'basic.middleware.InstrumentationMiddleware' in settings.MIDDLEWARE:
+        return [Warning(
+            "Every SQL query is timed and fingerprinted by the instrumentation.",
+            hint="Unset INSTRUMENTATION unless the views are being profiled.",
+            id='basic.W110',
+        )]
+    return []
@@ -0,0 +1,31 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Profile, Post, Photo, Follow
+
+
+def count_of(model, lookup):
+    """Number of the rows of the model related to the outer row by the lookup"""
+
+    rows = model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(lookup)
+    return Coalesce(Subquery(rows.annotate(count=Count('*')).values('count')), 0)
+
+
+def get_counters(model):
+    """Return the expressions counting the actual values of the denormalized counters of the model"""
+
+    if model is Profile:
+        return {
+            'post_count': count_of(Post, 'profile'),
+            'photo_count': count_of(Photo, 'post__profile'),
+            'follower_count': count_of(Follow, 'followee'),
+        }
+    if model is Post:
+        return {'photo_count': count_of(Photo, 'post')}
+    raise ValueError(f"{model.__name__} has no counters")
+
+
+def recount(model, pks):
+    """Set the counters of the rows to the actual counts with one UPDATE"""
+
+    return model.objects.filter(pk__in=pks).update(**get_counters(model))
@@ -0,0 +1,52 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
+from .models import Follow, Photo, Post, TimelineEntry
+from .pagination import KeysetPage, KeysetPaginator
+
+
+class FeedPaginator:
+    """
+    Cursor pagination of the home feed of a profile.
+
+    A page merges the timeline rows of the profile with the posts of the followed profiles
+    which weren't fanned out as their authors had too many followers, each read with a range scan of its index.
+    Cursors have the same format as the cursors of posts ordered by ``('-time_create', '-id')``.
+    """
+
+    def __init__(self, profile, per_page):
+        self.per_page = per_page
+        self.timeline = KeysetPaginator(
+            TimelineEntry.objects.filter(owner=profile).select_related('post__profile'),
+            ('-time_create', '-post'), per_page,
+        )
+        self.pulled = KeysetPaginator(
+            Post.objects.filter(
+                fanned_out=False, profile__in=Follow.objects.filter(follower=profile).values('followee'),
+            ).select_related('profile'),
+            ('-time_create', '-id'), per_page,
+        )
+
+    def encode_cursor(self, post):
+        return self.pulled.encode_cursor(post)
+
+    def page(self, before=None, after=None):
+        """Return the page right after the ``after`` cursor or right before the ``before`` cursor"""
+
+        pushed, pulled = self.timeline.page(before, after), self.pulled.page(before, after)
+        posts = {entry.post.pk: entry.post for entry in pushed}
+        posts.update((post.pk, post) for post in pulled)
+        object_list = sorted(posts.values(), key=lambda post: (post.time_create, post.pk), reverse=True)
+
+        if before:
+            has_previous = pushed.has_previous or pulled.has_previous or len(object_list) > self.per_page
+            object_list = object_list[-self.per_page:]
+            has_next = True
+        else:
+            has_next = pushed.has_next or pulled.has_next or len(object_list) > self.per_page
+            object_list = object_list[:self.per_page]
+            has_previous = bool(after)
+
+        prefetch_related_objects(
+            object_list, Prefetch('photo_set', queryset=Photo.objects.order_by('pk'), to_attr='photos')
+        )
+        return KeysetPage(object_list, self, has_next=has_next, has_previous=has_previous)
@@ -1,22 +1,52 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import capfirst
 from django.contrib.auth import (
     authenticate, get_user_model
 )
 
+from PIL import Image
+
 from .models import Profile, Post, Photo
 
 
 UserModel = get_user_model()
 
 
+class UploadedImageField(forms.ImageField):
+    """
+    Image field relying on the header and dimension checks made by ImageUploadHandler, the image is only
+    decoded once more to reject the truncated and corrupted files, verify() alone misses them in JPEG and GIF
+    """
+
+    def to_python(self, data):
+        if getattr(data, 'upload_error', None):
+            raise ValidationError(data.upload_error, code='invalid_image')
+        if getattr(data, 'image_format', None) is None:
+            return super().to_python(data)
+
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        try:
+            with Image.open(data) as image:
+                image.load()
+        except Exception as exc:
+            raise ValidationError(self.error_messages['invalid_image'], code='invalid_image') from exc
+        finally:
+            data.seek(0)
+        f.content_type = Image.MIME.get(data.image_format)
+        return f
+
+
 class CreateProfileForm(forms.ModelForm):
 
     class Meta:
         model = Profile
         fields = ('first_name', 'last_name', 'identifier', 'bio', 'avatar')
+        field_classes = {'avatar': UploadedImageField}
         widgets = {
             'bio': forms.Textarea(attrs={'cols': 60, 'rows': 10, 'style': 'resize:none;'}),
         }
@@ -29,6 +59,7 @@ class UpdateProfileForm(forms.ModelForm):
     class Meta:
         model = Profile
         fields = ('first_name', 'last_name', 'identifier', 'bio', 'avatar')
+        field_classes = {'avatar': UploadedImageField}
         widgets = {
             'bio': forms.Textarea(attrs={'cols': 60, 'rows': 10, 'style': 'resize:none;'}),
         }
@@ -47,20 +78,24 @@ class CreatePostForm(forms.ModelForm):
             'title': forms.Textarea(attrs={'cols': 70, 'rows': 1, 'style': 'resize:none;'}),
         }
 
-    photos = forms.ImageField(label=_("Photos"), widget=forms.ClearableFileInput(attrs={'multiple': True}))
+    photos = UploadedImageField(label=_("Photos"), widget=forms.ClearableFileInput(attrs={'multiple': True}))
 
     def clean_photos(self):
         photos = self.files.getlist('photos')
         if len(photos) > 10:
             raise ValidationError("The number of photos in a post is limited to 10")
+        # The field itself checks only the last of the files
+        for photo in photos:
+            self.fields['photos'].clean(photo)
         return photos
 
     def save(self, commit=True):
         post = super(CreatePostForm, self).save(commit=False)
         post.profile = self.profile
         if commit:
-            post.save()
-            [Photo.objects.create(photo=photo, post=post) for photo in self.files.getlist('photos')]
+            with transaction.atomic():
+                post.save()
+                Photo.objects.bulk_create_for_post(post, self.files.getlist('photos'))
         return post
 
 
@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Upper bounds of the histogram buckets, the last bucket holds everything above
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Distinct duplicated queries kept per view, so that the memory stays bounded
+MAX_FINGERPRINTS = 100
+
+# The receiver wrapping the queries of new connections, connected by enable()
+DISPATCH_UID = 'basic.instrumentation.install'
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+
+# Recorder of the current request, seen by the worker threads of sync_to_async() in the ASGI mode as well
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def get_fingerprint(sql):
+    """The SQL without its parameters, "IN (%s, %s)" lists of any length are the same query"""
+
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """Wrap the queries of the connection, first so that execute_wrapper() blocks still pop their own wrappers"""
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def enable():
+    """Wrap the queries of the connections opened from now on, called by the middleware once it's enabled"""
+
+    connection_created.connect(install, dispatch_uid=DISPATCH_UID)
+
+
+def get_view_name(view_func):
+    """"UserProfileView" for class-based views, the qualified function name otherwise"""
+
+    view_class = getattr(view_func, 'view_class', None)
+    if view_class is not None:
+        return view_class.__name__
+    return getattr(view_func, '__qualname__', None) or type(view_func).__name__
+
+
+class Histogram:
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the percentile, None if it's above the last bound"""
+
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.bounds] + ['+Inf']
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 2) if self.count else None,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class RequestRecorder:
+    """Queries, SQL time and template time of a single request, times in seconds"""
+
+    def __init__(self):
+        self.view_name = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[get_fingerprint(sql)] += 1
+
+    @contextmanager
+    def capture(self):
+        """Record the queries of the block, in this thread and in the threads it runs sync code in"""
+
+        started = time.perf_counter()
+        for connection in connections.all():
+            install(connection)
+        token = current_recorder.set(self)
+        try:
+            yield self
+        finally:
+            current_recorder.reset(token)
+            self.total_time = time.perf_counter() - started
+
+    @property
+    def duplicates(self):
+        return {fingerprint: count for fingerprint, count in self.fingerprints.items() if count > 1}
+
+    def server_timing(self):
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'template;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = Histogram(DURATION_BUCKETS)
+        self.template_time = Histogram(DURATION_BUCKETS)
+        # fingerprint -> [requests repeating it, repeated executions, most executions in a request]
+        self.duplicates = {}
+
+    def add(self, recorder):
+        self.duration.add(recorder.total_time * 1000)
+        self.queries.add(recorder.queries)
+        self.sql_time.add(recorder.sql_time * 1000)
+        self.template_time.add(recorder.template_time * 1000)
+        for fingerprint, count in recorder.duplicates.items():
+            duplicate = self.duplicates.get(fingerprint)
+            if duplicate is None:
+                if len(self.duplicates) >= MAX_FINGERPRINTS:
+                    continue
+                duplicate = self.duplicates[fingerprint] = [0, 0, 0]
+            duplicate[0] += 1
+            duplicate[1] += count - 1
+            duplicate[2] = max(duplicate[2], count)
+
+
+class Stats:
+    """Per-view statistics of the requests served by this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.started = time.time()
+
+    def record(self, recorder):
+        view_name = recorder.view_name or '<unresolved>'
+        with self.lock:
+            view = self.views.get(view_name)
+            if view is None:
+                view = self.views[view_name] = ViewStats()
+            view.add(recorder)
+
+    def top_duplicates(self, limit=10):
+        """The queries repeated most within requests of the same view, most likely N+1 queries"""
+
+        with self.lock:
+            rows = [
+                {'view': view_name, 'fingerprint': fingerprint, 'requests': requests,
+                 'repeated': repeated, 'max_per_request': most}
+                for view_name, view in self.views.items()
+                for fingerprint, (requests, repeated, most) in view.duplicates.items()
+            ]
+        rows.sort(key=lambda row: (row['repeated'], row['max_per_request']), reverse=True)
+        return rows[:limit]
+
+    def snapshot(self, duplicates=10):
+        with self.lock:
+            views = {
+                view_name: {
+                    'duration_ms': view.duration.as_dict(),
+                    'queries': view.queries.as_dict(),
+                    'sql_ms': view.sql_time.as_dict(),
+                    'template_ms': view.template_time.as_dict(),
+                }
+                for view_name, view in sorted(self.views.items())
+            }
+            started = self.started
+        return {
+            'pid': os.getpid(),
+            'since': started,
+            'views': views,
+            'n_plus_one': self.top_duplicates(duplicates),
+        }
+
+
+stats = Stats()
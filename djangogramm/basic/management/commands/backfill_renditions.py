@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from basic.models import RenditionJob
+from basic.renditions import RENDITION_FIELDS, get_image_field, is_up_to_date
+from basic.tasks import enqueue_renditions, drain
+
+
+class Command(BaseCommand):
+    help = "Queue rendering of the responsive renditions for the existing photos and avatars"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Render all files again, not only the ones missing renditions in the current settings")
+        parser.add_argument('--now', action='store_true', help="Render the queued files right away")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queued = 0
+
+        for label, (renditions_field, ready_field) in RENDITION_FIELDS.items():
+            field = get_image_field(label)
+            rows = field.model.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+            batch = set()
+            for file_name, renditions in rows.values_list(field.name, renditions_field).iterator(
+                    chunk_size=options['batch_size']):
+                if options['all'] or not is_up_to_date(renditions):
+                    batch.add(file_name)
+                if len(batch) >= options['batch_size']:
+                    queued += self.enqueue(batch, label)
+                    batch = set()
+            queued += self.enqueue(batch, label)
+
+        self.stdout.write(f"Queued {queued} files")
+        if options['now']:
+            done, failed = drain()
+            self.stdout.write(self.style.SUCCESS(f"Rendered {done} jobs, {failed} failed"))
+
+    def enqueue(self, file_names, label):
+        """Queue the files which aren't waiting for rendering already"""
+
+        file_names = file_names - set(RenditionJob.objects.filter(
+            field=label, status=RenditionJob.PENDING, file_name__in=file_names
+        ).values_list('file_name', flat=True))
+        enqueue_renditions(sorted(file_names), field=label)
+        return len(file_names)
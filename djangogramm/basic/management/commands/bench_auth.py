@@ -0,0 +1,65 @@
+import json
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from basic.benchmark import benchmark_database, seed_profiles, measure_requests
+from basic.models import Profile
+
+# Sessions in the database and the user queried by every request, as before the cached authentication
+UNCACHED = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MIDDLEWARE': ['django.contrib.auth.middleware.AuthenticationMiddleware'
+                   if name == 'basic.middleware.CachedAuthenticationMiddleware' else name
+                   for name in settings.MIDDLEWARE],
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare authenticated requests with the sessions and the users loaded from the database and from "
+            "the cache, for a number of logged in users in a throwaway database. Prints the results as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--clients', type=int, default=50, help='Logged in users making the requests')
+        parser.add_argument('--repeat', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmark_database():
+            seed_profiles(options['users'])
+            users = [profile.gramm_user for profile in
+                     Profile.objects.select_related('gramm_user').order_by('?')[:options['clients']]]
+            path = reverse('new-post')
+
+            for mode, overrides in (('database', UNCACHED), ('cache', {})):
+                with override_settings(**overrides):
+                    clients = []
+                    for user in users:
+                        client = Client()
+                        client.force_login(user)
+                        clients.append(client)
+                    choice = random.Random(options['seed']).choice
+                    # Every client makes one of the warmup requests, then they take turns at random
+                    results[mode] = measure_requests(
+                        lambda number: (clients[number] if number < len(clients) else choice(clients)).get(path),
+                        options['repeat'], warmup=len(clients),
+                    )
+                self.stderr.write(f"{mode}: p50 {results[mode]['p50']} ms, "
+                                  f"{results[mode]['queries']['mean']} queries per request")
+            database = connection.vendor
+
+        self.stdout.write(json.dumps({
+            'database': database,
+            'cache': settings.CACHES[settings.AUTH_CACHE_ALIAS]['BACKEND'],
+            'path': path,
+            'users': options['users'],
+            'clients': options['clients'],
+            'results': results,
+        }, indent=2))
@@ -0,0 +1,66 @@
+import itertools
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from basic.benchmark import benchmark_database, seed_profiles, measure
+from basic.feed import FeedPaginator
+from basic.models import Profile, Post, Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = "Measure publishing a post and reading the home feed by the number of followers in a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        counts = sorted(options['followers'])
+        batch_size = options['batch_size']
+        results = []
+        numbers = itertools.count()
+
+        with benchmark_database():
+            self.stderr.write(f"Seeding {counts[-1]} followers")
+            seed_profiles(counts[-1], batch_size=batch_size)
+            followers = list(Profile.objects.order_by('pk').values_list('pk', flat=True))
+            reader = Profile.objects.get(pk=followers[0])
+
+            for number, count in enumerate(counts):
+                seed_profiles(1, start=counts[-1] + number)
+                author = Profile.objects.latest('pk')
+                for offset in range(0, count, batch_size):
+                    Follow.objects.bulk_create(
+                        Follow(follower_id=pk, followee=author) for pk in followers[offset:offset + batch_size]
+                    )
+                Profile.objects.filter(pk=author.pk).update(follower_count=count)
+                author.refresh_from_db()
+
+                def publish():
+                    Post.objects.create(profile=author, title=f'benchmark {next(numbers)}')
+
+                def read():
+                    list(FeedPaginator(reader, per_page=12).page())
+
+                rows = TimelineEntry.objects.count()
+                with CaptureQueriesContext(connection) as publish_queries:
+                    publish()
+                result = {
+                    'followers': count,
+                    'mode': 'push' if count < settings.FEED_FANOUT_LIMIT else 'pull',
+                    'timeline_rows_per_post': TimelineEntry.objects.count() - rows,
+                    'publish': {**measure(publish, options['repeat']), 'queries': len(publish_queries)},
+                }
+                with CaptureQueriesContext(connection) as read_queries:
+                    read()
+                result['read'] = {**measure(read, options['repeat']), 'queries': len(read_queries)}
+                results.append(result)
+                self.stderr.write(f"{count} followers ({result['mode']}): publish p50 {result['publish']['p50']} ms, "
+                                  f"feed p50 {result['read']['p50']} ms")
+
+        self.stdout.write(json.dumps(results, indent=2))
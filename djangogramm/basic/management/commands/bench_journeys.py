@@ -0,0 +1,113 @@
+import io
+import json
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from basic.benchmark import benchmark_database, seed_profiles, seed_posts, measure_requests
+from basic.models import Profile
+
+PASSWORD = 'Benchmark-password-1'
+# Journeys by the names of the methods making their requests
+JOURNEYS = ('register', 'login', 'profile', 'people', 'create_post')
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway database and measure the main user journeys: registration, login, "
+            "profile page, people directory and post creation. Prints the results as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts-per-user', type=int, default=5)
+        parser.add_argument('--photos-per-post', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random choice of the profiles')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--journeys', nargs='+', choices=JOURNEYS, default=list(JOURNEYS))
+
+    def handle(self, *args, **options):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1024, 768), 'red').save(buffer, format='JPEG')
+        self.photo = buffer.getvalue()
+        self.random = random.Random(options['seed'])
+        media_root = tempfile.mkdtemp()
+        results = {}
+
+        try:
+            with override_settings(MEDIA_ROOT=media_root, RENDITION_WORKERS=0, EMAIL_OUTBOX_WORKERS=0,
+                                   EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), \
+                    benchmark_database():
+                started = time.perf_counter()
+                seed_profiles(options['users'], batch_size=options['batch_size'], password=make_password(PASSWORD))
+                self.profiles = list(
+                    Profile.objects.order_by('pk').values_list('pk', 'identifier', 'gramm_user__email')
+                )
+                seed_posts([pk for pk, _, _ in self.profiles], options['posts_per_user'], options['photos_per_post'],
+                           batch_size=options['batch_size'])
+                self.stderr.write(f"Seeded {options['users']} users in {time.perf_counter() - started:.1f} s")
+
+                for name in options['journeys']:
+                    results[name] = measure_requests(getattr(self, name), options['repeat'])
+                    self.stderr.write(f"{name}: p50 {results[name]['p50']} ms, p95 {results[name]['p95']} ms, "
+                                      f"{results[name]['queries']['mean']} queries")
+                database = connection.vendor
+        finally:
+            shutil.rmtree(media_root)
+
+        self.stdout.write(json.dumps({
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': database,
+            },
+            'dataset': {key: options[key] for key in ('users', 'posts_per_user', 'photos_per_post', 'seed')},
+            'repeat': options['repeat'],
+            'journeys': results,
+        }, indent=2))
+
+    def logged_in_client(self):
+        _, _, email = self.random.choice(self.profiles)
+        client = Client()
+        client.force_login(get_user_model().objects.get(email=email))
+        return client
+
+    def register(self, number):
+        return Client().post(reverse('django-registration-register'), {
+            'email': f'new{number}@example.com', 'password1': PASSWORD, 'password2': PASSWORD,
+        })
+
+    def login(self, number):
+        _, _, email = self.random.choice(self.profiles)
+        return Client().post(reverse('home'), {'email': email, 'password': PASSWORD})
+
+    def profile(self, number):
+        if number == 0:
+            self.client = self.logged_in_client()
+        _, identifier, _ = self.random.choice(self.profiles)
+        return self.client.get(reverse('user-profile', kwargs={'profile_identifier': identifier}))
+
+    def people(self, number):
+        if number == 0:
+            self.client = self.logged_in_client()
+        return self.client.get(reverse('people'))
+
+    def create_post(self, number):
+        if number == 0:
+            self.client = self.logged_in_client()
+        return self.client.post(reverse('new-post'), {
+            'title': f'New post {number}',
+            'photos': [SimpleUploadedFile(f'photo{number}.jpg', self.photo, content_type='image/jpeg')],
+        })
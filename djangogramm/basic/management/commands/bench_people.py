@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from basic.benchmark import benchmark_database, seed_profiles, measure
+from basic.models import Profile
+from basic.pagination import KeysetPaginator
+from basic.views import PeopleView
+
+
+class Command(BaseCommand):
+    help = "Measure the latency of the people directory for growing numbers of profiles in a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        results = []
+        with benchmark_database():
+            seed_profiles(1)
+            client = Client()
+            client.force_login(Profile.objects.get().gramm_user)
+            path = reverse('people')
+            paginator = KeysetPaginator(Profile.objects.all(), PeopleView.paginate_ordering, PeopleView.page_size)
+            seeded = 1
+
+            for size in sorted(options['sizes']):
+                seed_profiles(size - seeded, start=seeded)
+                seeded = size
+
+                deep_cursor = paginator.encode_cursor(Profile.objects.order_by(*paginator.ordering)[size // 2])
+                result = {
+                    'profiles': size,
+                    'first_page': measure(lambda: client.get(path), options['repeat']),
+                    'deep_page': measure(lambda: client.get(path, {'after': deep_cursor}), options['repeat']),
+                    'search': measure(lambda: client.get(path, {'q': 'Ele Pop'}), options['repeat']),
+                }
+                results.append(result)
+                self.stderr.write(f"{size} profiles: first page p50 {result['first_page']['p50']} ms, "
+                                  f"deep page p50 {result['deep_page']['p50']} ms, "
+                                  f"search p50 {result['search']['p50']} ms")
+
+        self.stdout.write(json.dumps(results, indent=2))
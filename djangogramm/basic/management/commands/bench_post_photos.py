@@ -0,0 +1,71 @@
+import io
+import itertools
+import json
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+from basic.benchmark import benchmark_database, seed_profiles, measure
+from basic.models import Profile, Post, Photo
+
+
+class Command(BaseCommand):
+    help = "Compare saving post photos one by one with the batched save path in a throwaway database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', nargs='+', type=int, default=[1, 10])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1024, 768), 'red').save(buffer, format='JPEG')
+        content = buffer.getvalue()
+        media_root = tempfile.mkdtemp()
+        results = []
+        # Unique titles give every post a slug counter of its own, like most posts in production
+        numbers = itertools.count()
+
+        uploads = itertools.count()
+
+        def files(count):
+            # Distinct content for every upload, as the blobs of identical photos are shared. The bytes appended
+            # after the end of the JPEG are ignored by the decoders, so each file is a valid image
+            return [SimpleUploadedFile(f'photo{i}.jpg', content + str(next(uploads)).encode(),
+                                       content_type='image/jpeg') for i in range(count)]
+
+        def one_by_one(count):
+            post = Post.objects.create(profile=profile, title=f'benchmark {next(numbers)}')
+            [Photo.objects.create(post=post, photo=photo) for photo in files(count)]
+
+        def batched(count):
+            post = Post.objects.create(profile=profile, title=f'benchmark {next(numbers)}')
+            Photo.objects.bulk_create_for_post(post, files(count))
+
+        try:
+            with override_settings(MEDIA_ROOT=media_root, RENDITION_WORKERS=0), benchmark_database():
+                seed_profiles(1)
+                profile = Profile.objects.get()
+
+                for count in options['photos']:
+                    result = {'photos': count}
+                    for name, save in (('one_by_one', one_by_one), ('batched', batched)):
+                        with CaptureQueriesContext(connection) as queries:
+                            save(count)
+                        result[name] = {
+                            **measure(lambda: save(count), options['repeat']),
+                            'queries': len(queries),
+                        }
+                    results.append(result)
+                    self.stderr.write(f"{count} photos: one by one p50 {result['one_by_one']['p50']} ms "
+                                      f"({result['one_by_one']['queries']} queries), "
+                                      f"batched p50 {result['batched']['p50']} ms "
+                                      f"({result['batched']['queries']} queries)")
+        finally:
+            shutil.rmtree(media_root)
+
+        self.stdout.write(json.dumps(results, indent=2))
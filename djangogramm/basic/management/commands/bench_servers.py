@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from basic.benchmark import benchmark_database, seed_profiles, seed_posts, summarize
+from basic.models import Profile
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = ("Compare the throughput of the WSGI and the ASGI handlers for concurrent clients reading profiles "
+            "and the people directory. Each mode runs in a subprocess of its own with SERVER_MODE set, against "
+            "a throwaway database, without a web server in front. Prints the results as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--worker', action='store_true', help='Run the benchmark of the current SERVER_MODE')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_worker(options)))
+            return
+
+        results = {}
+        for mode in options['modes']:
+            self.stderr.write(f"Running the {mode} mode")
+            command = [sys.executable, '-m', 'django', 'bench_servers', '--worker',
+                       '--requests', str(options['requests']), '--users', str(options['users']),
+                       '--concurrency', *map(str, options['concurrency'])]
+            process = subprocess.run(
+                command, cwd=settings.BASE_DIR, stdout=subprocess.PIPE,
+                env={**os.environ, 'SERVER_MODE': mode, 'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE']},
+            )
+            if process.returncode:
+                raise CommandError(f"The {mode} benchmark failed")
+            results[mode] = json.loads(process.stdout)
+        self.stdout.write(json.dumps({
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'users': options['users'],
+            'modes': results,
+        }, indent=2))
+
+    def run_worker(self, options):
+        results = []
+        with benchmark_database():
+            seed_profiles(options['users'])
+            seed_posts(list(Profile.objects.values_list('pk', flat=True)), 5, 2)
+            login = Client()
+            login.force_login(Profile.objects.order_by('pk').first().gramm_user)
+            identifiers = list(Profile.objects.order_by('pk').values_list('identifier', flat=True)[1:])
+            paths = [reverse('people') if number % 4 == 0 else
+                     reverse('user-profile', kwargs={'profile_identifier': identifiers[number % len(identifiers)]})
+                     for number in range(options['requests'])]
+
+            for concurrency in options['concurrency']:
+                run = self.run_asgi if settings.SERVER_MODE == 'asgi' else self.run_wsgi
+                started = time.perf_counter()
+                samples, statuses = run(paths, concurrency, login.cookies)
+                elapsed = time.perf_counter() - started
+                result = {
+                    'concurrency': concurrency,
+                    'throughput': round(len(paths) / elapsed, 1),
+                    'latency': summarize(samples),
+                    'statuses': statuses,
+                }
+                results.append(result)
+                self.stderr.write(f"{settings.SERVER_MODE}, {concurrency} clients: {result['throughput']} requests/s")
+        return results
+
+    def run_wsgi(self, paths, concurrency, cookies):
+        pending = iter(paths)
+
+        def client_loop():
+            client = Client()
+            client.cookies = cookies
+            samples, statuses = [], []
+            try:
+                for path in pending:
+                    started = time.perf_counter()
+                    statuses.append(client.get(path).status_code)
+                    samples.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+            return samples, statuses
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            clients = [executor.submit(client_loop) for _ in range(concurrency)]
+            return self.merge([future.result() for future in clients])
+
+    def run_asgi(self, paths, concurrency, cookies):
+        pending = iter(paths)
+
+        async def client_loop():
+            client = AsyncClient()
+            client.cookies = cookies
+            samples, statuses = [], []
+            for path in pending:
+                started = time.perf_counter()
+                statuses.append((await client.get(path)).status_code)
+                samples.append((time.perf_counter() - started) * 1000)
+            return samples, statuses
+
+        async def run_clients():
+            return await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+
+        return self.merge(asyncio.run(run_clients()))
+
+    def merge(self, clients):
+        samples = [sample for client_samples, _ in clients for sample in client_samples]
+        statuses = {}
+        for _, client_statuses in clients:
+            for status in client_statuses:
+                statuses[status] = statuses.get(status, 0) + 1
+        return samples, statuses
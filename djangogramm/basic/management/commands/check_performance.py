@@ -0,0 +1,24 @@
+from django.core import checks
+from django.core.management.base import BaseCommand
+
+from basic.checks import PERFORMANCE
+
+
+class Command(BaseCommand):
+    help = ("Fail if the deployment runs with a setting known to slow the site down: DEBUG, uncached templates, "
+            "a connection per request, an unshared or unreachable cache, database sessions, unhashed static files, "
+            "media streamed by Django or the instrumentation")
+    requires_system_checks = False
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-level', default='WARNING',
+                            choices=['CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG'],
+                            help='Message level failing the command, WARNING by default')
+
+    def handle(self, *args, **options):
+        self.check(
+            tags=[PERFORMANCE],
+            include_deployment_checks=True,
+            display_num_errors=True,
+            fail_level=getattr(checks, options['fail_level']),
+        )
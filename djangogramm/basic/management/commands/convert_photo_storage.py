@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from basic.models import Blob, Photo
+from basic.storage import get_content_hash, get_blob_name, get_image_file_names, delete_image_files, move_file
+
+
+class Command(BaseCommand):
+    help = "Move the photos stored in the post directories to the content-addressed storage, merging duplicates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        field = Photo._meta.get_field('photo')
+        moved = merged = missing = 0
+        last_pk = 0
+
+        while True:
+            photos = list(Photo.objects.filter(blob__isnull=True, pk__gt=last_pk).exclude(photo='')
+                          .order_by('pk')[:options['batch_size']])
+            if not photos:
+                break
+            last_pk = photos[-1].pk
+
+            for photo in photos:
+                name = photo.photo.name
+                if not field.storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"Photo {photo.pk}: file {name} is missing")
+                    continue
+                with field.storage.open(name) as f:
+                    digest = get_content_hash(f)
+
+                with transaction.atomic():
+                    blob = Blob.objects.filter(hash=digest).first()
+                    if blob is None:
+                        blob = Blob.objects.create(hash=digest, name=get_blob_name(digest, name))
+                        # The variations and renditions are moved along with the original
+                        for old_name, new_name in zip(get_image_file_names(name, field, photo.renditions),
+                                                      get_image_file_names(blob.name, field, photo.renditions)):
+                            move_file(field.storage, old_name, new_name)
+                        values = {}
+                        moved += 1
+                    else:
+                        transaction.on_commit(
+                            lambda name=name, renditions=photo.renditions: delete_image_files(name, field, renditions)
+                        )
+                        values = Photo.objects.filter(blob=blob).values('rendered', 'renditions').first() or {}
+                        merged += 1
+                    Blob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+                    Photo.objects.filter(pk=photo.pk).update(blob=blob, photo=blob.name, **values)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} photos, merged {merged} duplicates, {missing} files are missing"
+        ))
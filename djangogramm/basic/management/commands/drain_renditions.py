@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from basic.models import RenditionJob
+from basic.tasks import drain
+
+
+class Command(BaseCommand):
+    help = "Render the image variations waiting in the rendition queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Maximum number of jobs to run")
+        parser.add_argument('--retry-failed', action='store_true', help="Queue the failed jobs again")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = RenditionJob.objects.filter(status=RenditionJob.FAILED).update(
+                status=RenditionJob.PENDING, attempts=0
+            )
+            self.stdout.write(f"Queued {retried} failed jobs again")
+
+        done, failed = drain(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Rendered {done} jobs, {failed} failed"))
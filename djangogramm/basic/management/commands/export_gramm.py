@@ -0,0 +1,59 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from basic.models import Profile, Post, Photo
+from basic.transfer import RecordWriter
+
+
+class Command(BaseCommand):
+    help = "Export users, profiles, posts and photos as NDJSON or CSV records readable by import_gramm"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='File to write, "-" for the standard output')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='Format of the records, by default guessed from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        batch_size = options['batch_size']
+        # Record fields by the queried values
+        exports = (
+            ('user', get_user_model().objects.all(), {
+                'email': 'email', 'password': 'password_hash', 'is_active': 'is_active', 'date_joined': 'date_joined',
+            }),
+            ('profile', Profile.objects.all(), {
+                'gramm_user__email': 'email', 'first_name': 'first_name', 'last_name': 'last_name', 'bio': 'bio',
+                'avatar': 'avatar', 'avatar_renditions': 'avatar_renditions', 'identifier': 'identifier',
+            }),
+            ('post', Post.objects.all(), {
+                'profile__gramm_user__email': 'email', 'title': 'title', 'slug': 'slug', 'time_create': 'time_create',
+            }),
+            ('photo', Photo.objects.all(), {
+                'post__slug': 'post', 'photo': 'photo', 'rendered': 'rendered', 'renditions': 'renditions',
+            }),
+        )
+
+        started = time.monotonic()
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            writer = RecordWriter(stream, fmt)
+            for record_type, queryset, fields in exports:
+                count = 0
+                rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=batch_size)
+                for row in rows:
+                    writer.write({'type': record_type, **{
+                        name: value for name, value in zip(fields.values(), row) if value not in (None, '')
+                    }})
+                    count += 1
+                    if count % batch_size == 0:
+                        self.stderr.write(f"{count} {record_type}s exported")
+                self.stderr.write(f"{count} {record_type}s exported in {time.monotonic() - started:.1f} s")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from basic.cache import invalidate_profile
+from basic.counters import recount
+from basic.media import is_hashed_name
+from basic.models import Profile, Post, Photo, Blob, RenditionJob, TimelineEntry
+from basic.storage import get_blob_name
+from basic.tasks import enqueue_renditions
+from basic.transfer import RECORD_FIELDS, read_records, parse_bool, parse_time
+
+
+def allocate(allocator, records, field, default, get_value):
+    """Keep the slugs given in the records and reserve the missing ones, a few queries per batch"""
+
+    allocator.claim([record[field] for record in records if record.get(field)])
+    reserved = iter(allocator.allocate([get_value(record) for record in records if not record.get(field)], default))
+    return [record.get(field) or next(reserved) for record in records]
+
+
+class Command(BaseCommand):
+    help = ("Import users, profiles, posts and photos from NDJSON or CSV records in batches, "
+            "see basic.transfer for the record fields. The photo files must be in the storage already.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, "-" for the standard input')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='Format of the records, by default guessed from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--hash-workers', type=int, default=0,
+                            help='Processes hashing the plain text passwords, 0 hashes them in this process')
+        parser.add_argument('--skip-existing', action='store_true', help='Skip the users whose email exists')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        self.batch_size = options['batch_size']
+        self.skip_existing = options['skip_existing']
+        self.counts = Counter()
+        self.started = time.monotonic()
+        self.touched_posts, self.touched_profiles = set(), set()
+        self.enqueued = set()
+        self.hash_workers = options['hash_workers']
+        self.pool = ProcessPoolExecutor(self.hash_workers) if self.hash_workers else None
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            batch, batch_type = [], None
+            for number, record in enumerate(read_records(stream, fmt), 1):
+                record_type = record.get('type')
+                if record_type not in RECORD_FIELDS:
+                    raise CommandError(f"Record {number} has unknown type {record_type!r}")
+                # Records go in batches of one type, so the rows they refer to are inserted before them
+                if batch and (record_type != batch_type or len(batch) >= self.batch_size):
+                    self.flush(batch_type, batch)
+                    batch = []
+                batch_type = record_type
+                batch.append(record)
+            if batch:
+                self.flush(batch_type, batch)
+            self.recount()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.pool:
+                self.pool.shutdown()
+
+        summary = ', '.join(f"{count} {record_type}s" for record_type, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Imported {summary or 'nothing'} "
+                                             f"in {time.monotonic() - self.started:.1f} s"))
+
+    def flush(self, record_type, records):
+        with transaction.atomic():
+            getattr(self, f'import_{record_type}s')(records)
+        self.counts[record_type] += len(records)
+        elapsed = time.monotonic() - self.started
+        self.stderr.write(f"{self.counts[record_type]} {record_type}s imported, "
+                          f"{sum(self.counts.values()) / elapsed:.0f} records/s")
+
+    def hash_passwords(self, passwords):
+        if self.pool and passwords:
+            chunk_size = max(1, len(passwords) // (self.hash_workers * 4))
+            return list(self.pool.map(make_password, passwords, chunksize=chunk_size))
+        return [make_password(password) for password in passwords]
+
+    def get_pks(self, queryset, key, keys):
+        pks = dict(queryset.filter(**{f'{key}__in': set(keys)}).values_list(key, 'pk'))
+        missing = set(keys) - set(pks)
+        if missing:
+            raise CommandError(f"{queryset.model._meta.verbose_name.capitalize()} not found: "
+                               f"{', '.join(sorted(missing)[:10])}")
+        return pks
+
+    def import_users(self, records):
+        UserModel = get_user_model()
+        hashes = iter(self.hash_passwords(
+            [record['password'] for record in records if record.get('password') and not record.get('password_hash')]
+        ))
+        users = []
+        for record in records:
+            if record.get('password_hash'):
+                password = record['password_hash']
+            elif record.get('password'):
+                password = next(hashes)
+            else:
+                password = make_password(None)
+            users.append(UserModel(
+                email=UserModel.objects.normalize_email(record['email']),
+                password=password,
+                is_active=parse_bool(record.get('is_active'), default=True),
+                date_joined=parse_time(record.get('date_joined')) or timezone.now(),
+            ))
+        UserModel.objects.bulk_create(users, ignore_conflicts=self.skip_existing)
+
+    def import_profiles(self, records):
+        UserModel = get_user_model()
+        users = self.get_pks(UserModel.objects.all(), 'email', [record['email'] for record in records])
+        identifiers = allocate(Profile.get_identifier_allocator(), records, 'identifier', 'profile',
+                               lambda record: slugify(f"{record['first_name']} {record['last_name']}"))
+        profiles = Profile.objects.bulk_create(
+            Profile(
+                gramm_user_id=users[record['email']],
+                first_name=record['first_name'],
+                last_name=record['last_name'],
+                bio=record.get('bio') or '',
+                avatar=record.get('avatar') or None,
+                avatar_renditions=record.get('avatar_renditions') or {},
+                identifier=identifier,
+            )
+            for record, identifier in zip(records, identifiers)
+        )
+        self.enqueue([profile.avatar.name for profile in profiles if profile.avatar and not profile.avatar_renditions],
+                     RenditionJob.AVATAR)
+
+    def import_posts(self, records):
+        emails = {record['email'] for record in records}
+        profiles = {email: (pk, f"{first_name} {last_name}", follower_count)
+                    for email, pk, first_name, last_name, follower_count in
+                    Profile.objects.filter(gramm_user__email__in=emails).values_list(
+                        'gramm_user__email', 'pk', 'first_name', 'last_name', 'follower_count')}
+        missing = emails - set(profiles)
+        if missing:
+            raise CommandError(f"Profile not found: {', '.join(sorted(missing)[:10])}")
+
+        slugs = allocate(Post.get_slug_allocator(), records, 'slug', 'post',
+                         lambda record: slugify(f"{profiles[record['email']][1]} {record['title']}"))
+        Post.objects.bulk_create(
+            Post(profile_id=profiles[record['email']][0], title=record['title'], slug=slug,
+                 fanned_out=profiles[record['email']][2] < settings.FEED_FANOUT_LIMIT)
+            for record, slug in zip(records, slugs)
+        )
+        # auto_now_add overrides time_create on insert, the original times are written afterwards
+        times = {slug: parse_time(record['time_create'])
+                 for record, slug in zip(records, slugs) if record.get('time_create')}
+        posts = list(Post.objects.filter(slug__in=slugs).only('pk', 'profile', 'slug', 'time_create', 'fanned_out'))
+        for post in posts:
+            post.time_create = times.get(post.slug, post.time_create)
+        if times:
+            Post.objects.bulk_update([post for post in posts if post.slug in times], ['time_create'])
+        # bulk_create() sends no signals, the posts are copied to the timelines here
+        TimelineEntry.objects.fan_out_batch(posts)
+        self.touched_profiles.update(pk for pk, _, _ in profiles.values())
+
+    def import_photos(self, records):
+        posts = {slug: (pk, profile_id) for slug, pk, profile_id in
+                 Post.objects.filter(slug__in={record['post'] for record in records}).values_list(
+                     'slug', 'pk', 'profile_id')}
+        missing = {record['post'] for record in records} - set(posts)
+        if missing:
+            raise CommandError(f"Post not found: {', '.join(sorted(missing)[:10])}")
+
+        # Content-addressed files are shared through their blobs, which count the photos using them
+        digests = {}
+        for record in records:
+            name = record['photo']
+            digest = os.path.splitext(os.path.basename(name))[0]
+            if is_hashed_name(name) and get_blob_name(digest, name) == name:
+                digests[name] = digest
+        Blob.objects.bulk_create([Blob(hash=digest, name=name) for name, digest in digests.items()],
+                                 ignore_conflicts=True)
+        blobs = dict(Blob.objects.filter(hash__in=digests.values()).values_list('hash', 'pk'))
+        references = Counter(blobs[digests[record['photo']]] for record in records if record['photo'] in digests)
+        for pk, count in references.items():
+            Blob.objects.filter(pk=pk).update(refcount=F('refcount') + count)
+
+        photos = Photo.objects.bulk_create(
+            Photo(
+                post_id=posts[record['post']][0],
+                photo=record['photo'],
+                blob_id=blobs[digests[record['photo']]] if record['photo'] in digests else None,
+                rendered=parse_bool(record.get('rendered')),
+                renditions=record.get('renditions') or {},
+            )
+            for record in records
+        )
+        self.enqueue([photo.photo.name for photo in photos if not photo.rendered], RenditionJob.PHOTO)
+        self.touched_posts.update(pk for pk, _ in posts.values())
+        self.touched_profiles.update(profile_id for _, profile_id in posts.values())
+
+    def enqueue(self, file_names, field):
+        """Enqueue the renditions of the shared files once, however many batches refer to them"""
+
+        file_names = sorted({(field, name) for name in file_names} - self.enqueued)
+        self.enqueued.update(file_names)
+        enqueue_renditions([name for _, name in file_names], field=field)
+
+    def recount(self):
+        """bulk_create() sends no signals, the counters of the imported posts and profiles are counted at the end"""
+
+        for model, pks in ((Post, self.touched_posts), (Profile, self.touched_profiles)):
+            pks = sorted(pks)
+            for offset in range(0, len(pks), self.batch_size):
+                recount(model, pks[offset:offset + self.batch_size])
+        for pk in self.touched_profiles:
+            invalidate_profile(pk)
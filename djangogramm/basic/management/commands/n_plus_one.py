@@ -0,0 +1,50 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from basic.instrumentation import stats
+
+MIDDLEWARE = 'basic.middleware.InstrumentationMiddleware'
+
+
+class Command(BaseCommand):
+    help = ("Request the pages in this process with the instrumentation middleware and list the queries "
+            "repeated most within a request, the likely N+1 queries. The statistics of a running server "
+            "are served to the staff at /instrumentation/.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Paths to request, e.g. /people/ /profile/john-smith/')
+        parser.add_argument('--user', help='Email of the user to request the pages as')
+        parser.add_argument('--repeat', type=int, default=1)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        middleware = [MIDDLEWARE] + [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            client = Client()
+            if options['user']:
+                try:
+                    client.force_login(get_user_model().objects.get(email=options['user']))
+                except get_user_model().DoesNotExist:
+                    raise CommandError(f"User {options['user']} not found")
+            stats.reset()
+            for path in options['paths']:
+                for _ in range(options['repeat']):
+                    response = client.get(path)
+                    self.stderr.write(f"{path}: {response.status_code}, {response['Server-Timing']}")
+
+        offenders = stats.top_duplicates(options['top'])
+        if options['json']:
+            self.stdout.write(json.dumps(offenders, indent=2))
+            return
+        if not offenders:
+            self.stdout.write(self.style.SUCCESS("No query repeated within a request"))
+        for offender in offenders:
+            self.stdout.write(
+                f"{offender['view']}: {offender['repeated']} repeated in {offender['requests']} requests, "
+                f"at most {offender['max_per_request']} per request\n    {offender['fingerprint']}"
+            )
@@ -0,0 +1,43 @@
+import operator
+from functools import reduce
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from basic.counters import get_counters, recount
+from basic.models import Profile, Post
+
+
+class Command(BaseCommand):
+    help = "Recount the denormalized counters of profiles and posts in batches and fix the drifted ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model in (Profile, Post):
+            fixed = self.reconcile(model, options['batch_size'])
+            self.stdout.write(f"{model._meta.verbose_name_plural.capitalize()}: fixed {fixed} rows")
+
+    def reconcile(self, model, batch_size):
+        """Walk the table by pk ranges, updating only the rows whose counters differ from the actual counts"""
+
+        expressions = get_counters(model)
+        fixed = 0
+        last_pk = 0
+        drifted = reduce(operator.or_, (~Q(**{name: F(f'actual_{name}')}) for name in expressions))
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            with transaction.atomic():
+                drifted_pks = list(model.objects.filter(pk__in=pks).annotate(
+                    **{f'actual_{name}': expression for name, expression in expressions.items()}
+                ).filter(drifted).values_list('pk', flat=True))
+                if drifted_pks:
+                    # Recounted in the UPDATE itself, so the increments committed meanwhile are not lost
+                    fixed += recount(model, drifted_pks)
+            self.stderr.write(f"{model._meta.verbose_name_plural.capitalize()} up to {last_pk}: fixed {fixed}")
+        return fixed
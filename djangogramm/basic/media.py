@@ -0,0 +1,191 @@
+import mimetypes
+import os
+import re
+import time
+from functools import lru_cache
+from urllib.parse import urlencode, urljoin
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import escape_uri_path, filepath_to_uri
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+SIGNATURE_SALT = 'basic.media'
+
+# Content-addressed files with their variations and renditions: "<sha256>.jpg", "<sha256>.640w.webp"
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{64}(\.|$)')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_media_url(name):
+    """
+    Return the URL of the stored file, built from its name without calling the storage.
+
+    With MEDIA_URL_SIGNED the URL carries a signature, and with MEDIA_URL_MAX_AGE also an expiry
+    rounded up to the next MEDIA_URL_MAX_AGE period, so the URL stays the same for all the requests
+    of the period and can be cached by the browsers and proxies.
+    """
+    expires = None
+    if settings.MEDIA_URL_SIGNED and settings.MEDIA_URL_MAX_AGE:
+        expires = (int(time.time()) // settings.MEDIA_URL_MAX_AGE + 2) * settings.MEDIA_URL_MAX_AGE
+    return _build_url(name, settings.MEDIA_URL, settings.MEDIA_URL_SIGNED, expires, settings.SECRET_KEY)
+
+
+def get_variation_url(file, variation):
+    """Return the URL of the StdImageField variation of the file"""
+
+    return get_media_url(file.field.attr_class.get_variation_name(file.name, variation))
+
+
+@lru_cache(maxsize=4096)
+def _build_url(name, media_url, signed, expires, secret_key):
+    url = urljoin(media_url, filepath_to_uri(name).lstrip('/'))
+    if signed:
+        params = {'s': get_signature(name, expires, secret_key)}
+        if expires:
+            params = {'e': expires, **params}
+        url = f'{url}?{urlencode(params)}'
+    return url
+
+
+def get_signature(name, expires=None, secret_key=None):
+    value = name if expires is None else f'{name}:{expires}'
+    return signing.Signer(key=secret_key, salt=SIGNATURE_SALT).signature(value)
+
+
+def check_signature(name, query):
+    """Tell whether the query string parameters carry a valid signature of the file name"""
+
+    expires = query.get('e')
+    if expires is not None:
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        expires = int(expires)
+    return constant_time_compare(query.get('s', ''), get_signature(name, expires))
+
+
+def is_hashed_name(name):
+    """Tell whether the file is named by the hash of its content, so it never changes under this name"""
+
+    return bool(HASHED_NAME_RE.match(os.path.basename(name)))
+
+
+def get_etag(name, stat):
+    """Strong ETag: the content hash for hashed names, the modification time and the size otherwise"""
+
+    if is_hashed_name(name):
+        return f'"{os.path.basename(name)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def get_range(header, size):
+    """Return (start, end) of a single "bytes" range, None to send the whole file, or False if not satisfiable"""
+
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    else:
+        start, end = max(size - int(end), 0), size - 1
+    if start > end:
+        return False
+    return start, end
+
+
+class RangeFile:
+    """File object reading only the bytes from start to end inclusive"""
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT for production use.
+
+    Content-hashed files are cached for good with "Cache-Control: immutable", the others are revalidated
+    with their ETag. "If-None-Match" and single "Range" requests are answered here. The body is sent by
+    the web server with MEDIA_SERVE_OFFLOAD = "x-accel-redirect" (nginx) or "x-sendfile" (Apache, lighttpd),
+    otherwise it's streamed with FileResponse, which uses wsgi.file_wrapper when the server has one.
+    """
+    if settings.MEDIA_URL_SIGNED and not check_signature(path, request.GET):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = get_etag(path, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable' if is_hashed_name(path)
+                          else 'no-cache'),
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+        for header in ('ETag', 'Cache-Control'):
+            response[header] = headers[header]
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SERVE_OFFLOAD:
+        # The web server answers the range requests itself
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_SERVE_OFFLOAD == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = escape_uri_path(settings.MEDIA_ACCEL_REDIRECT_LOCATION + path)
+        else:
+            response['X-Sendfile'] = full_path
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    # A Range after If-Range with another ETag asks for the whole file, which has changed
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = get_range(request.META.get('HTTP_RANGE'), stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(file, content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
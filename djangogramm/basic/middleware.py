@@ -0,0 +1,134 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .auth import get_user
+from .instrumentation import RequestRecorder, enable, get_view_name, stats
+from .models import Profile
+
+
+def get_profile(request):
+    """Return the profile of the current user, loading it at most once per request"""
+
+    user = request.user
+    if getattr(request, '_cached_profile_user_id', None) != user.pk or not hasattr(request, '_cached_profile'):
+        profile = None
+        if user.is_authenticated:
+            # Attached to the user by CachedAuthenticationMiddleware, queried otherwise
+            try:
+                profile = user.profile
+            except Profile.DoesNotExist:
+                pass
+        set_profile(request, profile)
+    return request._cached_profile
+
+
+def set_profile(request, profile):
+    """Replace the cached profile of the current user, e.g. right after it has been created"""
+
+    request._cached_profile = profile
+    request._cached_profile_user_id = request.user.pk
+
+
+class AsyncCapableMiddleware:
+    """
+    Middleware running in the ASGI mode without a hop to the thread of the sync code.
+
+    A sync-only middleware would run the rest of the request in that thread, which is shared
+    by all the requests of the process in Django 3.1, so they would be served one at a time.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @property
+    def is_async(self):
+        return asyncio.iscoroutinefunction(self.get_response)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware taking request.user with its profile from the cached snapshot, see basic.auth"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+class ProfileMiddleware(AsyncCapableMiddleware):
+    """Add the lazily loaded profile of the current user as request.profile"""
+
+    def __call__(self, request):
+        # Returns the coroutine of the rest of the request in the ASGI mode
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return self.get_response(request)
+
+
+class InstrumentationMiddleware(AsyncCapableMiddleware):
+    """
+    Record the view, the SQL queries and the template rendering time of every request into
+    basic.instrumentation.stats, and report them in the Server-Timing header.
+
+    Put it first in MIDDLEWARE, so that the total time covers the other middleware and the
+    template responses are rendered, and timed, after the other middleware changed them.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Without the middleware the queries aren't wrapped at all
+        enable()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.instrumentation = recorder = RequestRecorder()
+        with recorder.capture():
+            response = self.get_response(request)
+        return self.report(recorder, response)
+
+    async def __acall__(self, request):
+        request.instrumentation = recorder = RequestRecorder()
+        with recorder.capture():
+            response = await self.get_response(request)
+        return self.report(recorder, response)
+
+    def report(self, recorder, response):
+        stats.record(recorder)
+        response['Server-Timing'] = recorder.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.instrumentation.view_name = get_view_name(view_func)
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+        response.render()
+        request.instrumentation.template_time += time.perf_counter() - started
+        return response
+
+
+class StaticFilesMiddleware(AsyncCapableMiddleware, WhiteNoiseMiddleware):
+    """WhiteNoise middleware which also runs in the ASGI mode without a thread of its own"""
+
+    def __init__(self, get_response=None, settings=settings):
+        WhiteNoiseMiddleware.__init__(self, get_response, settings)
+        AsyncCapableMiddleware.__init__(self, get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def __acall__(self, request):
+        # The collected files are looked up in memory, so only serving one of them touches the disk
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
@@ -3,20 +3,35 @@
 from django.db import migrations
 from django.utils.text import slugify
 
+from basic.backfill import backfill, reset_checkpoint
+
+BACKFILL_NAME = 'basic.0011_populate_identifier_values'
+
+
+def set_identifiers(profiles):
+    for profile in profiles:
+        profile.identifier = slugify(f"{profile.first_name} {profile.last_name}")
+
 
 def gen_identifier(apps, schema_editor):
     Profile = apps.get_model('basic', 'Profile')
-    for profile in Profile.objects.all():
-        profile.identifier = slugify(f"{profile.first_name} {profile.last_name}")
-        profile.save(update_fields=['identifier'])
+    profiles = Profile.objects.using(schema_editor.connection.alias).only('first_name', 'last_name')
+    backfill(profiles, set_identifiers, ['identifier'], name=BACKFILL_NAME, schema_editor=schema_editor)
+
+
+def reset_identifier_backfill(apps, schema_editor):
+    # The identifiers are generated again when the migration is reapplied
+    reset_checkpoint(BACKFILL_NAME, using=schema_editor.connection.alias, schema_editor=schema_editor)
 
 
 class Migration(migrations.Migration):
+    # The backfill commits batch by batch
+    atomic = False
 
     dependencies = [
         ('basic', '0010_add_identifier_field'),
     ]
 
     operations = [
-        migrations.RunPython(gen_identifier, reverse_code=migrations.RunPython.noop)
+        migrations.RunPython(gen_identifier, reverse_code=reset_identifier_backfill)
     ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0013_auto_20210319_1024'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['profile', '-time_create', '-id'], name='basic_post_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+# istartswith on PostgreSQL compares UPPER("column"::text) with LIKE, so the prefix search
+# can only use an index built on that exact expression.
+UPPER_NAME_INDEXES = {
+    'basic_profile_first_name_upper_idx': 'first_name',
+    'basic_profile_last_name_upper_idx': 'last_name',
+}
+
+
+def create_upper_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in UPPER_NAME_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON basic_profile (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_upper_name_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in UPPER_NAME_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0014_post_timeline_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='basic_profile_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['last_name'], name='basic_profile_last_name_idx'),
+        ),
+        migrations.RunPython(create_upper_name_indexes, reverse_code=drop_upper_name_indexes),
+    ]
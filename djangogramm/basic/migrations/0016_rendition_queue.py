@@ -0,0 +1,42 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0015_profile_name_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('time_create', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        # Variations of the existing photos were rendered synchronously on upload
+        migrations.AddField(
+            model_name='photo',
+            name='rendered',
+            field=models.BooleanField(default=True, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='rendered',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='renditionjob',
+            index=models.Index(fields=['status', 'run_after'], name='basic_rendition_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, lookup):
+    rows = model.objects.filter(**{lookup: OuterRef('pk')}).order_by().values(lookup)
+    return Coalesce(Subquery(rows.annotate(count=Count('*')).values('count')), 0)
+
+
+def count_existing(apps, schema_editor):
+    Profile, Post, Photo = (apps.get_model('basic', name) for name in ('Profile', 'Post', 'Photo'))
+    Post.objects.update(photo_count=count_of(Photo, 'post'))
+    Profile.objects.update(post_count=count_of(Post, 'profile'), photo_count=count_of(Photo, 'post__profile'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0019_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='photo_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:54
+
+import re
+
+from django.db import migrations, models
+
+INDEXED_RE = re.compile(r'^(?P<base>.+)--(?P<index>[1-9][0-9]*)$')
+
+
+def count_existing(apps, schema_editor):
+    """Start the counters above the slugs and identifiers taken already"""
+
+    Profile, Post, SlugCounter = (apps.get_model('basic', name) for name in ('Profile', 'Post', 'SlugCounter'))
+    for scope, queryset, field in (('profile', Profile.objects.all(), 'identifier'), ('post', Post.objects.all(), 'slug')):
+        counters = {}
+        for slug in queryset.values_list(field, flat=True).iterator(chunk_size=5000):
+            counters[slug] = max(counters.get(slug, 0), 1)
+            match = INDEXED_RE.match(slug)
+            if match:
+                counters[match['base']] = max(counters.get(match['base'], 0), int(match['index']))
+        SlugCounter.objects.bulk_create(
+            (SlugCounter(scope=scope, base=base, last=last) for base, last in counters.items()), batch_size=5000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0020_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('base', models.CharField(max_length=255)),
+                ('last', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.SlugField(unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='slugcounter',
+            constraint=models.UniqueConstraint(fields=('scope', 'base'), name='basic_slug_counter_unique'),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
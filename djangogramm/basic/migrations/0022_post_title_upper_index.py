@@ -0,0 +1,32 @@
+# Generated by Django 3.1.7 on 2026-10-18 07:45
+
+from django.db import migrations
+
+# The admin searches the posts by title__istartswith, which PostgreSQL runs as UPPER("title"::text) LIKE,
+# so the index is built on that exact expression, like the name indexes of 0015.
+INDEX_NAME = 'basic_post_title_upper_idx'
+
+
+def create_title_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON basic_post (UPPER(title::text) text_pattern_ops)'
+    )
+
+
+def drop_title_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0021_slug_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_index, reverse_code=drop_title_index),
+    ]
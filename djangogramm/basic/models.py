@@ -1,6 +1,10 @@
 import os
+from collections import Counter
 
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
@@ -10,7 +14,9 @@ from django.utils.translation import gettext_lazy as _
 from time import gmtime, strftime
 
 from stdimage import StdImageField
-from autoslug import AutoSlugField
+
+from .cache import invalidate_profile
+from .slugs import SlugAllocator
 
 
 class GrammUserManager(BaseUserManager):
@@ -63,27 +69,96 @@ class GrammUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    def has_usable_password(self):
+        """Answered without loading the password of a user from the cached snapshot of basic.auth"""
+
+        if 'password' not in self.__dict__ and hasattr(self, 'usable_password'):
+            return self.usable_password
+        return super().has_usable_password()
+
+
+class CountersModel(models.Model):
+    """Model with denormalized counters, which are only changed by UPDATE queries with F() expressions"""
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        """Don't write back the counters of a loaded instance, they may have changed since it was loaded"""
+
+        if update_fields is None and not force_insert and not self._state.adding:
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name not in self.counter_fields]
+        super(CountersModel, self).save(force_insert, force_update, using, update_fields)
+
+
+class ClaimedSlugMixin:
+    """
+    Claim the slug in slug_field with the allocator whenever it's set by hand to something else than the stored
+    value, on insert or on a later edit, so the allocator never hands it out again
+    """
+
+    slug_field = None
 
-class Profile(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_slug = instance.__dict__.get(cls.slug_field)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        if fields is None or self.slug_field in fields:
+            self._stored_slug = self.__dict__.get(self.slug_field)
+
+    def claim_slug(self, allocator, update_fields=None):
+        slug = getattr(self, self.slug_field)
+        if slug != getattr(self, '_stored_slug', None) and (update_fields is None or self.slug_field in update_fields):
+            allocator.claim([slug])
+        self._stored_slug = slug
+
+
+class Profile(ClaimedSlugMixin, CountersModel):
     """User profile"""
 
     def user_directory_path(instance, filename):
+        """Name the avatar by the hash of its content, so it can be cached as immutable"""
+
+        from .storage import get_hashed_name
+
         return os.path.join(
             'profiles',
             ' '.join([str(instance.first_name), str(instance.last_name)]),
             'avatar',
-            filename
+            get_hashed_name(instance.avatar.file, filename)
         )
 
     def get_slug(instance):
         pass
 
+    counter_fields = ('follower_count', 'post_count', 'photo_count')
+    slug_field = 'identifier'
+
     gramm_user = models.OneToOneField(GrammUser, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=64)
     last_name = models.CharField(max_length=64)
     bio = models.TextField(max_length=1023, blank=True, default='', verbose_name=_("Biography"))
     avatar = models.ImageField(upload_to=user_directory_path, blank=True, null=True)
+    avatar_renditions = models.JSONField(default=dict, editable=False)
     identifier = models.CharField(max_length=128, unique=True, db_index=True)
+    follows = models.ManyToManyField('self', through='Follow', through_fields=('follower', 'followee'),
+                                     symmetrical=False, related_name='followers')
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    photo_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_name', 'last_name', 'id'], name='basic_profile_name_idx'),
+            models.Index(fields=['last_name'], name='basic_profile_last_name_idx'),
+        ]
 
     def get_absolute_url(self):
         return reverse('user-profile', kwargs={'profile_identifier': self.identifier})
@@ -91,28 +166,54 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def get_identifier_allocator(cls):
+        return SlugAllocator('profile', cls._meta.get_field('identifier').max_length)
+
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
         """Save profile.identifier as slug:identifier from profile.first_name and profile.last_name"""
 
         if not self.identifier:
-            self.identifier = slugify(f"{self.first_name} {self.last_name}")
-        return super(Profile, self).save()
-
-
-class Post(models.Model):
+            self.identifier = self.get_identifier_allocator().allocate([slugify(str(self))], default='profile')[0]
+            self._stored_slug = self.identifier
+        else:
+            self.claim_slug(self.get_identifier_allocator(), update_fields)
+
+        new_avatar = bool(self.avatar) and not self.avatar._committed
+        if new_avatar:
+            self.avatar_renditions = {}
+        result = super(Profile, self).save(force_insert, force_update, using, update_fields)
+        if new_avatar:
+            from .tasks import enqueue_rendition
+            enqueue_rendition(self.avatar.name, field=RenditionJob.AVATAR)
+        return result
+
+
+class Post(ClaimedSlugMixin, CountersModel):
     """User's post"""
 
     def get_slug(instance):
         return slugify(f"{instance.profile} {instance.title}")
 
+    counter_fields = ('photo_count',)
+    slug_field = 'slug'
+
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, verbose_name=_('Profile'))
     title = models.CharField(max_length=64, verbose_name=_("Post title"))
     time_create = models.DateTimeField(auto_now_add=True)
-    slug = AutoSlugField(populate_from=get_slug, unique=True, db_index=True)
+    slug = models.SlugField(unique=True, db_index=True)
+    photo_count = models.PositiveIntegerField(default=0, editable=False)
+    # Copied to the timelines of the followers on creation, otherwise pulled by them while reading the feed
+    fanned_out = models.BooleanField(default=True, editable=False)
 
     class Meta:
         ordering = ['profile', 'time_create']
+        indexes = [
+            models.Index(fields=['profile', '-time_create', '-id'], name='basic_post_timeline_idx'),
+            models.Index(fields=['profile', '-time_create', '-id'], name='basic_post_pulled_idx',
+                         condition=models.Q(fanned_out=False)),
+        ]
 
     def __str__(self):
         return f"{self.profile} - {self.title}"
@@ -120,6 +221,251 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse('post', kwargs={'profile_identifier': self.profile, 'post_slug': self.slug})
 
+    @classmethod
+    def get_slug_allocator(cls):
+        return SlugAllocator('post', cls._meta.get_field('slug').max_length)
+
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+        """Reserve a unique slug from the profile name and the title instead of probing the table for one"""
+
+        if not self.slug:
+            self.slug = self.get_slug_allocator().allocate([self.get_slug()], default='post')[0]
+            self._stored_slug = self.slug
+        else:
+            self.claim_slug(self.get_slug_allocator(), update_fields)
+        if self._state.adding:
+            self.fanned_out = self.profile.follower_count < settings.FEED_FANOUT_LIMIT
+        super(Post, self).save(force_insert, force_update, using, update_fields)
+
+
+class FollowManager(models.Manager):
+
+    def follow(self, follower, followee):
+        """Follow the profile and copy its latest fanned out posts to the timeline of the follower"""
+
+        with transaction.atomic(using=self.db):
+            _, created = self.get_or_create(follower=follower, followee=followee)
+            if created:
+                Profile.objects.filter(pk=followee.pk).update(follower_count=F('follower_count') + 1)
+                posts = Post.objects.filter(profile=followee, fanned_out=True).order_by('-time_create', '-id')
+                TimelineEntry.objects.bulk_create([
+                    TimelineEntry(owner=follower, post=post, author=followee, time_create=post.time_create)
+                    for post in posts[:settings.FEED_BACKFILL]
+                ], ignore_conflicts=True)
+        return created
+
+    def unfollow(self, follower, followee):
+        """Stop following the profile and remove its posts from the timeline of the follower"""
+
+        with transaction.atomic(using=self.db):
+            deleted, _ = self.filter(follower=follower, followee=followee).delete()
+            if deleted:
+                Profile.objects.filter(pk=followee.pk).update(follower_count=F('follower_count') - 1)
+                TimelineEntry.objects.filter(owner=follower, author=followee).delete()
+        return bool(deleted)
+
+
+class Follow(models.Model):
+    """Profile following another one"""
+
+    follower = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='following_set')
+    followee = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='follower_set')
+    time_create = models.DateTimeField(auto_now_add=True)
+
+    objects = FollowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='basic_follow_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['followee', 'follower'], name='basic_follow_followee_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower} -> {self.followee}"
+
+
+class TimelineEntryManager(models.Manager):
+
+    def fan_out(self, post):
+        """
+        Copy the new post to the timelines of its author and their followers.
+
+        The rows are inserted with one INSERT ... SELECT over the followers, so they never
+        leave the database. Posts of profiles which had FEED_FANOUT_LIMIT or more followers
+        on creation are not copied, their followers pull them while reading the feed.
+        """
+        self.create(owner_id=post.profile_id, post=post, author_id=post.profile_id, time_create=post.time_create)
+        if not post.fanned_out:
+            return
+
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        entry, follow = self.model._meta, Follow._meta
+        columns = ', '.join(quote(entry.get_field(name).column) for name in ('owner', 'post', 'author', 'time_create'))
+        time_create = entry.get_field('time_create').get_db_prep_value(post.time_create, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(entry.db_table)} ({columns}) "
+                f"SELECT {quote(follow.get_field('follower').column)}, %s, %s, %s FROM {quote(follow.db_table)} "
+                f"WHERE {quote(follow.get_field('followee').column)} = %s",
+                [post.pk, post.profile_id, time_create, post.profile_id],
+            )
+
+    def fan_out_batch(self, posts):
+        """
+        Copy posts inserted without signals, e.g. by bulk_create(), to the timelines of their authors
+        and, for the fanned out ones, of their followers, with one query to read the followers and bulk inserts
+        """
+        fanned_out = {post.profile_id for post in posts if post.fanned_out}
+        followers = {}
+        for followee, follower in Follow.objects.filter(followee__in=fanned_out).values_list('followee', 'follower'):
+            followers.setdefault(followee, []).append(follower)
+        self.bulk_create((
+            self.model(owner_id=owner, post_id=post.pk, author_id=post.profile_id, time_create=post.time_create)
+            for post in posts
+            for owner in [post.profile_id, *(followers.get(post.profile_id, []) if post.fanned_out else [])]
+        ), batch_size=5000, ignore_conflicts=True)
+
+
+class TimelineEntry(models.Model):
+    """Post in the home feed of a profile, copied there when the post was published"""
+
+    owner = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    author = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='+')
+    time_create = models.DateTimeField()
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='basic_timeline_entry_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-time_create', '-post'], name='basic_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} - {self.post}"
+
+
+class BlobManager(models.Manager):
+    """Manager of the content-addressed photo files"""
+
+    def store(self, files, stored=None):
+        """
+        Return the blobs with the content of the files, writing only the content which isn't stored yet,
+        and take a reference to each of them. Names of the written files are appended to stored.
+        """
+        from .storage import get_content_hash, get_blob_name
+
+        storage = Photo._meta.get_field('photo').storage
+        digests = [get_content_hash(file) for file in files]
+        with transaction.atomic(using=self.db):
+            # The locks keep delete_unreferenced() from deleting the blobs until the references are committed
+            blobs = self._lock(digests)
+            missing = {digest: file for digest, file in zip(digests, files) if digest not in blobs}
+            while missing:
+                # Rows inserted meanwhile by a concurrent upload of the same content are skipped and read back,
+                # rows deleted meanwhile along with their last reference are inserted again by the next round
+                self.bulk_create([self.model(hash=digest, name=get_blob_name(digest, file.name))
+                                  for digest, file in missing.items()], ignore_conflicts=True)
+                found = self._lock(missing)
+                for digest, blob in found.items():
+                    blobs[digest] = blob
+                    if storage.exists(blob.name):
+                        continue
+                    name = storage.save(blob.name, missing[digest])
+                    # A concurrent upload of the same content has just written it
+                    if name != blob.name:
+                        storage.delete(name)
+                    elif stored is not None:
+                        stored.append(name)
+                missing = {digest: file for digest, file in missing.items() if digest not in found}
+
+            counts = Counter(digests)
+            self.filter(hash__in=counts).update(refcount=F('refcount') + Case(
+                *[When(hash=digest, then=Value(count)) for digest, count in counts.items()],
+                output_field=models.PositiveIntegerField(),
+            ))
+        return [blobs[digest] for digest in digests]
+
+    def _lock(self, digests):
+        # Locked in a stable order, so concurrent uploads sharing several blobs don't deadlock
+        return {blob.hash: blob for blob in self.select_for_update().filter(hash__in=digests).order_by('pk')}
+
+    def release(self, pk, renditions):
+        """Drop a reference to the blob, deleting it with all its files once the last one is dropped and committed"""
+
+        self.filter(pk=pk).update(refcount=F('refcount') - 1)
+        if self.filter(pk=pk, refcount__lte=0).exists():
+            transaction.on_commit(lambda: self.delete_unreferenced(pk, renditions), using=self.db)
+
+    def delete_unreferenced(self, pk, renditions):
+        """Delete the blob with all its files unless a concurrent upload has taken a new reference to it"""
+
+        from .storage import delete_image_files
+
+        with transaction.atomic(using=self.db):
+            blob = self.select_for_update().filter(pk=pk, refcount__lte=0).first()
+            if blob is not None:
+                blob.delete()
+                delete_image_files(blob.name, Photo._meta.get_field('photo'), renditions)
+
+
+class Blob(models.Model):
+    """Photo file shared by all photos with the same content"""
+
+    hash = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    refcount = models.PositiveIntegerField(default=0)
+    time_create = models.DateTimeField(auto_now_add=True)
+
+    objects = BlobManager()
+
+    def __str__(self):
+        return self.name
+
+
+class PhotoManager(models.Manager):
+    """Manager saving all photos of a post at once"""
+
+    def bulk_create_for_post(self, post, files):
+        """
+        Store the uploaded files and insert all photos of the post with one query.
+        If anything fails, the already written files are removed.
+        """
+        from .tasks import enqueue_renditions
+
+        field = self.model._meta.get_field('photo')
+        stored = []
+        try:
+            with transaction.atomic(using=self.db):
+                if settings.PHOTO_STORAGE_MODE == 'content':
+                    photos = [self.model(post=post, blob=blob, photo=blob.name)
+                              for blob in Blob.objects.store(files, stored)]
+                else:
+                    directory = self.model.get_directory(post)
+                    for file in files:
+                        stored.append(field.storage.save(
+                            field.storage.generate_filename(os.path.join(directory, file.name)), file
+                        ))
+                    photos = [self.model(post=post, photo=name) for name in stored]
+                pending = self.model.share_renditions(photos)
+                photos = self.bulk_create(photos)
+                # bulk_create() sends no post_save signals
+                Post.objects.filter(pk=post.pk).update(photo_count=F('photo_count') + len(photos))
+                Profile.objects.filter(pk=post.profile_id).update(photo_count=F('photo_count') + len(photos))
+                invalidate_profile(post.profile_id)
+                enqueue_renditions(pending)
+        except Exception:
+            for name in stored:
+                field.storage.delete(name)
+            raise
+        return photos
+
 
 class Photo(models.Model):
     """User's photo"""
@@ -127,20 +473,130 @@ class Photo(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     time_create = models.DateTimeField(auto_now_add=True)
 
-    def user_directory_path(instance, filename):
+    objects = PhotoManager()
+
+    @classmethod
+    def get_directory(cls, post):
+        """Return the directory for the photos of the post"""
+
         return os.path.join(
             'profiles',
-            ' '.join([str(instance.post.profile.first_name), str(instance.post.profile.last_name)]),
+            ' '.join([str(post.profile.first_name), str(post.profile.last_name)]),
             'post-photos',
             strftime(os.path.join('%Y', '%B', '%d'), gmtime()),
-            '-'.join(slugify(instance.post.title).split('-')[:3]),
-            filename
+            '-'.join(slugify(post.title).split('-')[:3]),
         )
 
-    photo = StdImageField(upload_to=user_directory_path, delete_orphans=True, variations={'thumbnail': (250, 250)})
+    def user_directory_path(instance, filename):
+        return os.path.join(Photo.get_directory(instance.post), filename)
+
+    def defer_variations(file_name, variations, storage, **kwargs):
+        """Leave rendering of the variations to the background rendition worker"""
+
+        from .tasks import enqueue_rendition
+        enqueue_rendition(file_name)
+        return False
+
+    # Files are deleted by the post_delete handler in signals, as they can be shared
+    photo = StdImageField(upload_to=user_directory_path, variations={'thumbnail': (250, 250)},
+                          render_variations=defer_variations)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, editable=False)
+    rendered = models.BooleanField(default=False, editable=False)
+    renditions = models.JSONField(default=dict, editable=False)
 
     def __str__(self):
         return f"{self.post} - {self.pk}"
 
+    def save(self, *args, **kwargs):
+        """In the content-addressed storage mode, keep a new photo file as a shared blob"""
+
+        if settings.PHOTO_STORAGE_MODE != 'content' or not self.photo or self.photo._committed:
+            return super(Photo, self).save(*args, **kwargs)
+
+        from .tasks import enqueue_renditions
+
+        old_blob_id, old_renditions = self.blob_id, self.renditions
+        stored = []
+        try:
+            with transaction.atomic():
+                self.blob = Blob.objects.store([self.photo.file], stored)[0]
+                self.photo = self.blob.name
+                pending = Photo.share_renditions([self])
+                super(Photo, self).save(*args, **kwargs)
+                enqueue_renditions(pending)
+                if old_blob_id and old_blob_id != self.blob_id:
+                    Blob.objects.release(old_blob_id, old_renditions)
+        except Exception:
+            for name in stored:
+                self.photo.storage.delete(name)
+            raise
+
+    @classmethod
+    def share_renditions(cls, photos):
+        """Take the rendering state from the photos with the same files, return the names left to render"""
+
+        names = {photo.photo.name for photo in photos}
+        rendered = dict(cls.objects.filter(photo__in=names, rendered=True).values_list('photo', 'renditions'))
+        pending = set()
+        for photo in photos:
+            if photo.photo.name in rendered:
+                photo.rendered, photo.renditions = True, rendered[photo.photo.name]
+            else:
+                photo.rendered, photo.renditions = False, {}
+                pending.add(photo.photo.name)
+        return sorted(pending)
+
     def get_absolute_url(self):
         pass
+
+
+class RenditionJob(models.Model):
+    """Rendering of image variations, waiting for the background worker"""
+
+    PHOTO = 'basic.Photo.photo'
+    AVATAR = 'basic.Profile.avatar'
+    # Jobs rendering only the admin preview of the image field's file, if it's missing
+    PHOTO_PREVIEW = 'basic.Photo.photo.preview'
+    AVATAR_PREVIEW = 'basic.Profile.avatar.preview'
+    PREVIEW_JOBS = {PHOTO_PREVIEW: PHOTO, AVATAR_PREVIEW: AVATAR}
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('Pending')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    file_name = models.CharField(max_length=255)
+    field = models.CharField(max_length=64, default=PHOTO)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    time_create = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='basic_rendition_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} - {self.status}"
+
+
+class SlugCounter(models.Model):
+    """Number of the slugs handed out for a base, see basic.slugs.SlugAllocator"""
+
+    scope = models.CharField(max_length=32)
+    base = models.CharField(max_length=255)
+    last = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'base'], name='basic_slug_counter_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.base} - {self.last}"
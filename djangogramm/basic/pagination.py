@@ -0,0 +1,131 @@
+import base64
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Cursor token can't be decoded for the paginated queryset"""
+
+
+class KeysetPage:
+    """A page of objects with cursors pointing to the neighbouring pages"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0])
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered by unique keys.
+
+    Pages are fetched with a range condition on the ordering keys, so a deep page costs
+    the same as the first one. ``ordering`` must end with a unique field, e.g. ``('-time_create', '-id')``.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [queryset.model._meta.get_field(key.lstrip('-')) for key in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _seek(self, values, forward):
+        """Lexicographic "comes after the cursor" (or before, if not forward) condition"""
+
+        conditions = []
+        for i, key in enumerate(self.ordering):
+            descending = key.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            equal = {field.name: value for field, value in zip(self.fields[:i], values[:i])}
+            conditions.append(Q(**equal, **{f'{self.fields[i].name}__{lookup}': values[i]}))
+        # The redundant bound on the leading key lets the database range-scan the index
+        lookup = 'lte' if self.ordering[0].startswith('-') == forward else 'gte'
+        return Q(**{f'{self.fields[0].name}__{lookup}': values[0]}) & reduce(operator.or_, conditions)
+
+    def page(self, before=None, after=None):
+        """Return the page right after the ``after`` cursor or right before the ``before`` cursor"""
+
+        if before:
+            reverse_ordering = [key[1:] if key.startswith('-') else f'-{key}' for key in self.ordering]
+            queryset = self.queryset.filter(self._seek(self.decode_cursor(before), forward=False))
+            object_list = list(queryset.order_by(*reverse_ordering)[:self.per_page + 1])
+            has_previous = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page][::-1]
+            return KeysetPage(object_list, self, has_next=True, has_previous=has_previous)
+
+        queryset = self.queryset
+        if after:
+            queryset = queryset.filter(self._seek(self.decode_cursor(after), forward=True))
+        object_list = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        return KeysetPage(object_list[:self.per_page], self, has_next=has_next, has_previous=bool(after))
+
+
+def get_estimated_count(queryset):
+    """
+    Number of rows of the table of an unfiltered queryset by the PostgreSQL statistics,
+    None for filtered querysets and other databases
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 for a table which was never analyzed
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator taking the count of a huge unfiltered table from the planner statistics, not from COUNT(*),
+    which reads the whole table. Tables below ADMIN_ESTIMATED_COUNT_THRESHOLD rows are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = get_estimated_count(self.object_list)
+        if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return estimate
+        return super().count
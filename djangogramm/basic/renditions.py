@@ -0,0 +1,170 @@
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401, registers the AVIF plugin on older Pillow versions
+except ImportError:
+    pass
+
+# Image fields having renditions: the field storing what has been rendered, and the flag set when it's done
+RENDITION_FIELDS = {
+    'basic.Photo.photo': ('renditions', 'rendered'),
+    'basic.Profile.avatar': ('avatar_renditions', None),
+}
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+}
+
+
+def get_formats():
+    """Return the configured rendition formats which Pillow is able to write"""
+
+    return _get_supported_formats(tuple(settings.RENDITION_FORMATS))
+
+
+@lru_cache()
+def _get_supported_formats(formats):
+    Image.init()
+    return tuple(fmt for fmt in formats if fmt.upper() in Image.SAVE)
+
+
+def get_image_field(label):
+    """Return the image field by its "app_label.Model.field" label"""
+
+    app_label, model_name, field_name = label.split('.')
+    return apps.get_model(app_label, model_name)._meta.get_field(field_name)
+
+
+def get_rendition_name(file_name, width, fmt):
+    """Return the name of the rendition, stored next to the original: "photo.jpg" -> "photo.640w.webp" """
+
+    return f'{os.path.splitext(file_name)[0]}.{width}w.{fmt}'
+
+
+def get_preview_name(file_name):
+    """Return the name of the admin preview, stored next to the original: "photo.jpg" -> "photo.preview.webp" """
+
+    fmt = 'webp' if _get_supported_formats(('webp',)) else 'png'
+    return f'{os.path.splitext(file_name)[0]}.preview.{fmt}'
+
+
+def _open_image(original):
+    image = ImageOps.exif_transpose(original)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    return image
+
+
+def _save_image(image, name, storage):
+    fmt = os.path.splitext(name)[1][1:]
+    with BytesIO() as buffer:
+        image.save(buffer, format=fmt.upper(), quality=settings.RENDITION_QUALITY)
+        storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _save_preview(image, file_name, storage):
+    size = settings.ADMIN_PREVIEW_SIZE
+    _save_image(ImageOps.fit(image, (size, size), Image.LANCZOS), get_preview_name(file_name), storage)
+
+
+def render_variation(file_name, variation, field):
+    """
+    Render the StdImageField variation of the original like StdImageFieldFile.render_variation does,
+    without switching on Pillow's process-wide LOAD_TRUNCATED_IMAGES
+    """
+    variation_name = field.attr_class.get_variation_name(file_name, variation['name'])
+    with field.storage.open(file_name) as f, Image.open(f) as original:
+        image, save_kwargs = field.attr_class.process_variation(variation, image=original)
+        with BytesIO() as buffer:
+            image.save(buffer, **save_kwargs)
+            field.storage.delete(variation_name)
+            field.storage.save(variation_name, ContentFile(buffer.getvalue()))
+
+
+def render_renditions(file_name, storage):
+    """
+    Render the original in all configured widths up to its own and formats, and its admin preview,
+    return the rendered widths by format
+    """
+    formats = get_formats()
+    # A truncated original fails to decode with OSError, which the rendition job records and retries
+    with storage.open(file_name) as f, Image.open(f) as original:
+        image = _open_image(original)
+        # Images aren't scaled up, the widths above the original's are replaced by the original's own width
+        widths = sorted({min(width, image.width) for width in settings.RENDITION_WIDTHS}, reverse=True)
+        # Each width is scaled down from the previous, larger one
+        for width in widths:
+            image.thumbnail((width, image.height), Image.LANCZOS)
+            for fmt in formats:
+                _save_image(image, get_rendition_name(file_name, width, fmt), storage)
+        _save_preview(image, file_name, storage)
+    return {fmt: sorted(widths) for fmt in formats}
+
+
+def render_preview(file_name, storage):
+    """Render only the admin preview of the original, a truncated one fails to decode with OSError"""
+
+    with storage.open(file_name) as f, Image.open(f) as original:
+        # Decoding a JPEG at a fraction of its size is much cheaper than scaling it down afterwards
+        original.draft('RGB', (settings.ADMIN_PREVIEW_SIZE * 2, settings.ADMIN_PREVIEW_SIZE * 2))
+        _save_preview(_open_image(original), file_name, storage)
+
+
+def with_configured_renditions(renditions):
+    """Add the renditions of the current settings to the recorded ones, which may be outdated on the instance"""
+
+    merged = {fmt: set(widths) for fmt, widths in renditions.items()}
+    for fmt in get_formats():
+        merged.setdefault(fmt, set()).update(settings.RENDITION_WIDTHS)
+    return {fmt: sorted(widths) for fmt, widths in merged.items()}
+
+
+def is_up_to_date(renditions):
+    """
+    Tell whether the recorded renditions were rendered with the current formats and widths. A rendition
+    at a width which isn't configured is the original's own width, so the larger configured widths are
+    missing because the original is too small for them, not because they were added since.
+    """
+    configured = sorted(settings.RENDITION_WIDTHS)
+    if not renditions or set(renditions) != set(get_formats()):
+        return False
+    for widths in renditions.values():
+        if not widths or [width for width in widths if width in configured] != \
+                [width for width in configured if width <= widths[-1]]:
+            return False
+        if widths[-1] < configured[-1] and widths[-1] in configured:
+            # The original may be exactly as wide, or it was rendered before the larger widths were configured
+            return False
+    return True
+
+
+def delete_renditions(file_name, renditions, storage):
+    """Delete the rendered files of the original"""
+
+    for fmt, widths in with_configured_renditions(renditions).items():
+        for width in widths:
+            storage.delete(get_rendition_name(file_name, width, fmt))
+    storage.delete(get_preview_name(file_name))
+
+
+def get_sources(file, renditions):
+    """Return <source> attributes for the renditions of the file, the most efficient format first"""
+
+    from .media import get_media_url
+
+    sources = []
+    for fmt in sorted(renditions, key=lambda fmt: fmt != 'avif'):
+        srcset = ', '.join(
+            f'{get_media_url(get_rendition_name(file.name, width, fmt))} {width}w' for width in renditions[fmt]
+        )
+        sources.append({'type': MIME_TYPES.get(fmt, f'image/{fmt}'), 'srcset': srcset})
+    return sources
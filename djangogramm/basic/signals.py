@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import invalidate_user
+from .cache import invalidate_profile
+from .models import Photo, Profile, Post, Blob, TimelineEntry
+from .renditions import delete_renditions
+from .storage import delete_image_files
+from .tasks import renditions_rendered
+
+
+@receiver(request_started)
+def close_unusable_connections(sender, **kwargs):
+    """Drop the persistent connections broken since the previous request, for the databases with
+    CONN_HEALTH_CHECKS, so that the request connects again instead of failing"""
+
+    for connection in connections.all():
+        if (connection.connection is not None and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not connection.in_atomic_block and not connection.is_usable()):
+            connection.close()
+
+
+@receiver(post_delete, sender=Photo)
+def delete_photo_files(sender, instance, **kwargs):
+    """Delete the files of the photo, or its reference to the shared blob"""
+
+    if instance.blob_id:
+        Blob.objects.release(instance.blob_id, instance.renditions)
+    elif instance.photo:
+        delete_image_files(instance.photo.name, instance.photo.field, instance.renditions)
+
+
+@receiver(post_delete, sender=Profile)
+def delete_avatar_renditions(sender, instance, **kwargs):
+    if instance.avatar:
+        delete_renditions(instance.avatar.name, instance.avatar_renditions, instance.avatar.storage)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_fragments(sender, instance, **kwargs):
+    invalidate_profile(instance.pk)
+    invalidate_user(instance.gramm_user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Password changes, deactivations and the last login times reach the cached users right away"""
+
+    invalidate_user(instance.pk)
+
+
+@receiver(user_logged_in)
+@receiver(user_logged_out)
+def invalidate_logged_user_snapshot(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_user(user.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_fragments(sender, instance, **kwargs):
+    invalidate_profile(instance.profile_id)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TimelineEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_delete, sender=Photo)
+def invalidate_photo_fragments(sender, instance, **kwargs):
+    try:
+        invalidate_profile(instance.post.profile_id)
+    except Post.DoesNotExist:
+        pass
+
+
+@receiver(renditions_rendered, sender=Photo)
+def invalidate_rendered_photo_fragments(sender, file_name, **kwargs):
+    """The rendered photos replace their placeholders in the post lists of every profile sharing the file"""
+
+    for profile_id in Post.objects.filter(photo__photo=file_name).values_list('profile_id', flat=True).distinct():
+        invalidate_profile(profile_id)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.filter(pk=instance.profile_id).update(post_count=F('post_count') + 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    Profile.objects.filter(pk=instance.profile_id).update(post_count=Greatest(F('post_count') - 1, 0))
+
+
+def count_photo(photo, change):
+    """Change the photo counters of the post and its profile, drifted counters never go below zero"""
+
+    photo_count = Greatest(F('photo_count') + change, 0)
+    Post.objects.filter(pk=photo.post_id).update(photo_count=photo_count)
+    try:
+        Profile.objects.filter(pk=photo.post.profile_id).update(photo_count=photo_count)
+    except Post.DoesNotExist:
+        pass
+
+
+@receiver(post_save, sender=Photo)
+def count_created_photo(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        count_photo(instance, 1)
+
+
+@receiver(post_delete, sender=Photo)
+def count_deleted_photo(sender, instance, **kwargs):
+    count_photo(instance, -1)
@@ -0,0 +1,88 @@
+import re
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+# Suffixes are separated by a double dash, which slugify() never leaves in a slug,
+# so a suffixed slug can't be the plain slug of another base: "john-smith--2"
+INDEX_SEP = '--'
+# Room left after the base for the separator and the index
+INDEX_RESERVE = len(INDEX_SEP) + 8
+INDEXED_RE = re.compile(rf'^(?P<base>.+){INDEX_SEP}(?P<index>[1-9][0-9]*)$')
+
+
+class SlugAllocator:
+    """
+    Unique slugs reserved from a counter per base, instead of probing the table for free suffixes.
+
+    The counter of a base holds the number of slugs handed out for it, the first slug is the base
+    itself and the next ones get the "--2", "--3"... suffixes. Any number of slugs is reserved with
+    three queries, and the concurrent reservations of the same base wait for each other on its counter row.
+    """
+
+    def __init__(self, scope, max_length):
+        self.scope = scope
+        self.max_length = max_length
+
+    def get_base(self, value, default):
+        return value[:self.max_length - INDEX_RESERVE] or default
+
+    def candidate(self, base, index):
+        return base if index == 1 else f'{base}{INDEX_SEP}{index}'
+
+    def counters(self):
+        from .models import SlugCounter
+
+        return SlugCounter.objects.filter(scope=self.scope)
+
+    def allocate(self, values, default='slug'):
+        """Return a unique slug for each of the slugified values, in the same order"""
+
+        from .models import SlugCounter
+
+        bases = [self.get_base(value, default) for value in values]
+        wanted = {}
+        for base in bases:
+            wanted[base] = wanted.get(base, 0) + 1
+        if not wanted:
+            return []
+        ordered = sorted(wanted)
+        with transaction.atomic():
+            SlugCounter.objects.bulk_create([SlugCounter(scope=self.scope, base=base) for base in ordered],
+                                            ignore_conflicts=True)
+            self.counters().filter(base__in=ordered).update(last=F('last') + Case(
+                *[When(base=base, then=Value(count)) for base, count in wanted.items()],
+                output_field=IntegerField(),
+            ))
+            last = dict(self.counters().filter(base__in=ordered).values_list('base', 'last'))
+        # Hand out the reserved indexes of each base in the order of the values
+        next_index = {base: last[base] - count + 1 for base, count in wanted.items()}
+        slugs = []
+        for base in bases:
+            slugs.append(self.candidate(base, next_index[base]))
+            next_index[base] += 1
+        return slugs
+
+    def claim(self, slugs):
+        """Record slugs chosen elsewhere, so they are never handed out again"""
+
+        from .models import SlugCounter
+
+        claimed = {}
+        for slug in slugs:
+            claimed[slug] = max(claimed.get(slug, 0), 1)
+            match = INDEXED_RE.match(slug)
+            if match:
+                base, index = match['base'], int(match['index'])
+                claimed[base] = max(claimed.get(base, 0), index)
+        if not claimed:
+            return
+        ordered = sorted(claimed)
+        with transaction.atomic():
+            SlugCounter.objects.bulk_create([SlugCounter(scope=self.scope, base=base) for base in ordered],
+                                            ignore_conflicts=True)
+            self.counters().filter(base__in=ordered).update(last=Greatest(F('last'), Case(
+                *[When(base=base, then=Value(index)) for base, index in claimed.items()],
+                output_field=IntegerField(),
+            )))
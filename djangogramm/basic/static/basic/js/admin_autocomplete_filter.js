@@ -0,0 +1,11 @@
+// Reload the admin list filtered by the object picked in an autocomplete filter.
+django.jQuery(document).on('change', '.autocomplete-filter select', function () {
+    var url = new URL(window.location.href);
+    url.searchParams.delete('p');
+    if (this.value) {
+        url.searchParams.set(this.name, this.value);
+    } else {
+        url.searchParams.delete(this.name);
+    }
+    window.location.href = url;
+});
@@ -0,0 +1,13 @@
+// Replace the "Load more" link with the next page of the list, fetched as an HTML fragment.
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('.load-more a');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    var url = new URL(link.href);
+    url.searchParams.set('fragment', '1');
+    fetch(url, {credentials: 'same-origin'})
+        .then(function (response) { return response.text(); })
+        .then(function (html) { link.closest('.load-more').outerHTML = html; });
+});
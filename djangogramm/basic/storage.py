@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+from .renditions import get_preview_name, get_rendition_name, with_configured_renditions
+
+
+def get_content_hash(file):
+    """Return the SHA-256 hex digest of the file content, reading it chunk by chunk"""
+
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def get_blob_name(digest, file_name):
+    """Return the content-addressed name of the file: "blobs/ab/cd/abcd...ef.jpg" """
+
+    extension = os.path.splitext(file_name)[1].lower()
+    return os.path.join('blobs', digest[:2], digest[2:4], f'{digest}{extension}')
+
+
+def get_hashed_name(file, file_name):
+    """Return the file name made of the hash of the content: "Photo.JPG" -> "abcd...ef.jpg" """
+
+    return get_content_hash(file) + os.path.splitext(file_name)[1].lower()
+
+
+def get_image_file_names(name, field, renditions):
+    """Return the names of the image file, its StdImageField variations, renditions and admin preview"""
+
+    names = [name]
+    names += [field.attr_class.get_variation_name(name, variation) for variation in getattr(field, 'variations', {})]
+    names += [get_rendition_name(name, width, fmt) for fmt, widths in renditions.items() for width in widths]
+    names.append(get_preview_name(name))
+    return names
+
+
+def delete_image_files(name, field, renditions):
+    """Delete the image file with its variations and renditions"""
+
+    for file_name in get_image_file_names(name, field, with_configured_renditions(renditions)):
+        field.storage.delete(file_name)
+
+
+def move_file(storage, old_name, new_name):
+    """Move the stored file, renaming it in place when the storage is on the local file system"""
+
+    if not storage.exists(old_name):
+        return False
+    try:
+        old_path, new_path = storage.path(old_name), storage.path(new_name)
+    except NotImplementedError:
+        with storage.open(old_name) as f:
+            storage.save(new_name, f)
+        storage.delete(old_name)
+    else:
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(old_path, new_path)
+    return True
@@ -0,0 +1,145 @@
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from stdimage import StdImageField
+
+from .models import RenditionJob
+from .renditions import (
+    RENDITION_FIELDS, get_image_field, get_preview_name, render_preview, render_renditions, render_variation
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+# Sent by the model of the image field once the renditions of file_name are recorded
+renditions_rendered = Signal()
+
+
+def get_executor():
+    """Return the in-process pool rendering the variations right after the upload"""
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.RENDITION_WORKERS, thread_name_prefix='rendition')
+    return _executor
+
+
+def enqueue_rendition(file_name, field=RenditionJob.PHOTO):
+    """Create a job rendering the variations of the file"""
+
+    enqueue_renditions([file_name], field)
+
+
+def enqueue_renditions(file_names, field=RenditionJob.PHOTO):
+    """Create jobs rendering the variations of the files of the image field with one query.
+
+    With RENDITION_WORKERS set, the jobs are started in the in-process pool once the transaction commits,
+    otherwise they wait for the "drain_renditions" command"""
+
+    RenditionJob.objects.bulk_create(RenditionJob(file_name=file_name, field=field) for file_name in file_names)
+    if settings.RENDITION_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(_drain_in_thread, len(file_names)))
+
+
+def _drain_in_thread(limit):
+    try:
+        drain(limit)
+    except Exception:
+        logger.exception("Rendition worker crashed")
+    finally:
+        connection.close()
+
+
+def claim(pk):
+    """Take the due job, so no other worker runs it until the lease expires"""
+
+    now = timezone.now()
+    return bool(RenditionJob.objects.filter(
+        pk=pk, status=RenditionJob.PENDING, run_after__lte=now
+    ).update(
+        attempts=F('attempts') + 1,
+        run_after=now + timedelta(seconds=settings.RENDITION_LEASE),
+    ))
+
+
+def render(file_name, field):
+    """Render the variations and the responsive renditions of the file, return the rendered renditions"""
+
+    if isinstance(field, StdImageField):
+        for variation in field.variations.values():
+            render_variation(file_name, variation, field)
+    return render_renditions(file_name, field.storage)
+
+
+def render_missing_preview(file_name, field):
+    """Render the admin preview of the file unless it's stored already"""
+
+    if not field.storage.exists(get_preview_name(file_name)):
+        render_preview(file_name, field.storage)
+
+
+def run(job):
+    """Run the claimed job, rescheduling it with exponential backoff on failure"""
+
+    try:
+        if job.field in RenditionJob.PREVIEW_JOBS:
+            field = get_image_field(RenditionJob.PREVIEW_JOBS[job.field])
+            if field.model.objects.filter(**{field.name: job.file_name}).exists():
+                render_missing_preview(job.file_name, field)
+        else:
+            field = get_image_field(job.field)
+            renditions_field, ready_field = RENDITION_FIELDS[job.field]
+            queryset = field.model.objects.filter(**{field.name: job.file_name})
+            # The file could be replaced or deleted while the job was waiting
+            if queryset.exists():
+                values = {renditions_field: render(job.file_name, field)}
+                if ready_field:
+                    values[ready_field] = True
+                queryset.update(**values)
+                renditions_rendered.send(sender=field.model, field=field, file_name=job.file_name)
+    except Exception:
+        logger.warning("Rendering of %s failed, attempt %s", job.file_name, job.attempts, exc_info=True)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= settings.RENDITION_MAX_ATTEMPTS:
+            job.status = RenditionJob.FAILED
+        else:
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.RENDITION_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        job.save(update_fields=['status', 'run_after', 'last_error'])
+        return False
+
+    job.status = RenditionJob.DONE
+    job.save(update_fields=['status'])
+    return True
+
+
+def drain(limit=None):
+    """Run due jobs one by one until there are none left, return the numbers of done and failed runs"""
+
+    done = failed = 0
+    while limit is None or done + failed < limit:
+        pks = RenditionJob.objects.filter(
+            status=RenditionJob.PENDING, run_after__lte=timezone.now()
+        ).order_by('run_after').values_list('pk', flat=True)[:100]
+        if not pks:
+            break
+        for pk in pks:
+            if limit is not None and done + failed >= limit:
+                break
+            if not claim(pk):
+                continue
+            if run(RenditionJob.objects.get(pk=pk)):
+                done += 1
+            else:
+                failed += 1
+    return done, failed
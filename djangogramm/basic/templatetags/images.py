@@ -0,0 +1,33 @@
+from django import template
+
+from ..media import get_media_url, get_variation_url
+from ..renditions import get_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag('basic/includes/picture.html')
+def picture(file, renditions, src=None, alt='', sizes='100vw', **attrs):
+    """Render <picture> with a srcset per rendition format, falling back to src or the original file"""
+
+    return {
+        'sources': get_sources(file, renditions) if renditions else [],
+        'src': src or get_media_url(file.name),
+        'alt': alt,
+        'sizes': sizes,
+        'attrs': attrs,
+    }
+
+
+@register.filter
+def media_url(file):
+    """URL of the stored file, built without calling the storage"""
+
+    return get_media_url(file.name) if file else ''
+
+
+@register.filter
+def variation_url(file, variation):
+    """URL of the StdImageField variation of the file, e.g. {{ photo|variation_url:"thumbnail" }}"""
+
+    return get_variation_url(file, variation) if file else ''
@@ -0,0 +1,81 @@
+import io
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from mixer.backend.django import mixer
+from PIL import Image
+
+from basic.models import GrammUser, Profile
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Don't leak cached fragments into the next test, which may reuse the same pks"""
+
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def static_storage(settings):
+    """Render the templates without the collected static files manifest"""
+
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+@pytest.fixture
+def make_profile():
+    """
+    Build profiles. Users are passed explicitly, mixer can't keep generated one-to-one values unique across tests.
+    """
+
+    def make(**kwargs):
+        return mixer.blend(Profile, gramm_user=mixer.blend(GrammUser), **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def media_root(settings):
+    """Keep the uploaded files in a temporary MEDIA_ROOT and leave rendering to the tests"""
+
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    settings.RENDITION_WORKERS = 0
+    settings.RENDITION_WIDTHS = (100, 200)
+    settings.RENDITION_FORMATS = ('webp',)
+    yield settings.MEDIA_ROOT
+    shutil.rmtree(settings.MEDIA_ROOT)
+
+
+@pytest.fixture
+def make_image():
+    """Build in-memory image uploads, pass a color per file to get distinct contents"""
+
+    def make(name='test.png', size=(400, 300), color='red', image_format='PNG'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, format=image_format)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=Image.MIME[image_format])
+
+    return make
+
+
+@pytest.fixture
+def on_commit():
+    """Run the transaction.on_commit callbacks registered inside the block, the test transaction never commits"""
+
+    @contextmanager
+    def run_callbacks():
+        start = len(connection.run_on_commit)
+        yield
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
+
+    return run_callbacks
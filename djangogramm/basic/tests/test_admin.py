@@ -0,0 +1,193 @@
+import io
+import re
+from html import escape, unescape
+from unittest import mock
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_bakery import baker
+from PIL import Image, ImageFile
+
+from basic import pagination, tasks
+from basic.media import get_media_url
+from basic.models import GrammUser, Profile, Post, Photo, RenditionJob
+from basic.renditions import get_preview_name
+from basic.tasks import drain
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture
+def staff_client(client):
+    client.force_login(GrammUser.objects.create_superuser('admin@example.com', 'password'))
+    return client
+
+
+def make_posts(count):
+    posts = []
+    for number in range(count):
+        profile = baker.make(Profile, first_name='Ann', last_name=f'Lee{number}')
+        post = Post.objects.create(profile=profile, title=f'Post {number}')
+        Photo.objects.create(post=post, photo=f'photo{number}.png')
+        posts.append(post)
+    return posts
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+@pytest.mark.parametrize('model, queries', [
+    # count and page, whatever the number of rows, the user comes from the cache once warm
+    (Profile, 2),
+    (Post, 2),
+    (Photo, 2),
+])
+def test_changelist_queries_per_page(staff_client, model, queries):
+    url = reverse(f'admin:basic_{model._meta.model_name}_changelist')
+    make_posts(2)
+    staff_client.get(url)
+    assert count_queries(staff_client, url) == queries
+
+    make_posts(10)
+    assert count_queries(staff_client, url) == queries
+
+
+def test_autocomplete_filter(staff_client):
+    posts = make_posts(3)
+    url = reverse('admin:basic_post_changelist')
+
+    response = staff_client.get(url, {'profile__id__exact': posts[1].profile_id})
+
+    assert list(response.context['cl'].result_list) == [posts[1]]
+    # Only the picked profile is rendered in the filter, not the whole table
+    content = response.content.decode()
+    assert str(posts[1].profile) in content and str(posts[2].profile) not in content
+    assert 'basic/js/admin_autocomplete_filter.js' in content
+
+    response = staff_client.get(reverse('admin:basic_profile_autocomplete'), {'term': posts[2].profile.identifier})
+    assert [result['id'] for result in response.json()['results']] == [str(posts[2].profile_id)]
+
+
+def test_search_by_slug_prefix(staff_client):
+    posts = make_posts(2)
+
+    response = staff_client.get(reverse('admin:basic_post_changelist'), {'q': posts[0].slug[:-2]})
+
+    assert list(response.context['cl'].result_list) == [posts[0]]
+
+
+def test_search_by_name_and_title(staff_client):
+    make_posts(2)
+    profile = baker.make(Profile, first_name='Zoe', last_name='Quinn')
+    post = Post.objects.create(profile=profile, title='Sunset over the bay')
+
+    response = staff_client.get(reverse('admin:basic_profile_changelist'), {'q': 'zoe qui'})
+    assert list(response.context['cl'].result_list) == [profile]
+
+    response = staff_client.get(reverse('admin:basic_post_changelist'), {'q': 'sunset'})
+    assert list(response.context['cl'].result_list) == [post]
+
+
+def test_estimated_count(staff_client, monkeypatch):
+    make_posts(2)
+    monkeypatch.setattr(pagination, 'get_estimated_count', lambda queryset: 5000000)
+
+    with CaptureQueriesContext(connection) as context:
+        response = staff_client.get(reverse('admin:basic_post_changelist'))
+
+    assert response.context['cl'].result_count == 5000000
+    assert not any('COUNT(' in query['sql'] for query in context.captured_queries)
+
+
+def test_small_tables_are_counted(staff_client, monkeypatch):
+    make_posts(2)
+    monkeypatch.setattr(pagination, 'get_estimated_count', lambda queryset: 10)
+
+    response = staff_client.get(reverse('admin:basic_post_changelist'))
+
+    assert response.context['cl'].result_count == 2
+
+
+def get_preview_url(client, url):
+    content = client.get(url).content.decode()
+    assert 'loading="lazy"' in content and 'width="100" height="100"' in content
+    return unescape(re.search(r'<img src="([^"]+/preview/[^"]+)"', content).group(1))
+
+
+def test_photo_preview_rendered_on_demand(staff_client, media_root, make_image):
+    photo = Photo.objects.create(post=make_posts(1)[0], photo=make_image())
+    storage = photo.photo.storage
+
+    url = get_preview_url(staff_client, reverse('admin:basic_photo_changelist'))
+    assert get_media_url(photo.photo.name) not in url
+
+    response = staff_client.get(url)
+    assert response.status_code == 302
+    assert response.url == get_media_url(get_preview_name(photo.photo.name))
+    assert 'private' in response['Cache-Control'] and 'max-age' in response['Cache-Control']
+    with Image.open(storage.path(get_preview_name(photo.photo.name))) as preview:
+        assert preview.size == (100, 100)
+
+    assert staff_client.get(url.replace('?s=', '?s=x')).status_code == 404
+
+
+def test_truncated_photo_preview_not_found(staff_client, media_root, monkeypatch):
+    monkeypatch.setattr(ImageFile, 'LOAD_TRUNCATED_IMAGES', False)
+    buffer = io.BytesIO()
+    Image.effect_noise((400, 300), 64).convert('RGB').save(buffer, format='JPEG')
+    content = buffer.getvalue()
+    Photo.objects.create(post=make_posts(1)[0], photo=SimpleUploadedFile('test.jpg', content[:len(content) * 3 // 5]))
+
+    url = get_preview_url(staff_client, reverse('admin:basic_photo_changelist'))
+
+    assert staff_client.get(url).status_code == 404
+    assert not ImageFile.LOAD_TRUNCATED_IMAGES
+
+
+def test_rendered_preview_linked_directly(staff_client, media_root, make_image):
+    photo = Photo.objects.create(post=make_posts(1)[0], photo=make_image())
+    drain()
+
+    content = staff_client.get(reverse('admin:basic_photo_changelist')).content.decode()
+
+    assert f'<img src="{escape(get_media_url(get_preview_name(photo.photo.name)))}"' in content
+    assert f'/preview/{photo.photo.name}' not in content
+
+
+def test_avatar_preview(staff_client, media_root, make_image):
+    profile = baker.make(Profile, first_name='Ann', last_name='Lee', avatar=make_image('avatar.png'))
+
+    url = get_preview_url(staff_client, reverse('admin:basic_profile_change', args=[profile.pk]))
+
+    assert staff_client.get(url).status_code == 302
+    assert profile.avatar.storage.exists(get_preview_name(profile.avatar.name))
+
+
+def test_regenerate_previews_action(staff_client, media_root, make_image, monkeypatch):
+    photo = Photo.objects.create(post=make_posts(1)[0], photo=make_image())
+    drain()
+    storage = photo.photo.storage
+    assert storage.exists(get_preview_name(photo.photo.name))
+    storage.delete(get_preview_name(photo.photo.name))
+    url = reverse('admin:basic_photo_changelist')
+    data = {'action': 'regenerate_previews', '_selected_action': [photo.pk]}
+
+    # The existence of the previews is checked by the worker, not in the request
+    with mock.patch.object(storage, 'exists', side_effect=AssertionError):
+        staff_client.post(url, data)
+
+    job = RenditionJob.objects.get(status=RenditionJob.PENDING)
+    assert job.field == RenditionJob.PHOTO_PREVIEW
+    assert drain() == (1, 0)
+    assert storage.exists(get_preview_name(photo.photo.name))
+
+    staff_client.post(url, data)
+    monkeypatch.setattr(tasks, 'render_preview', mock.Mock(side_effect=AssertionError))
+    assert drain() == (1, 0)
\ No newline at end of file
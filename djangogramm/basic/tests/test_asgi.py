@@ -0,0 +1,49 @@
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient
+from django.urls import path, reverse
+from model_bakery import baker
+
+import djangogramm.urls
+from basic.instrumentation import stats
+from basic.models import Profile
+from basic.views import PeopleView, UserProfileView
+
+# The views as the ASGI mode routes them, ahead of the rest of the project
+urlpatterns = [
+    path('profile/<slug:profile_identifier>/', UserProfileView.as_async_view(), name='user-profile'),
+    path('people/', PeopleView.as_async_view(), name='people'),
+    *djangogramm.urls.urlpatterns,
+]
+
+pytestmark = [pytest.mark.django_db(transaction=True), pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture(autouse=True)
+def setup(settings):
+    settings.ROOT_URLCONF = __name__
+    settings.MIDDLEWARE = ['basic.middleware.InstrumentationMiddleware', *settings.MIDDLEWARE]
+    stats.reset()
+
+
+def test_async_views():
+    profiles = baker.make(Profile, _quantity=3)
+    client = AsyncClient()
+    async_to_sync(sync_to_async(client.force_login))(profiles[0].gramm_user)
+
+    async def get_pages():
+        return [
+            await client.get(reverse('user-profile', kwargs={'profile_identifier': profiles[1].identifier})),
+            await client.get(reverse('people')),
+        ]
+
+    profile_response, people_response = async_to_sync(get_pages)()
+
+    assert profile_response.status_code == people_response.status_code == 200
+    assert profile_response.context['profile'] == profiles[1]
+    assert profiles[2].identifier in people_response.content.decode()
+    # The queries of the worker threads are recorded for the request running them
+    snapshot = stats.snapshot()
+    assert snapshot['views']['UserProfileView']['queries']['count'] == 1
+    assert snapshot['views']['PeopleView']['queries']['count'] == 1
+    assert snapshot['views']['PeopleView']['queries']['p50'] > 0
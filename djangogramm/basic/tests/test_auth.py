@@ -0,0 +1,76 @@
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from basic.auth import get_cache, get_snapshot_key, get_version
+from basic.models import Profile
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture
+def profile(client):
+    profile = mixer.blend(Profile, gramm_user=mixer.blend(settings.AUTH_USER_MODEL), first_name='Ann')
+    client.force_login(profile.gramm_user)
+    return profile
+
+
+def get(client, path):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(path)
+    return response, len(context.captured_queries)
+
+
+def test_warm_request_without_auth_queries(client, profile):
+    path = reverse('new-post')
+
+    assert get(client, path)[1] == 2
+    response, queries = get(client, path)
+
+    assert queries == 0
+    assert response.wsgi_request.user == profile.gramm_user
+    assert response.wsgi_request.user.profile.identifier == profile.identifier
+
+
+def test_profile_save_invalidates(client, profile):
+    path = reverse('settings-profile', kwargs={'profile_identifier': profile.identifier})
+    client.get(path)
+
+    profile.first_name = 'Bob'
+    profile.save()
+
+    assert get(client, path)[0].context['form'].initial['first_name'] == 'Bob'
+
+
+def test_password_change_logs_out(client, profile):
+    path = reverse('new-post')
+    client.get(path)
+    user = profile.gramm_user
+
+    user.set_password('New-password-1')
+    user.save()
+
+    assert client.get(path).status_code == 302
+
+
+def test_logout_and_login(client, profile):
+    path = reverse('new-post')
+    client.get(path)
+
+    client.get(reverse('logout'))
+    assert client.get(path).status_code == 302
+
+    client.force_login(profile.gramm_user)
+    assert client.get(path).status_code == 200
+
+
+def test_snapshot_without_password(client, profile):
+    client.get(reverse('new-post'))
+    user = profile.gramm_user
+    snapshot = get_cache().get(get_snapshot_key(user.pk, get_version(user.pk)))
+
+    assert user.password not in snapshot['user']
+    assert snapshot['session_hash'] == user.get_session_auth_hash()
@@ -0,0 +1,77 @@
+import importlib
+from types import SimpleNamespace
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from basic.backfill import backfill, get_checkpoint_model, reset_checkpoint
+from basic.models import Profile
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def profiles():
+    return [baker.make(Profile, first_name='Ann', last_name=f'Lee {number}', bio='') for number in range(7)]
+
+
+def set_bio(profiles):
+    for profile in profiles:
+        profile.bio = f'Bio of {profile.last_name}'
+
+
+def test_backfill_in_batches(profiles):
+    with CaptureQueriesContext(connection) as context:
+        assert backfill(Profile.objects.all(), set_bio, ['bio'], name='test-batches', batch_size=3) == 7
+
+    assert [profile.bio for profile in Profile.objects.order_by('pk')] == [f'Bio of Lee {n}' for n in range(7)]
+    # Batches of 3, 3 and 1 rows, each read and written back with a query apiece
+    assert sum('UPDATE "basic_profile"' in query['sql'] for query in context.captured_queries) == 3
+    checkpoint = get_checkpoint_model().objects.get(name='test-batches')
+    assert (checkpoint.done, checkpoint.rows, checkpoint.last_pk) == (True, 7, str(profiles[-1].pk))
+
+    # A finished backfill doesn't run again until it's reset
+    assert backfill(Profile.objects.all(), set_bio, ['bio'], name='test-batches') == 0
+    reset_checkpoint('test-batches')
+    assert backfill(Profile.objects.all(), set_bio, ['bio'], name='test-batches') == 7
+
+
+def test_backfill_resumes(profiles):
+    seen = []
+
+    def fail_on_third_batch(objects):
+        if len(seen) == 6:
+            raise RuntimeError
+        seen.extend(profile.pk for profile in objects)
+        set_bio(objects)
+
+    with pytest.raises(RuntimeError):
+        backfill(Profile.objects.all(), fail_on_third_batch, ['bio'], name='test-resume', batch_size=3)
+    assert Profile.objects.filter(bio='').count() == 1
+
+    assert backfill(Profile.objects.all(), set_bio, ['bio'], name='test-resume', batch_size=3) == 1
+    assert not Profile.objects.filter(bio='').exists()
+    assert get_checkpoint_model().objects.get(name='test-resume').rows == 7
+
+
+def test_identifier_migration(profiles):
+    migration = importlib.import_module('basic.migrations.0011_populate_identifier_values')
+    Profile.objects.filter(pk=profiles[0].pk).update(identifier='')
+    reset_checkpoint('basic.0011_populate_identifier_values')
+
+    migration.gen_identifier(apps, SimpleNamespace(connection=connection))
+
+    assert Profile.objects.get(pk=profiles[0].pk).identifier == 'ann-lee-0'
+
+
+def test_identifier_migration_reversed(profiles):
+    migration = importlib.import_module('basic.migrations.0011_populate_identifier_values')
+    schema_editor = SimpleNamespace(connection=connection)
+    migration.gen_identifier(apps, schema_editor)
+
+    migration.reset_identifier_backfill(apps, schema_editor)
+
+    assert not get_checkpoint_model().objects.filter(name=migration.BACKFILL_NAME).exists()
@@ -0,0 +1,117 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from basic.cache import get_fragment, get_fragment_timeout, get_stats, reset_stats
+from basic.models import Post, Photo
+from basic.tasks import renditions_rendered
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture(autouse=True)
+def setup():
+    reset_stats()
+
+
+@pytest.fixture
+def profile(client, make_profile):
+    profile = make_profile()
+    client.force_login(profile.gramm_user)
+    return profile
+
+
+def get(client, path, **params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path, params)
+    assert response.status_code == 200
+    return response.content.decode(), len(queries)
+
+
+def test_fragment_stats():
+    def render():
+        return 'rendered'
+
+    assert get_fragment('menu', [], render) == 'rendered'
+    assert get_fragment('menu', [], lambda: 'not rendered') == 'rendered'
+    assert get_fragment('posts', [1], render) == 'rendered'
+    assert get_stats() == {'menu': {'hit': 1, 'miss': 1}, 'posts': {'hit': 0, 'miss': 1}}
+
+
+def test_fragment_timeout_capped_by_media_url_max_age(settings):
+    settings.FRAGMENT_CACHE_TIMEOUT = 3600
+    assert get_fragment_timeout() == 3600
+
+    settings.MEDIA_URL_MAX_AGE = 600
+    assert get_fragment_timeout() == 600
+
+    settings.MEDIA_URL_SIGNED = False
+    assert get_fragment_timeout() == 3600
+
+
+def test_posts_cached(client, profile, on_commit):
+    post = Post.objects.create(profile=profile, title='first post')
+    Photo.objects.create(post=post, photo='first.png')
+
+    content, cold = get(client, reverse('my-profile'))
+    cached, warm = get(client, reverse('my-profile'))
+
+    assert cached == content
+    # posts and photos, and the user with the profile cached for the authentication
+    assert warm == cold - 4
+    assert get_stats()['posts'] == {'hit': 1, 'miss': 1}
+
+    with on_commit():
+        Post.objects.create(profile=profile, title='second post')
+    content, _ = get(client, reverse('my-profile'))
+
+    assert 'second post' in content
+    with on_commit():
+        post.delete()
+    assert 'first post' not in get(client, reverse('my-profile'))[0]
+
+
+def test_posts_invalidated_by_rendered_photo(client, profile, on_commit):
+    photo = Photo.objects.create(post=Post.objects.create(profile=profile, title='post'), photo='photo.png')
+    assert 'placeholder.svg' in get(client, reverse('my-profile'))[0]
+
+    Photo.objects.filter(pk=photo.pk).update(rendered=True)
+    with on_commit():
+        renditions_rendered.send(sender=Photo, field=Photo._meta.get_field('photo'), file_name='photo.png')
+
+    assert 'placeholder.svg' not in get(client, reverse('my-profile'))[0]
+
+
+def test_person_rows_cached(client, profile, on_commit, make_profile):
+    person = make_profile(first_name='Ann', last_name='Lee')
+    make_profile(first_name='Bob', last_name='Lee')
+
+    get(client, reverse('people'))
+    get(client, reverse('people'))
+    assert get_stats()['person'] == {'hit': 2, 'miss': 2}
+    assert get_stats()['menu'] == {'hit': 1, 'miss': 1}
+
+    person.first_name = 'Anna'
+    with on_commit():
+        person.save()
+    content, _ = get(client, reverse('people'))
+
+    assert 'Anna Lee' in content
+    assert get_stats()['person'] == {'hit': 3, 'miss': 3}
+
+
+def test_file_based_cache(client, profile, settings, on_commit, tmp_path):
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(tmp_path),
+    }}
+    Post.objects.create(profile=profile, title='first post')
+
+    get(client, reverse('my-profile'))
+    with on_commit():
+        Post.objects.create(profile=profile, title='second post')
+
+    assert 'second post' in get(client, reverse('my-profile'))[0]
+    assert get_stats()['posts'] == {'hit': 0, 'miss': 2}
+    assert get_stats()['menu'] == {'hit': 1, 'miss': 1}
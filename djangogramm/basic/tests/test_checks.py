@@ -0,0 +1,126 @@
+import importlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import SystemCheckError
+
+from basic.signals import close_unusable_connections
+
+CACHED_TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'DIRS': [],
+    'APP_DIRS': False,
+    'OPTIONS': {'loaders': [('django.template.loaders.cached.Loader', [
+        'django.template.loaders.app_directories.Loader',
+    ])]},
+}]
+
+
+@pytest.fixture
+def production(settings, tmp_path):
+    settings.DEBUG = False
+    settings.TEMPLATES = CACHED_TEMPLATES
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path),
+    }}
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    settings.STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    settings.MEDIA_SERVE_OFFLOAD = 'x-accel-redirect'
+    return settings
+
+
+def load_production_settings():
+    # The profile checks the environment when it's imported
+    sys.modules.pop('djangogramm.settings_production', None)
+    return importlib.import_module('djangogramm.settings_production')
+
+
+def get_issue_ids():
+    with pytest.raises(SystemCheckError) as error:
+        call_command('check_performance')
+    return sorted(set(part.split(')')[0] for part in str(error.value).split('(basic.')[1:]))
+
+
+def test_development_settings_fail(settings):
+    settings.DEBUG = True
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    settings.MIDDLEWARE = ['basic.middleware.InstrumentationMiddleware', *settings.MIDDLEWARE]
+
+    assert get_issue_ids() == ['W101', 'W102', 'W105', 'W107', 'W108', 'W109', 'W110']
+
+
+def test_production_settings_pass(production, capsys):
+    call_command('check_performance')
+
+    assert 'no issues' in capsys.readouterr().out
+
+
+def test_unreachable_cache(production):
+    production.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/dev/null/cache',
+    }}
+
+    assert get_issue_ids() == ['W106']
+
+
+def test_persistent_connections_need_health_checks(production, monkeypatch):
+    fake = SimpleNamespace(alias='replica', vendor='postgresql', settings_dict={'CONN_MAX_AGE': 0})
+    monkeypatch.setattr('basic.checks.connections', SimpleNamespace(all=lambda: [fake]))
+    assert get_issue_ids() == ['W103']
+
+    fake.settings_dict['CONN_MAX_AGE'] = 600
+    assert get_issue_ids() == ['W104']
+
+    fake.settings_dict['CONN_HEALTH_CHECKS'] = True
+    call_command('check_performance')
+
+
+def test_close_unusable_connections(monkeypatch):
+    closed = []
+
+    def make_connection(usable, health_checks=True, in_atomic_block=False):
+        connection = SimpleNamespace(
+            connection=object(), in_atomic_block=in_atomic_block, is_usable=lambda: usable,
+            settings_dict={'CONN_HEALTH_CHECKS': health_checks},
+        )
+        connection.close = lambda: closed.append(connection)
+        return connection
+
+    broken = make_connection(False)
+    connections = [make_connection(True), broken, make_connection(False, health_checks=False),
+                   make_connection(False, in_atomic_block=True)]
+    monkeypatch.setattr('basic.signals.connections', SimpleNamespace(all=lambda: connections))
+
+    close_unusable_connections(sender=None)
+
+    assert closed == [broken]
+
+
+def test_production_profile(monkeypatch):
+    monkeypatch.delenv('CONN_MAX_AGE', raising=False)
+    monkeypatch.delenv('CACHE_DEFAULT_BACKEND', raising=False)
+    monkeypatch.setenv('CACHE_DEFAULT_LOCATION', '127.0.0.1:11211')
+    monkeypatch.setenv('MEDIA_URL', 'https://media.example.com/')
+    module = load_production_settings()
+
+    assert module.DEBUG is False
+    assert module.TEMPLATES[0]['OPTIONS']['loaders'][0][0] == 'django.template.loaders.cached.Loader'
+    assert not module.TEMPLATES[0]['APP_DIRS']
+    assert all(database['CONN_MAX_AGE'] == 600 and database['CONN_HEALTH_CHECKS']
+               for database in module.DATABASES.values())
+    assert module.CACHES['default']['BACKEND'] == 'django.core.cache.backends.memcached.MemcachedCache'
+    assert module.STATICFILES_STORAGE == 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+
+@pytest.mark.parametrize('unset', ['CACHE_DEFAULT_LOCATION', 'MEDIA_URL'])
+def test_production_profile_requires_environment(monkeypatch, unset):
+    monkeypatch.setenv('CACHE_DEFAULT_LOCATION', '127.0.0.1:11211')
+    monkeypatch.setenv('MEDIA_URL', 'https://media.example.com/')
+    monkeypatch.delenv(unset)
+
+    with pytest.raises(ImproperlyConfigured, match=unset):
+        load_production_settings()
@@ -0,0 +1,118 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from basic.feed import FeedPaginator
+from basic.models import Post, Photo, Follow, TimelineEntry
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture
+def author(make_profile):
+    return make_profile()
+
+
+@pytest.fixture
+def followers(author, make_profile):
+    followers = [make_profile() for _ in range(3)]
+    for follower in followers:
+        Follow.objects.follow(follower, author)
+    return followers
+
+
+def feed(profile, **cursors):
+    return FeedPaginator(profile, per_page=5).page(**cursors)
+
+
+def test_post_fanned_out(author, followers, make_profile):
+    post = Post.objects.create(profile=author, title='post')
+
+    assert set(TimelineEntry.objects.filter(post=post).values_list('owner', flat=True)) == \
+        {author.pk} | {follower.pk for follower in followers}
+    assert list(feed(followers[0])) == [post]
+    assert list(feed(author)) == [post]
+    assert list(feed(make_profile())) == []
+
+
+def test_follow_and_unfollow(author, make_profile):
+    follower = make_profile()
+    posts = [Post.objects.create(profile=author, title=f'post {i}') for i in range(3)]
+
+    assert Follow.objects.follow(follower, author)
+    assert not Follow.objects.follow(follower, author)
+    author.refresh_from_db()
+    assert author.follower_count == 1
+    assert list(feed(follower)) == posts[::-1]
+
+    assert Follow.objects.unfollow(follower, author)
+    assert not Follow.objects.unfollow(follower, author)
+    author.refresh_from_db()
+    assert author.follower_count == 0
+    assert list(feed(follower)) == []
+
+
+def test_high_follower_posts_pulled(author, followers, settings):
+    old_post = Post.objects.create(profile=author, title='pushed')
+    settings.FEED_FANOUT_LIMIT = 3
+    author.refresh_from_db()
+    posts = [Post.objects.create(profile=author, title=f'pulled {i}') for i in range(6)]
+    own_post = Post.objects.create(profile=followers[0], title='own')
+
+    assert not TimelineEntry.objects.filter(post__in=posts).exclude(owner=author).exists()
+
+    page = feed(followers[0])
+    assert list(page) == [own_post] + posts[::-1][:4]
+    assert page.has_next
+    page = feed(followers[0], after=page.next_cursor)
+    assert list(page) == posts[1::-1] + [old_post]
+    assert not page.has_next
+    page = feed(followers[0], before=page.previous_cursor)
+    assert list(page) == [own_post] + posts[::-1][:4]
+    assert not page.has_previous
+
+
+def test_feed_view(client, author, followers):
+    client.force_login(followers[0].gramm_user)
+    post = Post.objects.create(profile=author, title='followed post')
+    Photo.objects.create(post=post, photo='photo.png')
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('feed'))
+    content = response.content.decode()
+
+    assert response.status_code == 200
+    assert 'followed post' in content
+    assert author.get_absolute_url() in content
+    # user and profile of the session cached by force_login, timeline, pulled posts, photos
+    assert len(queries) == 5
+
+
+def test_follow_view(client, author, make_profile):
+    follower = make_profile()
+    client.force_login(follower.gramm_user)
+
+    assert client.get(reverse('follow-profile', args=[author.identifier])).status_code == 405
+    response = client.post(reverse('follow-profile', args=[author.identifier]))
+    assert response.url == author.get_absolute_url()
+    assert Follow.objects.filter(follower=follower, followee=author).exists()
+
+    client.post(reverse('unfollow-profile', args=[author.identifier]))
+    assert not Follow.objects.filter(follower=follower, followee=author).exists()
+    assert client.post(reverse('follow-profile', args=[follower.identifier])).status_code == 404
+
+
+def test_pulled_posts_stay_pulled(author, followers, settings, make_profile):
+    settings.FEED_FANOUT_LIMIT = 3
+    author.refresh_from_db()
+    pulled = Post.objects.create(profile=author, title='pulled')
+    Follow.objects.unfollow(followers[2], author)
+    author.refresh_from_db()
+    pushed = Post.objects.create(profile=author, title='pushed')
+
+    assert (pulled.fanned_out, pushed.fanned_out) == (False, True)
+    assert list(feed(followers[0])) == [pushed, pulled]
+    follower = make_profile()
+    Follow.objects.follow(follower, author)
+    assert list(feed(follower)) == [pushed, pulled]
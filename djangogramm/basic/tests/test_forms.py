@@ -1,12 +1,25 @@
+import os
+from unittest import mock
+
 import pytest
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
 from django.http import QueryDict
 
 from model_bakery import baker
 
 from basic.forms import CreateProfileForm, UpdateProfileForm, CreatePostForm
-from basic.models import Profile
+from basic.models import Profile, Post, Photo, RenditionJob, PhotoManager
+
+GIF = (b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9\x04'
+       b'\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02')
+
+
+def post_form_files(count):
+    files = QueryDict(mutable=True)
+    [files.update({'photos': SimpleUploadedFile(f'test{i}.gif', GIF)}) for i in range(count)]
+    return files
 
 
 @pytest.mark.django_db
@@ -106,3 +119,36 @@ def test_create_post_form_too_many_photos():
 
     assert not form.is_valid()
     assert form.errors.get('photos') == ['The number of photos in a post is limited to 10']
+
+
+@pytest.mark.django_db
+def test_create_post_form_save(media_root):
+    profile = baker.make(Profile)
+    form = CreatePostForm({'title': 'test post'}, post_form_files(3), profile=profile)
+
+    assert form.is_valid()
+    post = form.save()
+    photos = Photo.objects.filter(post=post)
+
+    assert photos.count() == 3
+    assert len({os.path.dirname(p.photo.name) for p in photos}) == 1
+    assert all(os.path.exists(p.photo.path) for p in photos)
+    assert set(RenditionJob.objects.values_list('file_name', flat=True)) == {p.photo.name for p in photos}
+    post.refresh_from_db()
+    profile.refresh_from_db()
+    assert post.photo_count == 3
+    assert (profile.post_count, profile.photo_count) == (1, 3)
+
+
+@pytest.mark.django_db
+def test_create_post_form_save_rollback(media_root):
+    profile = baker.make(Profile)
+    form = CreatePostForm({'title': 'test post'}, post_form_files(3), profile=profile)
+
+    assert form.is_valid()
+    with mock.patch.object(PhotoManager, 'bulk_create', side_effect=DatabaseError):
+        with pytest.raises(DatabaseError):
+            form.save()
+
+    assert not Post.objects.exists()
+    assert not any(files for _, _, files in os.walk(media_root))
@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+from model_bakery import baker
+
+from basic.cache import get_stats
+from basic.instrumentation import DISPATCH_UID, RequestRecorder, get_fingerprint, stats
+from basic.middleware import InstrumentationMiddleware
+from basic.models import Profile
+
+pytestmark = [pytest.mark.django_db, pytest.mark.usefixtures('static_storage')]
+
+
+@pytest.fixture(autouse=True)
+def setup(settings):
+    settings.MIDDLEWARE = ['basic.middleware.InstrumentationMiddleware', *settings.MIDDLEWARE]
+    stats.reset()
+
+
+def test_fingerprint():
+    assert get_fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND a = %s') == \
+        get_fingerprint('SELECT * FROM t WHERE id IN (%s) AND a = %s') == 'SELECT * FROM t WHERE id IN (...) AND a = %s'
+
+
+def test_queries_wrapped_only_with_middleware():
+    connection_created.disconnect(dispatch_uid=DISPATCH_UID)
+
+    InstrumentationMiddleware(lambda request: None)
+
+    assert connection_created.disconnect(dispatch_uid=DISPATCH_UID)
+
+
+def test_recorder():
+    profiles = baker.make(Profile, _quantity=3)
+
+    with RequestRecorder().capture() as recorder:
+        for profile in profiles:
+            Profile.objects.get(pk=profile.pk)
+        list(Profile.objects.filter(pk__in=[profile.pk for profile in profiles]))
+
+    assert recorder.queries == 4
+    assert list(recorder.duplicates.values()) == [3]
+    assert recorder.total_time >= recorder.sql_time > 0
+
+
+def test_middleware(client):
+    client.force_login(baker.make(Profile, _quantity=2)[0].gramm_user)
+
+    response = client.get(reverse('people'))
+    client.get(reverse('people'))
+
+    assert response['Server-Timing'].startswith('sql;dur=')
+    assert 'template;dur=' in response['Server-Timing']
+    view = stats.snapshot()['views']['PeopleView']
+    assert view['duration_ms']['count'] == view['queries']['count'] == 2
+    assert view['queries']['mean'] > 0 and view['template_ms']['mean'] > 0
+
+
+def test_report(client):
+    client.get(reverse('people'))
+    user = baker.make(Profile).gramm_user
+    client.force_login(user)
+    assert client.get(reverse('instrumentation')).status_code == 302
+
+    user.is_staff = True
+    user.save()
+    client.get(reverse('people'))
+    report = client.get(reverse('instrumentation')).json()
+    assert 'PeopleView' in report['views']
+    assert report['fragment_cache']['menu']['hit'] + report['fragment_cache']['menu']['miss'] > 0
+
+    client.post(reverse('instrumentation'))
+    assert stats.snapshot()['views'].keys() == {'instrumentation_report'}
+    assert get_stats() == {}
+
+
+def test_n_plus_one_command():
+    profile = baker.make(Profile)
+    stdout = io.StringIO()
+
+    call_command('n_plus_one', reverse('my-profile'), reverse('people'), '--json', '--user', profile.gramm_user.email,
+                 stdout=stdout, stderr=io.StringIO())
+
+    offenders = json.loads(stdout.getvalue())
+    assert isinstance(offenders, list)
+    assert stats.snapshot()['views'].keys() == {'UserProfileView', 'PeopleView'}
@@ -0,0 +1,180 @@
+import os
+import time
+
+import pytest
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import QueryDict
+from django.urls import reverse
+from model_bakery import baker
+
+from basic.media import get_media_url, check_signature, _build_url
+from basic.models import Profile, Post, Photo
+
+pytestmark = pytest.mark.django_db
+
+
+class CountingStorage(FileSystemStorage):
+    """Storage stand-in counting the calls which would reach a remote backend"""
+
+    calls = []
+
+
+for method in ('url', 'exists', 'open', 'size', 'path', 'listdir', 'get_modified_time', 'save', 'delete'):
+    def counted(self, *args, _method=method, **kwargs):
+        CountingStorage.calls.append(_method)
+        return getattr(FileSystemStorage, _method)(self, *args, **kwargs)
+
+    setattr(CountingStorage, method, counted)
+
+
+@pytest.fixture
+def storage(settings, media_root):
+    settings.DEFAULT_FILE_STORAGE = 'basic.tests.test_media.CountingStorage'
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    yield CountingStorage.calls
+    CountingStorage.calls.clear()
+
+
+def test_media_url(settings):
+    settings.MEDIA_URL_SIGNED = False
+    assert get_media_url('profiles/Ann Lee/photo 1.jpg') == '/media/profiles/Ann%20Lee/photo%201.jpg'
+
+    settings.MEDIA_URL_SIGNED = True
+    url = get_media_url('photo.jpg')
+    path, query = url.split('?')
+    assert path == '/media/photo.jpg'
+    assert check_signature('photo.jpg', QueryDict(query))
+    assert not check_signature('other.jpg', QueryDict(query))
+    hits = _build_url.cache_info().hits
+    assert get_media_url('photo.jpg') == url
+    assert _build_url.cache_info().hits == hits + 1
+
+
+def test_expiring_media_url(settings):
+    settings.MEDIA_URL_MAX_AGE = 3600
+    query = QueryDict(get_media_url('photo.jpg').split('?')[1])
+
+    assert int(query['e']) >= time.time() + 3600
+    assert check_signature('photo.jpg', query)
+    assert get_media_url('photo.jpg') == get_media_url('photo.jpg')
+
+    query = query.copy()
+    query['e'] = str(int(time.time()) - 1)
+    assert not check_signature('photo.jpg', query)
+
+
+def test_profile_images_without_storage_calls(client, storage):
+    profile = baker.make(Profile, avatar='avatar.png', avatar_renditions={'webp': [100, 200]})
+    post = Post.objects.create(profile=profile, title='post')
+    for i in range(3):
+        Photo.objects.create(post=post, photo=f'photo{i}.png', rendered=True, renditions={'webp': [100, 200]})
+    client.force_login(profile.gramm_user)
+    storage.clear()
+
+    content = client.get(reverse('my-profile')).content.decode()
+
+    assert content.count('<picture>') == 4
+    assert content.count('.thumbnail.png?s=') == 3
+    assert storage == []
+
+
+def test_admin_images_without_storage_calls(client, storage):
+    admin = baker.make(settings.AUTH_USER_MODEL, is_staff=True, is_superuser=True)
+    profile = baker.make(Profile, avatar='avatar.png')
+    post = Post.objects.create(profile=profile, title='post')
+    Photo.objects.create(post=post, photo='photo.png')
+    Photo.objects.create(post=post, photo='rendered.png', rendered=True, renditions={'webp': [100, 200]})
+    client.force_login(admin)
+    storage.clear()
+
+    assert '/admin/basic/profile/preview/avatar.png?s=' in \
+        client.get(reverse('admin:basic_profile_changelist')).content.decode()
+    content = client.get(reverse('admin:basic_photo_changelist')).content.decode()
+    # Only the previews which may be missing go through the admin view
+    assert '/admin/basic/photo/preview/photo.png?s=' in content
+    assert '/media/rendered.preview.' in content and '/preview/rendered.png' not in content
+    assert storage == []
+
+
+@pytest.fixture
+def media_file(media_root):
+    def write(name, content=b'0123456789'):
+        path = os.path.join(media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return get_media_url(name)
+    return write
+
+
+def get(client, url, **headers):
+    response = client.get(url, **headers)
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    response.close()
+    return response, content
+
+
+def test_serve_hashed_file(client, media_file):
+    url = media_file(f'blobs/ab/cd/{"a" * 64}.jpg')
+    response, content = get(client, url)
+
+    assert response.status_code == 200
+    assert content == b'0123456789'
+    assert response['Content-Type'] == 'image/jpeg'
+    assert response['Cache-Control'] == f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable'
+    assert response['ETag'] == f'"{"a" * 64}.jpg"'
+
+    response, content = get(client, url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+    assert content == b''
+
+
+def test_serve_changing_file(client, media_file):
+    url = media_file('profiles/Ann Lee/photo.jpg')
+    response, _ = get(client, url)
+
+    assert response['Cache-Control'] == 'no-cache'
+    assert get(client, url, HTTP_IF_NONE_MATCH=response['ETag'])[0].status_code == 304
+
+    media_file('profiles/Ann Lee/photo.jpg', b'changed content')
+    assert get(client, url, HTTP_IF_NONE_MATCH=response['ETag'])[0].status_code == 200
+
+
+def test_serve_range(client, media_file):
+    url = media_file('photo.jpg')
+    etag = get(client, url)[0]['ETag']
+
+    response, content = get(client, url, HTTP_RANGE='bytes=2-5')
+    assert response.status_code == 206
+    assert content == b'2345'
+    assert response['Content-Range'] == 'bytes 2-5/10'
+    assert response['Content-Length'] == '4'
+
+    assert get(client, url, HTTP_RANGE='bytes=-3')[1] == b'789'
+    assert get(client, url, HTTP_RANGE='bytes=8-')[1] == b'89'
+    assert get(client, url, HTTP_RANGE='bytes=20-')[0].status_code == 416
+    assert get(client, url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag)[1] == b'2345'
+    assert get(client, url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')[1] == b'0123456789'
+
+
+def test_serve_rejected(client, media_file, settings):
+    url = media_file('photo.jpg')
+
+    assert client.get(url.split('?')[0]).status_code == 404
+    assert client.get(url.replace('photo.jpg', 'missing.jpg')).status_code == 404
+    assert client.get('/media/../settings.py').status_code == 404
+    assert client.post(url).status_code == 405
+
+
+@pytest.mark.parametrize('offload, header, value', [
+    ('x-accel-redirect', 'X-Accel-Redirect', '/protected-media/Ann%20Lee/photo.jpg'),
+    ('x-sendfile', 'X-Sendfile', os.path.join('{media_root}', 'Ann Lee', 'photo.jpg')),
+])
+def test_serve_offloaded(client, media_file, media_root, settings, offload, header, value):
+    settings.MEDIA_SERVE_OFFLOAD = offload
+    response, content = get(client, media_file('Ann Lee/photo.jpg'))
+
+    assert response[header] == value.format(media_root=media_root)
+    assert content == b''
+    assert response['ETag']
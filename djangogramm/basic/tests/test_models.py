@@ -3,7 +3,9 @@ import urllib
 
 import pytest
 from django.conf import settings
+from django.core.management import call_command
 from mixer.backend.django import mixer
+from model_bakery import baker
 
 from basic.models import GrammUser, Profile, Post, Photo
 
@@ -54,3 +56,42 @@ def test_post_model(post):
 def test_photo_model(photo):
     assert photo.__class__ is Photo
     assert str(photo) == f"{photo.post} - {photo.pk}"
+
+
+@pytest.mark.django_db
+def test_counters():
+    profile = baker.make(Profile)
+    post = Post.objects.create(profile=profile, title='post')
+    photos = [Photo.objects.create(post=post, photo=f'{i}.png') for i in range(3)]
+    Post.objects.create(profile=profile, title='other post')
+    photos[0].delete()
+
+    # A stale instance doesn't write its counters back
+    profile.bio = 'bio'
+    profile.save()
+    post.save()
+
+    profile.refresh_from_db()
+    post.refresh_from_db()
+    assert (profile.post_count, profile.photo_count) == (2, 2)
+    assert post.photo_count == 2
+
+    post.delete()
+    profile.refresh_from_db()
+    assert (profile.post_count, profile.photo_count) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_reconcile_counters():
+    profiles = baker.make(Profile, _quantity=3)
+    post = Post.objects.create(profile=profiles[0], title='post')
+    Photo.objects.create(post=post, photo='photo.png')
+    Profile.objects.filter(pk=profiles[0].pk).update(post_count=5, photo_count=0)
+    Profile.objects.filter(pk=profiles[1].pk).update(follower_count=1)
+    Post.objects.filter(pk=post.pk).update(photo_count=0)
+
+    call_command('reconcile_counters', batch_size=2)
+
+    assert list(Profile.objects.order_by('pk').values_list('post_count', 'photo_count', 'follower_count')) == \
+        [(1, 1, 0), (0, 0, 0), (0, 0, 0)]
+    assert Post.objects.get().photo_count == 1
@@ -0,0 +1,45 @@
+import pytest
+
+from mixer.backend.django import mixer
+
+from basic.models import Profile, Post
+from basic.pagination import KeysetPaginator, InvalidCursor
+
+
+@pytest.fixture
+def posts(db):
+    profile = mixer.blend(Profile)
+    posts = [Post.objects.create(profile=profile, title=f'post {i}') for i in range(7)]
+    # Same timestamps must still be ordered by the tie-breaking key
+    Post.objects.filter(pk__in=[p.pk for p in posts[2:5]]).update(time_create=posts[2].time_create)
+    return list(Post.objects.order_by('-time_create', '-id'))
+
+
+def test_keyset_pages_forward(posts):
+    paginator = KeysetPaginator(Post.objects.all(), ('-time_create', '-id'), per_page=3)
+
+    first = paginator.page()
+    second = paginator.page(after=first.next_cursor)
+    third = paginator.page(after=second.next_cursor)
+
+    assert list(first) + list(second) + list(third) == posts
+    assert first.has_next and not first.has_previous
+    assert second.has_next and second.has_previous
+    assert not third.has_next and third.next_cursor is None
+
+
+def test_keyset_pages_backward(posts):
+    paginator = KeysetPaginator(Post.objects.all(), ('-time_create', '-id'), per_page=3)
+
+    second = paginator.page(after=paginator.page().next_cursor)
+    first = paginator.page(before=second.previous_cursor)
+
+    assert list(first) == posts[:3]
+    assert not first.has_previous and first.has_next
+
+
+def test_keyset_invalid_cursor(posts):
+    paginator = KeysetPaginator(Post.objects.all(), ('-time_create', '-id'), per_page=3)
+
+    with pytest.raises(InvalidCursor):
+        paginator.page(after='not-a-cursor')
@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from basic.models import Profile, Post, SlugCounter
+from basic.slugs import SlugAllocator
+
+
+@pytest.mark.django_db
+def test_allocate():
+    allocator = SlugAllocator('test', 20)
+
+    with CaptureQueriesContext(connection) as queries:
+        slugs = allocator.allocate(['sea', 'sky', 'sea', '', 'a-very-long-title-of-the-post'], default='post')
+
+    assert slugs == ['sea', 'sky', 'sea--2', 'post', 'a-very-lon']
+    assert len([query for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]) == 3
+    assert allocator.allocate(['sea', 'a-very-long-title-of-the-post']) == ['sea--3', 'a-very-lon--2']
+    assert allocator.allocate([]) == []
+
+
+@pytest.mark.django_db
+def test_claim():
+    allocator = SlugAllocator('test', 50)
+    allocator.claim(['sea', 'sky--7', 'sand-2'])
+
+    assert allocator.allocate(['sea', 'sky', 'sand', 'sand-2']) == ['sea--2', 'sky--8', 'sand', 'sand-2--2']
+    assert SlugAllocator('other', 50).allocate(['sea']) == ['sea']
+
+
+@pytest.mark.django_db
+def test_same_names():
+    profiles = [baker.make(Profile, first_name='John', last_name='Smith', identifier='') for _ in range(3)]
+    explicit = baker.make(Profile, identifier='jane-doe')
+    namesake = baker.make(Profile, first_name='Jane', last_name='Doe', identifier='')
+
+    assert [profile.identifier for profile in profiles] == ['john-smith', 'john-smith--2', 'john-smith--3']
+    assert namesake.identifier == 'jane-doe--2' != explicit.identifier
+
+    posts = [Post.objects.create(profile=profiles[0], title='Vacation') for _ in range(3)]
+    assert [post.slug for post in posts] == ['john-smith-vacation', 'john-smith-vacation--2', 'john-smith-vacation--3']
+    posts[0].title = 'Holiday'
+    posts[0].save()
+    posts[0].refresh_from_db()
+    assert posts[0].slug == 'john-smith-vacation'
+
+
+@pytest.mark.django_db
+def test_renamed_slugs_claimed(django_assert_num_queries):
+    profile = baker.make(Profile, first_name='Ann', last_name='Lee', identifier='')
+    post = Post.objects.create(profile=profile, title='Vacation')
+
+    profile = Profile.objects.get(pk=profile.pk)
+    profile.identifier = 'jane-doe'
+    profile.save()
+    post = Post.objects.get(pk=post.pk)
+    post.slug = 'jane-doe-vacation'
+    post.save()
+
+    assert baker.make(Profile, first_name='Jane', last_name='Doe', identifier='').identifier == 'jane-doe--2'
+    jane = Profile.objects.get(identifier='jane-doe--2')
+    assert Post.objects.create(profile=jane, title='Vacation').slug == 'jane-doe-vacation--2'
+    # An unchanged slug isn't claimed again
+    with django_assert_num_queries(1):
+        post.save()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_posts():
+    profile = baker.make(Profile, first_name='John', last_name='Smith')
+
+    def create_post():
+        # The in-memory SQLite test database fails on a lock instead of waiting for it like the other databases
+        while True:
+            try:
+                with transaction.atomic():
+                    return Post.objects.create(profile=profile, title='Vacation').slug
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+                time.sleep(0.001)
+
+    def create_posts(count):
+        try:
+            return [create_post() for _ in range(count)]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(8) as executor:
+        slugs = [slug for thread_slugs in executor.map(create_posts, [5] * 8) for slug in thread_slugs]
+
+    assert sorted(slugs) == sorted(['john-smith-vacation'] + [f'john-smith-vacation--{i}' for i in range(2, 41)])
+    assert SlugCounter.objects.get(scope='post', base='john-smith-vacation').last == 40
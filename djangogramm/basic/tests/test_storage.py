@@ -0,0 +1,112 @@
+import io
+import os
+
+from django.core.management import call_command
+from mixer.backend.django import mixer
+from model_bakery import baker
+
+from basic.models import Post, Photo, Blob, RenditionJob, Profile
+from basic.storage import get_content_hash
+from basic.tasks import drain
+
+
+def test_same_content_shared(db, media_root, make_image):
+    first = Photo.objects.create(post=mixer.blend(Post), photo=make_image('first.png'))
+    drain()
+    second, third = Photo.objects.bulk_create_for_post(
+        mixer.blend(Post), [make_image('second.png'), make_image('third.png', color='blue')]
+    )
+    first.refresh_from_db()
+
+    assert first.photo.name == second.photo.name
+    assert first.photo.name.startswith('blobs/')
+    assert second.rendered and second.renditions == first.renditions
+    assert not third.rendered
+    assert Blob.objects.get(name=first.photo.name).refcount == 2
+    assert RenditionJob.objects.filter(status=RenditionJob.PENDING).count() == 1
+
+
+def test_blob_deleted_with_last_reference(db, media_root, on_commit, make_image):
+    first = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+    second = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+    drain()
+    path = first.photo.path
+
+    with on_commit():
+        first.delete()
+    assert os.path.exists(path)
+    assert Blob.objects.get().refcount == 1
+
+    with on_commit():
+        second.delete()
+    assert not os.path.exists(path)
+    assert not Blob.objects.exists()
+    assert not [files for _, _, files in os.walk(media_root) if files], list(os.walk(media_root))
+
+
+def test_blob_stored_again_before_deletion(db, media_root, on_commit, make_image):
+    first = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+    path = first.photo.path
+
+    # The last reference is dropped, and a new one taken before the deletion runs after the commit
+    with on_commit():
+        first.delete()
+        second = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+
+    assert Blob.objects.get().refcount == 1
+    assert second.blob_id == first.blob_id
+    assert os.path.exists(path)
+
+
+def test_path_storage_mode(db, media_root, settings, make_image):
+    settings.PHOTO_STORAGE_MODE = 'path'
+    photo = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+
+    assert photo.blob is None
+    assert photo.photo.name.startswith('profiles/')
+
+    drain()
+    photo.delete()
+    assert not [files for _, _, files in os.walk(media_root) if files], list(os.walk(media_root))
+
+
+def test_convert_photo_storage_command(db, media_root, settings, on_commit, make_image):
+    settings.PHOTO_STORAGE_MODE = 'path'
+    first = Photo.objects.create(post=mixer.blend(Post), photo=make_image('first.png'))
+    second = Photo.objects.create(post=mixer.blend(Post), photo=make_image('second.png'))
+    drain()
+    old_path = second.photo.path
+
+    out = io.StringIO()
+    with on_commit():
+        call_command('convert_photo_storage', stdout=out)
+    first.refresh_from_db()
+    second.refresh_from_db()
+
+    assert 'Moved 1 photos, merged 1 duplicates' in out.getvalue()
+    assert first.photo.name == second.photo.name == Blob.objects.get(refcount=2).name
+    assert second.rendered
+    assert os.path.exists(first.photo.path)
+    assert os.path.exists(first.photo.thumbnail.path)
+    assert not os.path.exists(old_path)
+
+
+def test_avatar_named_by_content(db, media_root, make_image):
+    avatar = make_image('My Avatar.PNG')
+    profile = baker.make(Profile, first_name='Ann', last_name='Lee', avatar=avatar)
+
+    assert profile.avatar.name == f'profiles/Ann Lee/avatar/{get_content_hash(avatar)}.png'
+
+
+def test_distinct_photos_stored_in_batch(db, media_root, django_assert_num_queries, make_image):
+    files = [make_image(f'photo{number}.png', color=(number, 0, 0)) for number in range(10)]
+    Blob.objects.store([make_image('shared.png', color=(0, 0, 0))])
+
+    # Existing blobs, inserting the missing ones, reading them back and the refcounts in a savepoint,
+    # whatever the count
+    with django_assert_num_queries(6):
+        blobs = Blob.objects.store(files)
+
+    assert len({blob.pk for blob in blobs}) == 10
+    assert sorted(Blob.objects.values_list('refcount', flat=True)) == [1] * 9 + [2]
+    assert all(os.path.exists(os.path.join(media_root, blob.name)) for blob in blobs)
@@ -0,0 +1,156 @@
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from mixer.backend.django import mixer
+from PIL import Image, ImageFile
+
+from basic.models import Post, Photo, Profile, RenditionJob
+from basic.renditions import get_rendition_name, is_up_to_date
+from basic.tasks import drain, get_executor
+
+
+@pytest.fixture
+def photo(db, media_root, make_image):
+    return Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+
+
+def test_photo_rendered_in_background(photo):
+    job = RenditionJob.objects.get()
+
+    assert not photo.rendered
+    assert not os.path.exists(photo.photo.thumbnail.path)
+    assert job.file_name == photo.photo.name
+
+    assert drain() == (1, 0)
+
+    photo.refresh_from_db()
+    job.refresh_from_db()
+    assert photo.rendered
+    assert job.status == RenditionJob.DONE
+    with Image.open(photo.photo.thumbnail.path) as thumbnail:
+        assert max(thumbnail.size) == 250
+
+
+def test_responsive_renditions(photo, on_commit):
+    drain()
+    photo.refresh_from_db()
+
+    assert photo.renditions == {'webp': [100, 200]}
+    for width in (100, 200):
+        with Image.open(photo.photo.storage.path(get_rendition_name(photo.photo.name, width, 'webp'))) as image:
+            assert image.format == 'WEBP'
+            assert image.width == width
+
+    path = photo.photo.storage.path(get_rendition_name(photo.photo.name, 100, 'webp'))
+    with on_commit():
+        photo.delete()
+    assert not os.path.exists(path)
+
+
+def test_small_original_not_scaled_up(db, media_root, make_image):
+    photo = Photo.objects.create(post=mixer.blend(Post), photo=make_image(size=(150, 100)))
+    drain()
+    photo.refresh_from_db()
+
+    assert photo.renditions == {'webp': [100, 150]}
+    with Image.open(photo.photo.storage.path(get_rendition_name(photo.photo.name, 150, 'webp'))) as image:
+        assert image.width == 150
+    assert not photo.photo.storage.exists(get_rendition_name(photo.photo.name, 200, 'webp'))
+    assert is_up_to_date(photo.renditions)
+
+
+def test_renditions_up_to_date(media_root, settings):
+    assert is_up_to_date({'webp': [100, 200]})
+    assert is_up_to_date({'webp': [100, 150]})
+    assert not is_up_to_date({})
+    assert not is_up_to_date({'webp': [100]})
+    assert not is_up_to_date({'webp': [200]})
+    assert not is_up_to_date({'webp': [100, 200], 'avif': [100, 200]})
+    settings.RENDITION_WIDTHS = (100, 200, 400)
+    assert not is_up_to_date({'webp': [100, 200]})
+
+
+def test_avatar_renditions(db, media_root, make_image):
+    profile = mixer.blend(Profile, avatar=make_image('avatar.png'))
+
+    assert RenditionJob.objects.get().field == RenditionJob.AVATAR
+    assert drain() == (1, 0)
+    profile.refresh_from_db()
+    assert profile.avatar_renditions == {'webp': [100, 200]}
+
+    profile.avatar = make_image('new-avatar.png')
+    profile.save()
+    profile.refresh_from_db()
+    assert profile.avatar_renditions == {}
+
+
+def test_backfill_renditions_command(photo):
+    drain()
+    Photo.objects.update(renditions={})
+    old_photo = Photo.objects.get()
+
+    call_command('backfill_renditions', stdout=io.StringIO())
+    call_command('backfill_renditions', stdout=io.StringIO())
+    assert RenditionJob.objects.filter(status=RenditionJob.PENDING).count() == 1
+
+    call_command('backfill_renditions', '--now', stdout=io.StringIO())
+    old_photo.refresh_from_db()
+    assert old_photo.renditions == {'webp': [100, 200]}
+
+
+def test_rendition_retry(photo, settings):
+    settings.RENDITION_MAX_ATTEMPTS = 2
+    os.remove(photo.photo.path)
+
+    assert drain() == (0, 1)
+    job = RenditionJob.objects.get()
+    assert job.status == RenditionJob.PENDING
+    assert job.attempts == 1
+    assert job.run_after > timezone.now()
+    assert job.last_error
+
+    RenditionJob.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+    assert drain() == (0, 1)
+    job.refresh_from_db()
+    assert job.status == RenditionJob.FAILED
+
+
+def test_truncated_original_fails(db, media_root, settings, monkeypatch):
+    settings.RENDITION_MAX_ATTEMPTS = 1
+    monkeypatch.setattr(ImageFile, 'LOAD_TRUNCATED_IMAGES', False)
+    buffer = io.BytesIO()
+    Image.effect_noise((400, 300), 64).convert('RGB').save(buffer, format='JPEG')
+    content = buffer.getvalue()
+    Photo.objects.create(post=mixer.blend(Post), photo=SimpleUploadedFile('test.jpg', content[:len(content) * 3 // 5]))
+
+    assert drain() == (0, 1)
+    job = RenditionJob.objects.get()
+    assert job.status == RenditionJob.FAILED
+    assert 'truncated' in job.last_error
+    # Pillow keeps refusing truncated files in the rest of the process, the upload validation included
+    assert not ImageFile.LOAD_TRUNCATED_IMAGES
+
+
+def test_drain_renditions_command(photo):
+    out = io.StringIO()
+    call_command('drain_renditions', stdout=out)
+    photo.refresh_from_db()
+
+    assert 'Rendered 1 jobs, 0 failed' in out.getvalue()
+    assert photo.rendered
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rendition_worker_thread(media_root, settings, make_image):
+    settings.RENDITION_WORKERS = 1
+    photo = Photo.objects.create(post=mixer.blend(Post), photo=make_image())
+
+    get_executor().submit(lambda: None).result(timeout=10)
+    photo.refresh_from_db()
+
+    assert photo.rendered
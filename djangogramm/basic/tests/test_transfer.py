@@ -0,0 +1,118 @@
+import io
+import json
+
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command, CommandError
+from model_bakery import baker
+
+from basic.models import GrammUser, Profile, Post, Photo, Blob, RenditionJob, Follow, TimelineEntry
+from basic.storage import get_blob_name
+from basic.transfer import RecordWriter, parse_time
+
+DIGEST = 'a' * 64
+BLOB_NAME = get_blob_name(DIGEST, 'photo.jpg')
+
+RECORDS = [
+    {'type': 'user', 'email': 'ann@example.com', 'password': 'secret-1'},
+    {'type': 'user', 'email': 'bob@example.com', 'password_hash': 'md5$salt$hash', 'is_active': False},
+    {'type': 'profile', 'email': 'ann@example.com', 'first_name': 'Ann', 'last_name': 'Lee', 'bio': 'Hi'},
+    {'type': 'profile', 'email': 'bob@example.com', 'first_name': 'Ann', 'last_name': 'Lee'},
+    {'type': 'post', 'email': 'ann@example.com', 'title': 'Sea', 'time_create': '2020-01-02T03:04:05Z'},
+    {'type': 'post', 'email': 'ann@example.com', 'title': 'Sea'},
+    {'type': 'photo', 'post': 'ann-lee-sea', 'photo': BLOB_NAME},
+    {'type': 'photo', 'post': 'ann-lee-sea', 'photo': BLOB_NAME},
+    {'type': 'photo', 'post': 'ann-lee-sea--2', 'photo': 'photos/sea.jpg', 'rendered': True,
+     'renditions': {'webp': [100]}},
+]
+
+
+def import_records(tmp_path, records, fmt='ndjson', **options):
+    path = tmp_path / f'records.{fmt}'
+    with open(path, 'w', newline='') as stream:
+        if fmt == 'ndjson':
+            stream.writelines(json.dumps(record) + '\n' for record in records)
+        else:
+            writer = RecordWriter(stream, fmt)
+            for record in records:
+                writer.write(record)
+    call_command('import_gramm', str(path), stdout=io.StringIO(), stderr=io.StringIO(), **options)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_import(tmp_path, fmt):
+    baker.make(Profile, identifier='ann-lee')
+
+    import_records(tmp_path, RECORDS, fmt, batch_size=1)
+
+    ann, bob = GrammUser.objects.get(email='ann@example.com'), GrammUser.objects.get(email='bob@example.com')
+    assert check_password('secret-1', ann.password)
+    assert (bob.password, bob.is_active) == ('md5$salt$hash', False)
+    assert ann.profile.identifier == 'ann-lee--2' and ann.profile.bio == 'Hi'
+    assert bob.profile.identifier == 'ann-lee--3'
+
+    posts = list(Post.objects.order_by('pk'))
+    assert [post.slug for post in posts] == ['ann-lee-sea', 'ann-lee-sea--2']
+    assert posts[0].time_create == parse_time('2020-01-02T03:04:05Z')
+    assert [post.photo_count for post in posts] == [2, 1]
+    ann.profile.refresh_from_db()
+    assert (ann.profile.post_count, ann.profile.photo_count) == (2, 3)
+
+    blob = Blob.objects.get()
+    assert (blob.name, blob.refcount) == (BLOB_NAME, 2)
+    assert Photo.objects.filter(blob=blob).count() == 2
+    assert list(RenditionJob.objects.values_list('file_name', flat=True)) == [BLOB_NAME]
+
+
+@pytest.mark.django_db
+def test_import_fans_out(tmp_path, settings):
+    settings.FEED_FANOUT_LIMIT = 2
+    ann = baker.make(Profile, first_name='Ann', last_name='Lee', identifier='', gramm_user__email='ann@example.com')
+    bob = baker.make(Profile, first_name='Bob', last_name='Lee', identifier='', gramm_user__email='bob@example.com')
+    followers = [baker.make(Profile, identifier=f'follower-{number}') for number in range(2)]
+    Follow.objects.follow(followers[0], ann)
+    for follower in followers:
+        Follow.objects.follow(follower, bob)
+
+    import_records(tmp_path, [
+        {'type': 'post', 'email': 'ann@example.com', 'title': 'Sea', 'time_create': '2020-01-02T03:04:05Z'},
+        {'type': 'post', 'email': 'bob@example.com', 'title': 'Sky'},
+    ])
+
+    sea, sky = Post.objects.get(slug='ann-lee-sea'), Post.objects.get(slug='bob-lee-sky')
+    assert (sea.fanned_out, sky.fanned_out) == (True, False)
+    assert set(TimelineEntry.objects.values_list('owner', 'post', 'time_create')) == {
+        (ann.pk, sea.pk, sea.time_create), (followers[0].pk, sea.pk, sea.time_create),
+        (bob.pk, sky.pk, sky.time_create),
+    }
+
+
+@pytest.mark.django_db
+def test_import_missing_reference(tmp_path):
+    with pytest.raises(CommandError, match='nobody@example.com'):
+        import_records(tmp_path, [{'type': 'post', 'email': 'nobody@example.com', 'title': 'Sea'}])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_round_trip(tmp_path, fmt):
+    import_records(tmp_path, RECORDS)
+    path = tmp_path / f'export.{fmt}'
+    call_command('export_gramm', str(path), batch_size=2, stderr=io.StringIO())
+    exported = [
+        (user.email, user.password, user.profile.identifier, [(post.slug, post.time_create, post.photo_count)
+                                                              for post in user.profile.post_set.order_by('pk')])
+        for user in GrammUser.objects.order_by('pk')
+    ]
+
+    for model in (Photo, Blob, RenditionJob, Post, Profile, GrammUser):
+        model.objects.all().delete()
+    call_command('import_gramm', str(path), stdout=io.StringIO(), stderr=io.StringIO())
+
+    assert [
+        (user.email, user.password, user.profile.identifier, [(post.slug, post.time_create, post.photo_count)
+                                                              for post in user.profile.post_set.order_by('pk')])
+        for user in GrammUser.objects.order_by('pk')
+    ] == exported
+    assert Photo.objects.get(photo='photos/sea.jpg').renditions == {'webp': [100]}
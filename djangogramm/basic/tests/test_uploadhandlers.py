@@ -0,0 +1,97 @@
+import io
+import os
+from unittest import mock
+
+import pytest
+from django import forms
+from django.conf import settings, global_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from mixer.backend.django import mixer
+from PIL import Image
+
+from basic.models import Profile, Post, Photo
+from basic.uploadhandlers import ImageUploadHandler
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestImageUploadHandler(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def media(self, media_root, settings, make_image):
+        settings.FILE_UPLOAD_TEMP_DIR = os.path.join(media_root, 'uploads')
+        self.make_image = make_image
+
+    def setUp(self) -> None:
+        self.user = mixer.blend(settings.AUTH_USER_MODEL)
+        self.profile = mixer.blend(Profile, gramm_user=self.user)
+        self.path = reverse('new-post')
+        self.client.force_login(self.user)
+
+    def upload(self, *photos):
+        return self.client.post(self.path, {'title': 'test post', 'photos': list(photos)})
+
+    def assert_no_temporary_files(self):
+        assert not os.listdir(settings.FILE_UPLOAD_TEMP_DIR)
+
+    def test_upload_images(self):
+        # Images checked by the handler are decoded once by the form, ImageField doesn't open them again
+        with mock.patch.object(forms.ImageField, 'to_python', side_effect=AssertionError):
+            response = self.upload(self.make_image('first.png'), self.make_image('second.jpg', image_format='JPEG'))
+
+        assert response.status_code == 302
+        photos = Photo.objects.filter(post__profile=self.profile)
+        assert photos.count() == 2
+        assert all(os.path.exists(photo.photo.path) for photo in photos)
+        self.assert_no_temporary_files()
+
+    def test_upload_not_image(self):
+        response = self.upload(self.make_image(), SimpleUploadedFile('test.png', b'not an image' * 100))
+
+        assert response.status_code == 200
+        assert 'Upload a valid image' in response.content.decode()
+        assert not Post.objects.exists()
+        self.assert_no_temporary_files()
+
+    def test_upload_truncated_image(self):
+        # verify() only catches the truncated PNG by its checksums, the image has to be decoded for the others
+        for image_format in ('PNG', 'JPEG', 'GIF'):
+            with self.subTest(image_format):
+                buffer = io.BytesIO()
+                Image.effect_noise((400, 300), 64).save(buffer, format=image_format)
+                content = buffer.getvalue()
+                name = f'test.{image_format.lower()}'
+                response = self.upload(SimpleUploadedFile(name, content[:len(content) * 3 // 5]))
+
+                assert 'Upload a valid image' in response.content.decode()
+                assert not Post.objects.exists()
+                self.assert_no_temporary_files()
+
+    def test_handler_attached_to_upload_views_only(self):
+        response = self.upload(self.make_image())
+
+        assert isinstance(response.wsgi_request.upload_handlers[0], ImageUploadHandler)
+        assert settings.FILE_UPLOAD_HANDLERS == global_settings.FILE_UPLOAD_HANDLERS
+
+    @override_settings(UPLOAD_MAX_IMAGE_DIMENSION=300)
+    def test_upload_too_large_dimensions(self):
+        response = self.upload(self.make_image(size=(301, 10)))
+
+        assert 'The image dimensions are too large.' in response.content.decode()
+        assert not Post.objects.exists()
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=1024)
+    def test_upload_too_large_file(self):
+        response = self.upload(SimpleUploadedFile('test.png', self.make_image().read() + b'\0' * 2048))
+
+        assert "The file can&#x27;t exceed 1.0\xa0KB." in response.content.decode()
+        assert not Post.objects.exists()
+        self.assert_no_temporary_files()
+
+    @override_settings(UPLOAD_MAX_REQUEST_SIZE=1024)
+    def test_upload_too_large_request(self):
+        response = self.upload(self.make_image())
+
+        assert "The uploaded files can&#x27;t exceed 1.0\xa0KB in total." in response.content.decode()
+        assert not Post.objects.exists()
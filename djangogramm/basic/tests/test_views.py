@@ -1,11 +1,14 @@
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, override_settings, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import lxml.html as html
 from mixer.backend.django import mixer
 
-from basic.models import Profile
+from basic.models import Profile, Post, Photo
 
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
@@ -32,7 +35,7 @@ class TestHomeView(TestCase):
         response = self.client.get(self.path)
 
         assert response.status_code == 302
-        assert response.url == reverse('my-profile')
+        assert response.url == reverse('feed')
 
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
@@ -87,6 +90,82 @@ class TestUserProfileView(TestCase):
         assert smn_profile.first_name in content
         assert smn_profile.last_name in content
 
+    def test_user_profile_queries_independent_of_posts(self):
+        profile = mixer.blend(Profile, gramm_user=self.user)
+        self.client.force_login(self.user)
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.path)
+            assert response.status_code == 200
+            return len(queries)
+
+        post = Post.objects.create(profile=profile, title='first post')
+        Photo.objects.create(post=post, photo='first.png')
+        expected = count_queries()
+
+        for i in range(5):
+            post = Post.objects.create(profile=profile, title=f'post {i}')
+            [Photo.objects.create(post=post, photo=f'{i}-{j}.png') for j in range(3)]
+
+        assert count_queries() == expected
+
+    def test_user_profile_query_count(self):
+        profile = mixer.blend(Profile, gramm_user=self.user)
+        smn_profile = mixer.blend(Profile)
+        Photo.objects.create(post=Post.objects.create(profile=profile, title='post'), photo='test.png')
+        Photo.objects.create(post=Post.objects.create(profile=smn_profile, title='post'), photo='test.png')
+        self.client.force_login(self.user)
+
+        # user and profile cached for the authentication, the profile with its counters, posts, photos
+        with self.assertNumQueries(5):
+            self.client.get(self.path)
+        # ... the requested profile and whether the user follows it, the user and the profile come from the cache
+        with self.assertNumQueries(4):
+            self.client.get(reverse('user-profile', kwargs={'profile_identifier': smn_profile.identifier}))
+
+    @override_settings(MEDIA_URL_SIGNED=False)
+    def test_user_profile_photos(self):
+        profile = mixer.blend(Profile, gramm_user=self.user)
+        post = Post.objects.create(profile=profile, title='post')
+        Photo.objects.create(post=post, photo='photos/new.png')
+        Photo.objects.create(post=post, photo='photos/done.png', rendered=True, renditions={'webp': [320, 640]})
+        self.client.force_login(self.user)
+        page = html.fromstring(self.client.get(self.path).content)
+
+        assert page.xpath('//img[contains(@src, "placeholder.svg")]')
+        assert page.xpath('//img/@src[contains(., "photos/done.thumbnail.png")]')
+        assert page.xpath('//source[@type="image/webp"]/@srcset') == \
+            ['/media/photos/done.320w.webp 320w, /media/photos/done.640w.webp 640w']
+
+    def test_user_profile_pagination(self):
+        profile = mixer.blend(Profile, gramm_user=self.user)
+        [Post.objects.create(profile=profile, title=f'post number {i}') for i in range(15)]
+        self.client.force_login(self.user)
+
+        response = self.client.get(self.path)
+        page = response.context['page']
+
+        assert len(response.context['posts']) == 12
+        assert page.has_next
+        assert 'post number 14' in response.content.decode()
+
+        response = self.client.get(self.path, {'after': page.next_cursor, 'fragment': 1})
+        content = response.content.decode()
+
+        assert response.status_code == 200
+        assert len(response.context['posts']) == 3
+        assert 'post number 0' in content
+        assert '<h2>' not in content
+
+    def test_user_profile_invalid_cursor(self):
+        mixer.blend(Profile, gramm_user=self.user)
+        self.client.force_login(self.user)
+        response = self.client.get(self.path, {'after': 'invalid'})
+
+        assert response.status_code == 404
+
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class TestCreateProfileView(TestCase):
@@ -118,6 +197,13 @@ class TestCreateProfileView(TestCase):
         assert form.fields.get('csrfmiddlewaretoken')
         assert expected_form_fields == form.fields.keys()[1:]
 
+    def test_create_profile_redirect(self):
+        self.client.force_login(self.user)
+        response = self.client.post(self.path, {'first_name': 'John', 'last_name': 'Smith', 'identifier': 'john-smith'})
+
+        assert response.status_code == 302
+        assert response.url == reverse('user-profile', kwargs={'profile_identifier': 'john-smith'})
+
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class TestUpdateProfileView(TestCase):
@@ -150,6 +236,31 @@ class TestUpdateProfileView(TestCase):
         assert form.fields.get('csrfmiddlewaretoken')
         assert expected_form_fields == form.fields.keys()[1:]
 
+    def test_update_profile_query_count(self):
+        self.client.force_login(self.user)
+
+        # user and profile, the session is cached by force_login
+        with self.assertNumQueries(2):
+            self.client.get(self.path)
+        # all of them cached
+        with self.assertNumQueries(0):
+            self.client.get(self.path)
+
+    def test_update_someone_profile(self):
+        smn_profile = mixer.blend(Profile)
+        self.client.force_login(self.user)
+        path = reverse('settings-profile', kwargs={'profile_identifier': smn_profile.identifier})
+
+        assert self.client.get(path).status_code == 404
+        assert self.client.post(path, {'first_name': 'John'}).status_code == 404
+
+    def test_update_profile_redirect(self):
+        self.client.force_login(self.user)
+        response = self.client.post(self.path, {'first_name': 'John', 'last_name': 'Smith', 'identifier': 'new-one'})
+
+        assert response.status_code == 302
+        assert response.url == reverse('user-profile', kwargs={'profile_identifier': 'new-one'})
+
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class TestPeopleView(TestCase):
@@ -171,6 +282,34 @@ class TestPeopleView(TestCase):
         assert response.status_code == 200
         assert b'People' in response.content
 
+    def test_people_pagination(self):
+        [mixer.blend(Profile, first_name=f'Name{i:02}') for i in range(60)]
+        self.client.force_login(self.user)
+
+        first = self.client.get(self.path).context['page']
+        second = self.client.get(self.path, {'after': first.next_cursor}).context['page']
+
+        assert [p.first_name for p in first] + [p.first_name for p in second] == [f'Name{i:02}' for i in range(60)]
+        assert not second.has_next
+
+    def test_people_search(self):
+        mixer.blend(Profile, first_name='John', last_name='Smith')
+        mixer.blend(Profile, first_name='Jane', last_name='Johnson')
+        mixer.blend(Profile, first_name='Mary', last_name='Brown')
+        self.client.force_login(self.user)
+
+        by_prefix = self.client.get(self.path, {'q': 'jo'}).context['people']
+        by_full_name = self.client.get(self.path, {'q': 'john sm'}).context['people']
+
+        assert {p.first_name for p in by_prefix} == {'John', 'Jane'}
+        assert [p.first_name for p in by_full_name] == ['John']
+
+    def test_people_exclude_current_user(self):
+        mixer.blend(Profile, gramm_user=self.user)
+        self.client.force_login(self.user)
+
+        assert not self.client.get(self.path).context['people']
+
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class TestCreatePostView(TestCase):
@@ -199,3 +338,13 @@ class TestCreatePostView(TestCase):
         assert response.status_code == 200
         assert form.fields.get('csrfmiddlewaretoken')
         assert expected_form_fields == form.fields.keys()[1:]
+
+    def test_create_post_query_count(self):
+        self.client.force_login(self.user)
+
+        # user and profile, the session is cached by force_login
+        with self.assertNumQueries(2):
+            self.client.get(self.path)
+        # all of them cached
+        with self.assertNumQueries(0):
+            self.client.get(self.path)
@@ -0,0 +1,74 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Fields of the records of import_gramm and export_gramm by record type, in the order of the import.
+# Profiles and posts refer to their users by email, photos refer to their posts by slug.
+RECORD_FIELDS = {
+    'user': ('email', 'password', 'password_hash', 'is_active', 'date_joined'),
+    'profile': ('email', 'first_name', 'last_name', 'bio', 'avatar', 'avatar_renditions', 'identifier'),
+    'post': ('email', 'title', 'slug', 'time_create'),
+    'photo': ('post', 'photo', 'rendered', 'renditions'),
+}
+JSON_FIELDS = ('avatar_renditions', 'renditions')
+CSV_COLUMNS = ['type'] + list(dict.fromkeys(field for fields in RECORD_FIELDS.values() for field in fields))
+
+
+def read_records(stream, fmt):
+    """Yield the records of the NDJSON or CSV stream one by one, CSV values parsed to the NDJSON types"""
+
+    if fmt == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(stream):
+        record = {key: value for key, value in row.items() if value != ''}
+        for field in JSON_FIELDS:
+            if field in record:
+                record[field] = json.loads(record[field])
+        yield record
+
+
+class RecordWriter:
+    """Write records as NDJSON lines or CSV rows"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, CSV_COLUMNS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        # Times keep their microseconds, unlike with DjangoJSONEncoder
+        row = {key: value.isoformat() if isinstance(value, datetime.datetime) else value
+               for key, value in record.items()}
+        if self.fmt == 'ndjson':
+            self.stream.write(json.dumps(row) + '\n')
+            return
+        for field in JSON_FIELDS:
+            if field in row:
+                row[field] = json.dumps(row[field])
+        self.writer.writerow(row)
+
+
+def parse_bool(value, default=False):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def parse_time(value):
+    """Parse an ISO 8601 time, converted to the TIME_ZONE when the database keeps naive times"""
+
+    value = parse_datetime(value) if isinstance(value, str) else value
+    if value is not None and not settings.USE_TZ and timezone.is_aware(value):
+        value = timezone.make_naive(value)
+    return value
@@ -0,0 +1,108 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import gettext as _
+from PIL import Image
+
+
+class RejectedUploadedFile(UploadedFile):
+    """Empty placeholder of a file rejected during the upload, carrying the reason for the form"""
+
+    def __init__(self, name, content_type, size, charset, upload_error):
+        super().__init__(io.BytesIO(), name, content_type, size, charset)
+        self.upload_error = upload_error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Stream uploaded images chunk by chunk to temporary files in FILE_UPLOAD_TEMP_DIR.
+
+    The image header is inspected as soon as the first chunks arrive, so a file which is not
+    an image, has too large dimensions or exceeds the size limits is dropped without being stored.
+    Accepted files carry ``image_format`` and ``image_size``, and they are moved rather than copied
+    when saved to the file system storage.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_size = content_length
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = None
+        self.head = b''
+        self.image = None
+        self.error = None
+        if getattr(self, 'request_size', 0) > settings.UPLOAD_MAX_REQUEST_SIZE:
+            self.reject(_("The uploaded files can't exceed %(size)s in total.") % {
+                'size': filesizeformat(settings.UPLOAD_MAX_REQUEST_SIZE)})
+            return
+        os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if start + len(raw_data) > settings.UPLOAD_MAX_FILE_SIZE:
+            self.reject(_("The file can't exceed %(size)s.") % {
+                'size': filesizeformat(settings.UPLOAD_MAX_FILE_SIZE)})
+        elif self.received > settings.UPLOAD_MAX_REQUEST_SIZE:
+            self.reject(_("The uploaded files can't exceed %(size)s in total.") % {
+                'size': filesizeformat(settings.UPLOAD_MAX_REQUEST_SIZE)})
+        else:
+            self.file.write(raw_data)
+            if self.image is None:
+                self.head += raw_data
+                self.inspect(final=False)
+        return None
+
+    def inspect(self, final):
+        """Read the format and the dimensions from the beginning of the file"""
+
+        try:
+            with Image.open(io.BytesIO(self.head)) as image:
+                image_format, image_size = image.format, image.size
+        except Image.DecompressionBombError:
+            self.reject(_("The image dimensions are too large."))
+            return
+        except Exception:
+            if final or len(self.head) >= settings.UPLOAD_IMAGE_HEADER_SIZE:
+                self.reject(_(
+                    "Upload a valid image. The file you uploaded was either not an image or a corrupted image."
+                ))
+            return
+
+        self.head = b''
+        if image_format not in settings.UPLOAD_IMAGE_FORMATS:
+            self.reject(_("Image format %(format)s is not supported.") % {'format': image_format})
+        elif max(image_size) > settings.UPLOAD_MAX_IMAGE_DIMENSION:
+            self.reject(_("The image dimensions are too large."))
+        else:
+            self.image = (image_format, image_size)
+
+    def reject(self, error):
+        self.error = error
+        self.head = b''
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def file_complete(self, file_size):
+        if not self.error and self.image is None:
+            self.inspect(final=True)
+        if self.error:
+            return RejectedUploadedFile(self.file_name, self.content_type, file_size, self.charset, self.error)
+
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.image_format, self.file.image_size = self.image
+        return self.file
+
+    def upload_interrupted(self):
+        if getattr(self, 'file', None) is not None:
+            self.file.close()
@@ -1,18 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from .views import logout_user, UserProfileView, HomeView, UpdateProfileView, CreateProfileView, PeopleView, \
-    CreatePostView
+    CreatePostView, FeedView, follow_profile, unfollow_profile, instrumentation_report
+
+# In the ASGI mode the read-heavy views are async, running their queries in worker threads
+if settings.SERVER_MODE == 'asgi':
+    profile_view, people_view = UserProfileView.as_async_view(), PeopleView.as_async_view()
+else:
+    profile_view, people_view = UserProfileView.as_view(), PeopleView.as_view()
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
 
     path('logout/', logout_user, name='logout'),
 
-    path('profile/me/', UserProfileView.as_view(), name='my-profile'),
-    path('profile/<slug:profile_identifier>/', UserProfileView.as_view(), name='user-profile'),
+    path('feed/', FeedView.as_view(), name='feed'),
+
+    path('profile/me/', profile_view, name='my-profile'),
+    path('profile/<slug:profile_identifier>/', profile_view, name='user-profile'),
     path('profile/new', CreateProfileView.as_view(), name="new-profile"),
     path('profile/<slug:profile_identifier>/settings/', UpdateProfileView.as_view(), name='settings-profile'),
+    path('profile/<slug:profile_identifier>/follow/', follow_profile, name='follow-profile'),
+    path('profile/<slug:profile_identifier>/unfollow/', unfollow_profile, name='unfollow-profile'),
 
-    path('people/', PeopleView.as_view(), name='people'),
+    path('people/', people_view, name='people'),
 
     path('post/new/', CreatePostView.as_view(), name='new-post'),
+
+    path('instrumentation/', instrumentation_report, name='instrumentation'),
 ]
@@ -1,9 +1,20 @@
+import time
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
-from .models import Profile
+from .middleware import get_profile
+from .pagination import KeysetPaginator, InvalidCursor
+from .uploadhandlers import ImageUploadHandler
 
 menu = [
+    {"title": "Feed", "url_name": "feed"},
     {"title": "MyProfile", "url_name": "my-profile"},
     {"title": "New post", "url_name": "new-post"},
     {"title": "People", "url_name": "people"},
@@ -28,9 +39,100 @@ class SuccessReverseProfileMixin:
     def get_success_url(self):
         """Redirect to profile with property identifier"""
 
-        if not Profile.objects.filter(gramm_user=self.request.user).exists():
+        profile = get_profile(self.request)
+        if profile is None:
             return reverse("new-profile")
         return reverse(
             "user-profile",
-            kwargs={"profile_identifier": self.request.user.profile.identifier}
+            kwargs={"profile_identifier": profile.identifier}
         )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ImageUploadMixin:
+    """
+    Stream the uploaded files of the view through ImageUploadHandler, the other views keep the default handlers.
+
+    The handlers can only be replaced before the request body is read, and CsrfViewMiddleware reads it
+    for the CSRF token, so the CSRF check runs here after the replacement instead.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+
+class KeysetPaginationMixin:
+    """Paginate a queryset with cursor tokens from the "before" and "after" query parameters"""
+
+    page_size = 12
+    paginate_ordering = ('-id',)
+    fragment_template_name = None
+
+    def get_keyset_paginator(self, queryset):
+        return KeysetPaginator(queryset, self.paginate_ordering, self.page_size)
+
+    def paginate_keyset(self, queryset):
+        """Return the requested page of the queryset"""
+
+        paginator = self.get_keyset_paginator(queryset)
+        try:
+            return paginator.page(before=self.request.GET.get('before'), after=self.request.GET.get('after'))
+        except InvalidCursor:
+            raise Http404("Invalid page")
+
+    def get_template_names(self):
+        """Render only the list fragment for "load more" requests"""
+
+        if self.fragment_template_name and 'fragment' in self.request.GET:
+            return [self.fragment_template_name]
+        return super().get_template_names()
+
+
+def database_sync_to_async(func):
+    """
+    Run the ORM code of an async view in a worker thread of its own, not in the thread shared by the
+    thread-sensitive code, so the requests don't wait for each other. The database connections of the
+    worker are closed when obsolete, like at the start and the end of a request.
+    """
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+class AsyncViewMixin:
+    """
+    Serve the class-based view as an async view in the ASGI mode.
+
+    Django 3.1 has no async ORM, so the view runs its queries and renders its template, which
+    evaluates the lazy querysets, in one hop to a worker thread, while the event loop goes on
+    with the other requests.
+    """
+
+    @classmethod
+    def as_async_view(cls, **initkwargs):
+        view = cls.as_view(**initkwargs)
+
+        def respond(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                started = time.perf_counter()
+                response.render()
+                recorder = getattr(request, 'instrumentation', None)
+                if recorder is not None:
+                    recorder.template_time += time.perf_counter() - started
+            return response
+
+        async def async_view(request, *args, **kwargs):
+            return await database_sync_to_async(respond)(request, *args, **kwargs)
+
+        async_view.view_class = cls
+        async_view.view_initkwargs = initkwargs
+        update_wrapper(async_view, cls, updated=())
+        update_wrapper(async_view, cls.dispatch, assigned=())
+        return async_view
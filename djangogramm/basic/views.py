@@ -1,28 +1,80 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
-from django.http import HttpResponseNotFound, Http404
-from django.shortcuts import redirect
+from django.db.models import Prefetch, Q
+from django.http import HttpResponseNotFound, Http404, JsonResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext as _
 from django.urls import reverse_lazy, reverse
-from django.views.generic import CreateView, UpdateView, DetailView, ListView
+from django.views.decorators.http import require_POST
+from django.views.generic import CreateView, UpdateView, DetailView, ListView, TemplateView
 
+from .cache import get_stats, get_versions, reset_stats
+from .feed import FeedPaginator
 from .forms import CreateProfileForm, UpdateProfileForm, CreatePostForm, AuthenticationEmailForm
-from .models import Profile, Photo, Post
-from .utils import SuccessReverseProfileMixin, ContextDataMixin
+from .instrumentation import stats
+from .middleware import get_profile, set_profile
+from .models import Profile, Photo, Post, Follow
+from .utils import (
+    SuccessReverseProfileMixin, ContextDataMixin, KeysetPaginationMixin, AsyncViewMixin, ImageUploadMixin
+)
 
 
 def page_not_found(request, exception):
     return HttpResponseNotFound("<h1>Page not found (404)</h1>")
 
 
+@staff_member_required
+def instrumentation_report(request):
+    """
+    Per-view statistics of the requests served by this process with the hits and misses of the fragment cache,
+    a POST starts them over
+    """
+    if request.method == 'POST':
+        stats.reset()
+        reset_stats()
+    top = request.GET.get('top', '')
+    return JsonResponse({
+        **stats.snapshot(duplicates=int(top) if top.isdigit() else 10),
+        'fragment_cache': get_stats(),
+    })
+
+
 @login_required
 def logout_user(request):
     logout(request)
     return redirect('home')
 
 
+def get_followee(request, profile_identifier):
+    """Return the profile to follow, which can't be the profile of the user"""
+
+    profile = get_profile(request)
+    followee = get_object_or_404(Profile, identifier=profile_identifier)
+    if profile is None or profile.pk == followee.pk:
+        raise Http404
+    return profile, followee
+
+
+@login_required
+@require_POST
+def follow_profile(request, profile_identifier):
+    profile, followee = get_followee(request, profile_identifier)
+    Follow.objects.follow(profile, followee)
+    return redirect(followee)
+
+
+@login_required
+@require_POST
+def unfollow_profile(request, profile_identifier):
+    profile, followee = get_followee(request, profile_identifier)
+    Follow.objects.unfollow(profile, followee)
+    return redirect(followee)
+
+
 class HomeView(SuccessReverseProfileMixin, LoginView):
     form_class = AuthenticationEmailForm
     template_name = 'basic/home.html'
@@ -30,7 +82,7 @@ class HomeView(SuccessReverseProfileMixin, LoginView):
 
     def get(self, request, *args, **kwargs):
         if self.request.user.is_authenticated and not self.request.user.is_staff:
-            return redirect('my-profile')
+            return redirect('feed')
         return super(HomeView, self).get(request, *args, **kwargs)
     
     def get_success_url(self):
@@ -39,7 +91,7 @@ class HomeView(SuccessReverseProfileMixin, LoginView):
         return super(HomeView, self).get_success_url()
 
 
-class CreateProfileView(LoginRequiredMixin, SuccessReverseProfileMixin, CreateView):
+class CreateProfileView(ImageUploadMixin, LoginRequiredMixin, SuccessReverseProfileMixin, CreateView):
     form_class = CreateProfileForm
     template_name = "basic/profile_form.html"
     extra_context = dict(title='New profile',
@@ -51,22 +103,24 @@ class CreateProfileView(LoginRequiredMixin, SuccessReverseProfileMixin, CreateVi
         obj = form.save(commit=False)
         obj.gramm_user = self.request.user
         obj.save()
+        set_profile(self.request, obj)
         return super().form_valid(form)
 
 
-class UpdateProfileView(LoginRequiredMixin, ContextDataMixin, SuccessReverseProfileMixin, UpdateView):
+class UpdateProfileView(ImageUploadMixin, LoginRequiredMixin, ContextDataMixin, SuccessReverseProfileMixin, UpdateView):
     model = Profile
     form_class = UpdateProfileForm
     template_name = "basic/profile_form.html"
     slug_url_kwarg = "profile_identifier"
     slug_field = 'identifier'
 
-    def get(self, request, *args, **kwargs):
-        """Check if the profile belongs to the user"""
+    def get_object(self, queryset=None):
+        """Return the profile of the user, only if it's the requested one"""
 
-        if not self.request.user.profile == self.get_object():
+        profile = get_profile(self.request)
+        if profile is None or profile.identifier != self.kwargs.get(self.slug_url_kwarg):
             raise Http404
-        return super(UpdateProfileView, self).get(request, *args, **kwargs)
+        return profile
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super(UpdateProfileView, self).get_context_data(**kwargs)
@@ -75,9 +129,11 @@ class UpdateProfileView(LoginRequiredMixin, ContextDataMixin, SuccessReverseProf
         return {**context, **extra_context}
 
 
-class UserProfileView(LoginRequiredMixin, ContextDataMixin, DetailView):
+class UserProfileView(AsyncViewMixin, LoginRequiredMixin, ContextDataMixin, KeysetPaginationMixin, DetailView):
     model = Profile
     template_name = 'basic/profile.html'
+    fragment_template_name = 'basic/includes/post_page.html'
+    paginate_ordering = ('-time_create', '-id')
     slug_url_kwarg = 'profile_identifier'
     slug_field = 'identifier'
 
@@ -89,6 +145,10 @@ class UserProfileView(LoginRequiredMixin, ContextDataMixin, DetailView):
 
         pk = self.kwargs.get(self.pk_url_kwarg)
         if self.request.path == reverse_lazy('my-profile'):
+            profile = get_profile(self.request)
+            # The cached profile of the user doesn't carry the counters shown on the page
+            if profile is not None and not profile.get_deferred_fields():
+                return profile
             pk = self.request.user.id
         slug = self.kwargs.get(self.slug_url_kwarg)
 
@@ -119,10 +179,11 @@ class UserProfileView(LoginRequiredMixin, ContextDataMixin, DetailView):
         if self.request.user.is_staff:
             return super(UserProfileView, self).get(request, *args, **kwargs)
 
-        if not Profile.objects.filter(gramm_user=self.request.user).exists():
+        profile = get_profile(self.request)
+        if profile is None:
             return redirect('new-profile')
 
-        if self.kwargs.get(self.slug_url_kwarg) == Profile.objects.get(gramm_user=self.request.user).identifier:
+        if self.kwargs.get(self.slug_url_kwarg) == profile.identifier:
             return redirect('my-profile')
 
         return super(UserProfileView, self).get(request, *args, **kwargs)
@@ -136,15 +197,20 @@ class UserProfileView(LoginRequiredMixin, ContextDataMixin, DetailView):
             if context_object_name:
                 context[context_object_name] = self.object
 
-            context['posts'] = list(map(
-                lambda post:
-                Photo.objects.filter(post=post),
-                Post.objects.filter(profile=self.object.id).order_by('-time_create')
-            ))
+            # The posts are only queried when their cached fragment has to be rendered
+            queryset = Post.objects.filter(profile=self.object.id).prefetch_related(
+                Prefetch('photo_set', queryset=Photo.objects.order_by('pk'), to_attr='photos')
+            )
+            page = SimpleLazyObject(lambda: self.paginate_keyset(queryset))
+            context['page'] = page
+            context['posts'] = SimpleLazyObject(lambda: page.object_list)
 
             context['title'] = f"DjangoGramm - {self.object}"
 
-            context["is_owner"] = (self.request.user == self.object.gramm_user)
+            context["is_owner"] = (self.request.user.pk == self.object.gramm_user_id)
+            profile = get_profile(self.request)
+            if profile is not None and not context["is_owner"]:
+                context["is_following"] = Follow.objects.filter(follower=profile, followee=self.object).exists()
 
         context.update(kwargs)
         context.update(self.get_context())
@@ -152,22 +218,57 @@ class UserProfileView(LoginRequiredMixin, ContextDataMixin, DetailView):
         return super().get_context_data(**context)
 
 
-class PeopleView(LoginRequiredMixin, ContextDataMixin, ListView):
+class PeopleView(AsyncViewMixin, LoginRequiredMixin, ContextDataMixin, KeysetPaginationMixin, ListView):
     model = Profile
     template_name = "basic/people.html"
+    fragment_template_name = "basic/includes/people_list.html"
     context_object_name = "people"
-    
+    page_size = 50
+    paginate_ordering = ('first_name', 'last_name', 'id')
+
     def get_queryset(self):
-        """Return queryset without authorized user"""
-        return super(PeopleView, self).get_queryset().exclude(gramm_user=self.request.user.id)
+        """Return queryset without authorized user, filtered by the name prefix from "q" parameter"""
+
+        queryset = super(PeopleView, self).get_queryset().exclude(gramm_user=self.request.user.id)
+        terms = self.request.GET.get('q', '').split()
+        if len(terms) == 1:
+            queryset = queryset.filter(Q(first_name__istartswith=terms[0]) | Q(last_name__istartswith=terms[0]))
+        elif terms:
+            queryset = queryset.filter(first_name__istartswith=terms[0], last_name__istartswith=' '.join(terms[1:]))
+        return queryset
 
     def get_context_data(self, *, object_list=None, **kwargs):
-        context = super(PeopleView, self).get_context_data(**kwargs)
-        extra_context = self.get_context(title='People')
+        page = self.paginate_keyset(self.object_list)
+        context = super(PeopleView, self).get_context_data(object_list=page.object_list, **kwargs)
+        extra_context = self.get_context(title='People',
+                                         page=page,
+                                         fragment_versions=get_versions(p.pk for p in page.object_list),
+                                         q=self.request.GET.get('q', ''))
+        return {**context, **extra_context}
+
+
+class FeedView(LoginRequiredMixin, ContextDataMixin, KeysetPaginationMixin, TemplateView):
+    template_name = "basic/feed.html"
+    fragment_template_name = "basic/includes/feed_list.html"
+
+    def get(self, request, *args, **kwargs):
+        if get_profile(self.request) is None:
+            return redirect('new-profile')
+        return super(FeedView, self).get(request, *args, **kwargs)
+
+    def get_keyset_paginator(self, profile):
+        return FeedPaginator(profile, self.page_size)
+
+    def get_context_data(self, **kwargs):
+        page = self.paginate_keyset(get_profile(self.request))
+        context = super(FeedView, self).get_context_data(**kwargs)
+        extra_context = self.get_context(title='Feed',
+                                         page=page,
+                                         posts=page.object_list)
         return {**context, **extra_context}
 
 
-class CreatePostView(LoginRequiredMixin, SuccessReverseProfileMixin, ContextDataMixin, CreateView):
+class CreatePostView(ImageUploadMixin, LoginRequiredMixin, SuccessReverseProfileMixin, ContextDataMixin, CreateView):
     form_class = CreatePostForm
     template_name = "basic/post_form.html"
 
@@ -182,5 +283,5 @@ class CreatePostView(LoginRequiredMixin, SuccessReverseProfileMixin, ContextData
         It's necessary to assign created post to current user"""
 
         kwargs = super(CreatePostView, self).get_form_kwargs()
-        kwargs['profile'] = self.request.user.profile
+        kwargs['profile'] = get_profile(self.request)
         return kwargs
@@ -57,11 +57,16 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'basic.middleware.CachedAuthenticationMiddleware',
+    'basic.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-view query counts and timings with a Server-Timing header, reported to the staff at /instrumentation/
+if os.getenv('INSTRUMENTATION'):
+    MIDDLEWARE.insert(0, 'basic.middleware.InstrumentationMiddleware')
+
 ROOT_URLCONF = 'djangogramm.urls'
 
 TEMPLATES = [
@@ -81,6 +86,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'djangogramm.wsgi.application'
+ASGI_APPLICATION = 'djangogramm.asgi.application'
+# "wsgi" for gunicorn sync workers, "asgi" for uvicorn, which serves the profile and people views asynchronously
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
 
 
 # Database
@@ -94,6 +102,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_DEFAULT_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_DEFAULT_LOCATION', ''),
+    }
+}
+
+# Sessions are read from the cache and written through to the database. The users with their profiles are cached
+# as snapshots for AUTH_CACHE_TIMEOUT seconds, invalidated by new versions; with several processes the cache
+# has to be shared by them, like memcached or redis, for the invalidations to reach all of them
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+AUTH_CACHE_ALIAS = 'default'
+AUTH_CACHE_TIMEOUT = 300
+
+# Rendered fragments of the profile and people pages, invalidated by new versions of the profiles when they change.
+# They embed signed media URLs, so they are cached for MEDIA_URL_MAX_AGE at most.
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -134,6 +165,56 @@ STATICFILES_DIRS = []
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# Media URLs are built from the stored names without calling the storage, optionally signed.
+# MEDIA_URL_MAX_AGE in seconds makes the signatures expire, None keeps them valid forever.
+MEDIA_URL_SIGNED = True
+MEDIA_URL_MAX_AGE = None
+# Media files are served by basic.media.serve_media. MEDIA_SERVE_OFFLOAD hands the body over to the web server:
+# "x-accel-redirect" for nginx with an internal location MEDIA_ACCEL_REDIRECT_LOCATION aliased to MEDIA_ROOT,
+# "x-sendfile" for Apache or lighttpd. Content-hashed files are cached by the clients for MEDIA_CACHE_MAX_AGE seconds.
+MEDIA_SERVE_OFFLOAD = os.getenv('MEDIA_SERVE_OFFLOAD') or None
+MEDIA_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Photo files: "content" stores them under the hash of their content, shared by all photos with the same content,
+# "path" stores each upload in the directory of its post
+PHOTO_STORAGE_MODE = os.getenv('PHOTO_STORAGE_MODE', 'content')
+
+# The image uploads of the profile and post views are streamed by basic.uploadhandlers.ImageUploadHandler
+# to FILE_UPLOAD_TEMP_DIR, keep it on the same file system as MEDIA_ROOT so that saving an upload moves the file
+# instead of copying it
+FILE_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'uploads')
+UPLOAD_MAX_FILE_SIZE = 20 * 1024 * 1024
+UPLOAD_MAX_REQUEST_SIZE = 100 * 1024 * 1024
+UPLOAD_MAX_IMAGE_DIMENSION = 10000
+UPLOAD_IMAGE_HEADER_SIZE = 256 * 1024
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Image renditions: rendering threads per process (0 leaves the jobs to "manage.py drain_renditions"),
+# retries with exponential backoff from RENDITION_RETRY_DELAY seconds, lease of a claimed job in seconds
+RENDITION_WORKERS = int(os.getenv('RENDITION_WORKERS', 2))
+RENDITION_MAX_ATTEMPTS = 5
+RENDITION_RETRY_DELAY = 30
+RENDITION_LEASE = 300
+# Responsive renditions of photos and avatars, formats not supported by the installed Pillow are skipped
+RENDITION_WIDTHS = (320, 640, 1080)
+RENDITION_FORMATS = ('avif', 'webp')
+RENDITION_QUALITY = 80
+# Admin lists show square previews of ADMIN_PREVIEW_SIZE pixels, rendered with the renditions or on their first view
+ADMIN_PREVIEW_SIZE = 100
+
+# Home feed: posts are copied to the timelines of the followers unless the author has FEED_FANOUT_LIMIT followers
+# or more, then the followers read them from the author's posts; following copies the FEED_BACKFILL latest posts
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL = 50
+
+# Batched backfills of the data migrations: rows per committed batch, seconds of sleep between the batches
+BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 1000))
+BACKFILL_PAUSE = float(os.getenv('BACKFILL_PAUSE', 0))
+
+# Admin lists of unfiltered tables holding ADMIN_ESTIMATED_COUNT_THRESHOLD rows or more by the PostgreSQL statistics
+# show the estimated number of rows instead of counting them
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
 
 # User model
 AUTH_USER_MODEL = 'basic.GrammUser'
@@ -152,6 +233,17 @@ EMAIL_HOST = os.getenv('EMAIL_HOST')
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
+# Emails go through the outbox table: sending threads per process (0 leaves them to "manage.py flush_outbox"),
+# emails sent per SMTP connection, retries with exponential backoff from EMAIL_OUTBOX_RETRY_DELAY seconds,
+# lease of a claimed email in seconds
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', 1))
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+EMAIL_OUTBOX_LEASE = 300
 
 # Activate Django-Heroku
 django_heroku.settings(locals())
+# WhiteNoise serving the static files without a thread of its own in the ASGI mode
+MIDDLEWARE = ['basic.middleware.StaticFilesMiddleware' if name == 'whitenoise.middleware.WhiteNoiseMiddleware' else name
+              for name in MIDDLEWARE]
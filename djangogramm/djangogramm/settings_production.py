@@ -0,0 +1,49 @@
+"""
+Production profile of the settings, run with DJANGO_SETTINGS_MODULE=djangogramm.settings_production.
+
+"python manage.py check_performance" fails when any of these is undone by the environment. The profile
+refuses to load unless the environment provides:
+
+- CACHE_DEFAULT_LOCATION, the memcached servers, e.g. a Heroku MemCachier add-on;
+- MEDIA_URL on a CDN or another host serving MEDIA_ROOT, or MEDIA_SERVE_OFFLOAD behind nginx or Apache.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, MEDIA_SERVE_OFFLOAD, MEDIA_URL, TEMPLATES
+
+DEBUG = False
+
+# Templates compiled once per process
+TEMPLATES = [{**engine, 'APP_DIRS': False, 'OPTIONS': {**engine['OPTIONS'], 'loaders': [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]}} for engine in TEMPLATES]
+
+# Connections kept open between requests, checked before the request reusing them, see basic.signals
+DATABASES = {alias: {**database, 'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 600)), 'CONN_HEALTH_CHECKS': True}
+             for alias, database in DATABASES.items()}
+
+# Sessions, users and fragments shared by all the processes
+if not os.getenv('CACHE_DEFAULT_LOCATION'):
+    raise ImproperlyConfigured("Set CACHE_DEFAULT_LOCATION to the memcached servers.")
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_DEFAULT_BACKEND', 'django.core.cache.backends.memcached.MemcachedCache'),
+        'LOCATION': os.getenv('CACHE_DEFAULT_LOCATION'),
+    }
+}
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Hashed names cached by the browsers forever, with gzip and brotli versions
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Media files served by another host, or by the web server in front with MEDIA_SERVE_OFFLOAD
+MEDIA_URL = os.getenv('MEDIA_URL', MEDIA_URL)
+if not os.getenv('MEDIA_URL') and not MEDIA_SERVE_OFFLOAD:
+    raise ImproperlyConfigured("Set MEDIA_URL to the host serving the media files, or MEDIA_SERVE_OFFLOAD.")
@@ -13,11 +13,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 
+from basic.media import serve_media
 from basic.views import page_not_found
 
 urlpatterns = [
@@ -28,5 +30,8 @@ urlpatterns = [
 
 handler404 = page_not_found
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media served by the application when MEDIA_URL is a path on this site, not another host
+if not re.match(r'^(https?:)?//', settings.MEDIA_URL):
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+    ]
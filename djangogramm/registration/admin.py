@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'run_after', 'time_create', 'time_sent')
+    list_filter = ('status',)
+    ordering = ('-time_create',)
+    readonly_fields = ('lease', 'last_error', 'time_create', 'time_sent')
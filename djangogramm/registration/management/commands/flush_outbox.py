@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from registration.models import OutgoingEmail
+from registration.outbox import flush
+
+
+class Command(BaseCommand):
+    help = "Send the emails waiting in the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Maximum number of emails to send")
+        parser.add_argument('--retry-failed', action='store_true', help="Queue the failed emails again")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = OutgoingEmail.objects.filter(status=OutgoingEmail.FAILED).update(
+                status=OutgoingEmail.PENDING, attempts=0
+            )
+            self.stdout.write(f"Queued {retried} failed emails again")
+
+        sent, failed = flush(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails, {failed} failed"))
@@ -0,0 +1,134 @@
+import logging
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """Return the in-process pool sending the emails right after the request"""
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EMAIL_OUTBOX_WORKERS, thread_name_prefix='outbox')
+    return _executor
+
+
+def enqueue_email(message):
+    """Store the rendered message in the outbox instead of sending it within the request.
+
+    With EMAIL_OUTBOX_WORKERS set, the outbox is flushed in the in-process pool once the transaction commits,
+    otherwise the message waits for the "flush_outbox" command"""
+
+    email = OutgoingEmail.objects.create(
+        subject=message.subject,
+        body=message.body,
+        content_subtype=message.content_subtype,
+        from_email=message.from_email or '',
+        to=list(message.to),
+    )
+    if settings.EMAIL_OUTBOX_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(_flush_in_thread))
+    return email
+
+
+def _flush_in_thread():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Outbox sender crashed")
+    finally:
+        connection.close()
+
+
+def claim(limit):
+    """Take up to limit due emails with two queries, so no other sender sends them until the lease expires"""
+
+    now = timezone.now()
+    lease = uuid.uuid4().hex
+    pks = list(OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, run_after__lte=now
+    ).order_by('run_after').values_list('pk', flat=True)[:limit])
+    if not pks:
+        return []
+    OutgoingEmail.objects.filter(pk__in=pks, status=OutgoingEmail.PENDING, run_after__lte=now).update(
+        lease=lease,
+        attempts=F('attempts') + 1,
+        run_after=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE),
+    )
+    return list(OutgoingEmail.objects.filter(lease=lease).order_by('pk'))
+
+
+def get_message(email, backend):
+    message = EmailMessage(email.subject, email.body, email.from_email or None, email.to, connection=backend)
+    message.content_subtype = email.content_subtype
+    return message
+
+
+def reschedule(email):
+    """Retry the email later with exponential backoff, or give up after EMAIL_OUTBOX_MAX_ATTEMPTS"""
+
+    logger.warning("Sending email %s failed, attempt %s", email.pk, email.attempts, exc_info=True)
+    email.last_error = traceback.format_exc()
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.run_after = timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+        )
+    email.save(update_fields=['status', 'run_after', 'last_error'])
+
+
+def send(emails):
+    """Send the claimed emails over a single connection, return the numbers of sent and failed ones"""
+
+    backend = get_connection(fail_silently=False)
+    try:
+        backend.open()
+    except Exception:
+        for email in emails:
+            reschedule(email)
+        return 0, len(emails)
+
+    sent = []
+    try:
+        for email in emails:
+            try:
+                backend.send_messages([get_message(email, backend)])
+            except Exception:
+                reschedule(email)
+            else:
+                sent.append(email.pk)
+    finally:
+        backend.close()
+    OutgoingEmail.objects.filter(pk__in=sent).update(status=OutgoingEmail.SENT, time_sent=timezone.now())
+    return len(sent), len(emails) - len(sent)
+
+
+def flush(limit=None):
+    """Send the due emails in batches of EMAIL_OUTBOX_BATCH_SIZE, return the numbers of sent and failed ones"""
+
+    total_sent = total_failed = 0
+    while limit is None or total_sent + total_failed < limit:
+        batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+        if limit is not None:
+            batch_size = min(batch_size, limit - total_sent - total_failed)
+        emails = claim(batch_size)
+        if not emails:
+            break
+        sent, failed = send(emails)
+        total_sent += sent
+        total_failed += failed
+    return total_sent, total_failed
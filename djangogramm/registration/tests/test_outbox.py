@@ -0,0 +1,81 @@
+import io
+import smtplib
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from registration.models import OutgoingEmail
+from registration.outbox import enqueue_email, flush
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def setup(settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    settings.EMAIL_OUTBOX_WORKERS = 0
+    settings.EMAIL_OUTBOX_BATCH_SIZE = 2
+
+
+class CountingBackend(EmailBackend):
+    """Locmem backend counting the connections, failing for the recipients in fail_for"""
+
+    opened = 0
+    fail_for = set()
+
+    def open(self):
+        CountingBackend.opened += 1
+
+    def send_messages(self, messages):
+        if any(recipient in self.fail_for for message in messages for recipient in message.to):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+def test_registration_queues_email(client):
+    response = client.post(reverse('django-registration-register'), {
+        'email': 'new@example.com', 'password1': 'Secret-password-1', 'password2': 'Secret-password-1',
+    })
+
+    assert response.status_code == 302
+    assert mail.outbox == []
+    email = OutgoingEmail.objects.get()
+    assert (email.to, email.content_subtype, email.status) == (['new@example.com'], 'html', OutgoingEmail.PENDING)
+
+    call_command('flush_outbox', stdout=io.StringIO())
+
+    assert [message.to for message in mail.outbox] == [['new@example.com']]
+    assert mail.outbox[0].content_subtype == 'html'
+    assert 'activate' in mail.outbox[0].body
+    email.refresh_from_db()
+    assert email.status == OutgoingEmail.SENT and email.time_sent
+
+
+def test_flush_batches_and_retries(settings):
+    settings.EMAIL_BACKEND = 'registration.tests.test_outbox.CountingBackend'
+    CountingBackend.opened = 0
+    CountingBackend.fail_for = {'bad@example.com'}
+    for recipient in ['a@example.com', 'bad@example.com', 'b@example.com']:
+        enqueue_email(mail.EmailMessage('Subject', 'Body', 'from@example.com', [recipient]))
+
+    assert flush() == (2, 1)
+    # One connection per batch of EMAIL_OUTBOX_BATCH_SIZE
+    assert CountingBackend.opened == 2
+    assert sorted(message.to[0] for message in mail.outbox) == ['a@example.com', 'b@example.com']
+
+    failed = OutgoingEmail.objects.get(to=['bad@example.com'])
+    assert (failed.status, failed.attempts) == (OutgoingEmail.PENDING, 1)
+    assert failed.run_after > timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_DELAY - 5)
+    assert 'SMTPRecipientsRefused' in failed.last_error
+    assert flush() == (0, 0)
+
+    settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+    OutgoingEmail.objects.filter(pk=failed.pk).update(run_after=timezone.now())
+    assert flush() == (0, 1)
+    failed.refresh_from_db()
+    assert (failed.status, failed.attempts) == (OutgoingEmail.FAILED, 2)
@@ -1,10 +1,11 @@
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
 from django_registration.backends.activation.views import RegistrationView
 
 from .forms import RegistrationUserForm
+from .outbox import enqueue_email
 
 
 class RegistrationUserView(RegistrationView):
@@ -13,8 +14,8 @@ class RegistrationUserView(RegistrationView):
 
     def send_activation_email(self, user):
         """
-        Send the activation email. The activation key is the username,
-        signed using TimestampSigner.
+        Queue the activation email in the outbox, so the signup doesn't wait for the SMTP server.
+        The activation key is the username, signed using TimestampSigner.
 
         """
         activation_key = self.get_activation_key(user)
@@ -33,6 +34,6 @@ class RegistrationUserView(RegistrationView):
             context=context,
             request=self.request,
         )
-        msg = EmailMultiAlternatives(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        msg = EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
         msg.content_subtype = "html"
-        msg.send()
+        enqueue_email(msg)